@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FCM HTTP v1 API üzerinden asenkron gönderim motoru
+Tek event loop, paylaşılan HTTP/2 bağlantısı ve sınırlı eşzamanlılık ile
+binlerce isteği aynı anda yürütür
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from firebase_admin import exceptions, messaging
+from google.auth import exceptions as auth_exceptions
+
+try:
+    import httpx
+except ImportError:  # İsteğe bağlı bağımlılık
+    httpx = None
+
+# Gerçek FCM HTTP v1 adresi; yerel test sunucusu için değiştirilebilir
+FCM_API_BASE = "https://fcm.googleapis.com"
+
+# Aynı anda uçuşta olabilecek en fazla istek
+DEFAULT_ASYNC_CONCURRENCY = 1000
+
+# Açık tutulacak en fazla bağlantı; HTTP/2'de istekler bu bağlantılar üzerinde çoğullanır
+DEFAULT_MAX_CONNECTIONS = 10
+
+# FcmError.errorCode -> firebase_admin.messaging hata sınıfı
+FCM_ERROR_CODES = {
+    'UNREGISTERED': messaging.UnregisteredError,
+    'SENDER_ID_MISMATCH': messaging.SenderIdMismatchError,
+    'QUOTA_EXCEEDED': messaging.QuotaExceededError,
+    'THIRD_PARTY_AUTH_ERROR': messaging.ThirdPartyAuthError,
+}
+
+# google.rpc.Status.status -> firebase_admin.exceptions hata sınıfı
+RPC_STATUS_ERRORS = {
+    'INVALID_ARGUMENT': exceptions.InvalidArgumentError,
+    'UNAVAILABLE': exceptions.UnavailableError,
+    'INTERNAL': exceptions.InternalError,
+    'RESOURCE_EXHAUSTED': exceptions.ResourceExhaustedError,
+}
+
+
+class AsyncSendResponse:
+    """messaging.SendResponse ile aynı arayüze sahip gönderim sonucu"""
+
+    __slots__ = ('message_id', 'exception')
+
+    def __init__(self, message_id: Optional[str], exception: Optional[Exception]):
+        self.message_id = message_id
+        self.exception = exception
+
+    @property
+    def success(self) -> bool:
+        return self.exception is None
+
+
+def _error_from_response(status_code: int, payload: dict, http_response=None) -> Exception:
+    """v1 hata gövdesini firebase_admin hata sınıfına dönüştür (Retry-After için yanıt eklenir)"""
+    error = payload.get('error', {}) if isinstance(payload, dict) else {}
+    message = error.get('message') or f"HTTP {status_code}"
+
+    for detail in error.get('details', []):
+        error_class = FCM_ERROR_CODES.get(detail.get('errorCode'))
+        if error_class:
+            return error_class(message, http_response=http_response)
+
+    error_class = RPC_STATUS_ERRORS.get(error.get('status'))
+    if error_class:
+        return error_class(message, http_response=http_response)
+    if status_code >= 500:
+        return exceptions.InternalError(message, http_response=http_response)
+    return exceptions.UnknownError(message, http_response=http_response)
+
+
+def _error_from_credential(error: Exception) -> Exception:
+    """OAuth token yenileme hatasını firebase_admin hata sınıfına dönüştür (geçici hatalar yeniden denenir)"""
+    message = f"Kimlik doğrulama token'ı alınamadı: {type(error).__name__}: {error}"
+    if isinstance(error, auth_exceptions.TransportError) or getattr(error, 'retryable', False):
+        return exceptions.UnavailableError(message, cause=error)
+    return exceptions.UnauthenticatedError(message, cause=error)
+
+
+class AsyncFCMEngine:
+    """Tek bir proje için asenkron HTTP/2 FCM gönderim motoru"""
+
+    def __init__(self, project_id: str, credential=None, base_url: str = FCM_API_BASE,
+                 max_concurrency: int = DEFAULT_ASYNC_CONCURRENCY, timeout: float = 10.0,
+                 http2: bool = True, max_connections: int = DEFAULT_MAX_CONNECTIONS, rate_limiter=None):
+        if httpx is None:
+            raise RuntimeError("Asenkron motor için httpx gerekli: pip install 'httpx[http2]'")
+
+        self.project_id = project_id
+        self.credential = credential
+        self.send_url = f"{base_url.rstrip('/')}/v1/projects/{project_id}/messages:send"
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.http2 = http2
+        self.max_connections = max(1, max_connections)
+        # Düz http:// adreslerinde (yerel test sunucusu) HTTP/2 olmadığından bağlantı başına tek istek uçuşta olur;
+        # bağlantı sayısından fazla worker sadece httpx havuzunda bekler ve gönderimi yavaşlatır
+        self.worker_count = self.max_concurrency
+        if not self.send_url.startswith('https://'):
+            self.worker_count = min(self.max_concurrency, self.max_connections)
+        # Proje başına paylaşılan TokenBucket; her istekten önce yer ayrılır
+        self.rate_limiter = rate_limiter
+        self._access_token = None
+        self._token_expiry = 0.0
+        # Motor birden çok thread/event loop'tan kullanılır (servis modu); token yenilemesini tek çağrıya indirir
+        self._token_lock = threading.Lock()
+        # CA sertifikalarını yüklemek pahalı; SSL bağlamı motor ömrü boyunca bir kez oluşturulur (düz http'de gerekmez)
+        self._ssl_context = httpx.create_ssl_context() if self.send_url.startswith('https://') else False
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        """OAuth erişim token'ını önbellekten ver, süresi dolmak üzereyse yenile"""
+        if self.credential is None:
+            # Yerel test sunucusu: kimlik doğrulama yok
+            return {}
+
+        if self._token_expired():
+            # Token yenileme bloklayan bir HTTP çağrısı; event loop'u tıkamamak için thread'de yap
+            await asyncio.to_thread(self._refresh_access_token)
+        return {'Authorization': f"Bearer {self._access_token}"}
+
+    def _token_expired(self) -> bool:
+        return not self._access_token or time.time() > self._token_expiry - 60
+
+    def _refresh_access_token(self):
+        """Token'ı yenile; aynı anda bekleyen worker'lar kilitten sonra yenilenmiş token'ı kullanır"""
+        with self._token_lock:
+            if not self._token_expired():
+                return
+            token_info = self.credential.get_access_token()
+            expiry = getattr(token_info, 'expiry', None)
+            self._token_expiry = expiry.timestamp() if expiry else time.time() + 3000
+            self._access_token = token_info.access_token
+
+    async def _send_one(self, client, message: Union[dict, bytes]) -> AsyncSendResponse:
+        """Tek bir mesajı gönder; hatalar istisna değil sonuç olarak döner"""
+        try:
+            headers = await self._auth_headers()
+            if isinstance(message, bytes):
+                # Önceden serileştirilmiş istek gövdesi (şablonlardan)
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+                response = await client.post(self.send_url, content=message, headers=headers)
+            else:
+                response = await client.post(self.send_url, json={'message': message}, headers=headers)
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+
+            if response.status_code == 200:
+                return AsyncSendResponse(payload.get('name'), None)
+            return AsyncSendResponse(None, _error_from_response(response.status_code, payload, response))
+        except httpx.HTTPError as e:
+            return AsyncSendResponse(None, exceptions.UnavailableError(f"Bağlantı hatası: {type(e).__name__}: {e}", cause=e))
+        except auth_exceptions.GoogleAuthError as e:
+            # Token yenilenemezse sadece bu mesaj başarısız olur, parti yarıda kesilmez
+            return AsyncSendResponse(None, _error_from_credential(e))
+
+    async def send_all(self, messages: Sequence,
+                       build: Optional[Callable] = None) -> List[AsyncSendResponse]:
+        """Mesajları sınırlı sayıda worker ile paylaşılan bağlantı üzerinden gönder, sırayı koru"""
+        results: List[Optional[AsyncSendResponse]] = [None] * len(messages)
+        if not messages:
+            return []
+
+        # Worker'lar aynı iterator'dan beslenir; binlerce task oluşturmadan eşzamanlılık sınırlanır
+        pending = iter(enumerate(messages))
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        # Bağlantı havuzunda beklemek istek zaman aşımına sayılmaz
+        timeout = httpx.Timeout(self.timeout, pool=None)
+
+        if self.credential is not None and self._token_expired():
+            # Worker'lar başlamadan token bir kez alınır; binlerce worker aynı anda yenilemeye kalkmaz
+            try:
+                await asyncio.to_thread(self._refresh_access_token)
+            except auth_exceptions.GoogleAuthError as e:
+                # Token yoksa hiçbir istek gönderilemez; her mesaj aynı hatayla başarısız döner
+                error = _error_from_credential(e)
+                return [AsyncSendResponse(None, error) for _ in messages]
+
+        async with httpx.AsyncClient(http2=self.http2, timeout=timeout, limits=limits, verify=self._ssl_context) as client:
+            async def worker():
+                for idx, item in pending:
+                    if self.rate_limiter:
+                        wait = self.rate_limiter.reserve()
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                    results[idx] = await self._send_one(client, build(item) if build else item)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.worker_count, len(messages)))))
+        return results
+
+    async def send_multicast(self, base_message: dict, tokens: Sequence[str]) -> List[AsyncSendResponse]:
+        """Aynı mesajı her token'a ayrı v1 isteği olarak gönder"""
+        return await self.send_all(tokens, build=lambda token: dict(base_message, token=token))
+
+    def send_all_sync(self, messages: Sequence, build: Optional[Callable] = None) -> List[AsyncSendResponse]:
+        """Senkron koddan çağırmak için send_all sarmalayıcısı"""
+        return asyncio.run(self.send_all(messages, build=build))
+
+    def send_multicast_sync(self, base_message: dict, tokens: Sequence[str]) -> List[AsyncSendResponse]:
+        """Senkron koddan çağırmak için send_multicast sarmalayıcısı"""
+        return asyncio.run(self.send_multicast(base_message, tokens))
+
+    def send_sync(self, message: dict) -> AsyncSendResponse:
+        """Senkron koddan tek mesaj gönder"""
+        return asyncio.run(self.send_all([message]))[0]
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gönderim yolu benchmark'ı
+Sahte FCM sunucusunu (fcm_mock_server.py) ayrı bir süreçte başlatır, verilen boyutlardaki
+kampanyaları FCMSender'ın gönderim yolundan geçirir ve mesaj/sn, parti gecikmesi (p50/p99)
+ve bellek kullanımını raporlar:
+
+    python fcm_benchmark.py --project proje1-firebase --backend async --sizes 1000,100000,1000000
+
+--startup ile gönderim yapılmaz; salt okunur komutların (durum, token işlemleri) taze bir süreçte
+başlama süresi ölçülür ve bütçe aşılırsa çıkış kodu 1 olur:
+
+    python fcm_benchmark.py --startup --startup-budget-ms 150
+
+--token-memory ile token deposunun bellek kullanımı ölçülür (eski sözlük yapısı ve TokenRecord):
+
+    python fcm_benchmark.py --token-memory --token-count 1000000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import re
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from fcm_mock_server import add_server_arguments
+from fcm_sender import SEND_BACKENDS, FCMSender, iter_batches
+from fcm_retry import RetryBudget
+from fcm_token_store import JsonTokenStore, TokenIndex
+
+DEFAULT_SIZES = '1000,100000,1000000'
+
+# Gerçek FCM token'ları ~160 karakterdir
+TOKEN_PADDING = 'x' * 150
+
+# Başlama ölçümünün tekrar sayısı ve süre bütçesi (medyan, import + FCMSender + durum + token işlemi)
+DEFAULT_STARTUP_RUNS = 5
+
+# Bellek ölçümündeki token sayısı ve kategoriler
+DEFAULT_TOKEN_MEMORY_COUNT = 1000000
+TOKEN_MEMORY_CATEGORIES = ('iPhone', 'Android', 'iPad', 'Web', 'Test')
+DEFAULT_STARTUP_BUDGET_MS = 150.0
+
+# Salt okunur komutlarda yüklenmemesi gereken ağır modüller (ilk gönderimde yüklenir)
+STARTUP_FORBIDDEN_MODULES = ('firebase_admin', 'google.auth', 'googleapiclient', 'grpc', 'httpx', 'requests')
+
+# Taze süreçte çalışan ölçüm betiği; sonuçları tek satır JSON olarak yazar
+STARTUP_PROBE = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+import fcm_sender
+timings = {'import': time.perf_counter() - started}
+mark = time.perf_counter()
+app = fcm_sender.FCMSender()
+timings['init'] = time.perf_counter() - mark
+mark = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    app.show_status()
+timings['status'] = time.perf_counter() - mark
+mark = time.perf_counter()
+project_key = next(iter(app.available_projects))
+app.ensure_token_project(project_key)
+name = app.store_token(project_key, 'Test', 'startup-probe-token', 'startup_probe')
+app.delete_token(project_key, 'Test', name)
+timings['tokens'] = time.perf_counter() - mark
+timings['total'] = time.perf_counter() - started
+app.token_store.close()
+app.shutdown_logging()
+loaded = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+print(json.dumps({'timings': timings, 'loaded': loaded}))
+"""
+
+
+def iter_fake_tokens(count: int) -> Iterator[str]:
+    """Belleğe liste almadan sahte token üret (kampanya dosyası okuma gibi)"""
+    for i in range(count):
+        yield f"bench{i:09d}{TOKEN_PADDING}"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    """Sürecin şimdiye kadarki en yüksek RSS değeri (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS byte döndürür
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def start_mock_server(args) -> (subprocess.Popen, str):
+    """Sahte sunucuyu ayrı süreçte başlat (GIL'i gönderim yoluyla paylaşmasın) ve adresini döndür"""
+    command = [sys.executable, str(Path(__file__).with_name('fcm_mock_server.py')), '--port', '0',
+               '--latency-ms', str(args.latency_ms), '--latency-jitter-ms', str(args.latency_jitter_ms),
+               '--unregistered-rate', str(args.unregistered_rate), '--quota-rate', str(args.quota_rate),
+               '--server-error-rate', str(args.server_error_rate), '--max-rps', str(args.max_rps)]
+    if args.seed is not None:
+        command += ['--seed', str(args.seed)]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    match = re.search(r'(http://\S+)', process.stdout.readline())
+    if not match:
+        process.kill()
+        raise RuntimeError("Sahte FCM sunucusu başlatılamadı")
+    return process, match.group(1)
+
+
+def stop_mock_server(process: subprocess.Popen) -> str:
+    """Sunucuyu durdur ve istek istatistiklerini döndür"""
+    process.send_signal(signal.SIGINT)
+    try:
+        output, _ = process.communicate(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        output, _ = process.communicate()
+    return output.strip()
+
+
+def run_scenario(app: FCMSender, firebase_app, size: int, batch_size: int, trace_memory: bool) -> dict:
+    """size token'lık kampanyayı partiler halinde gönder ve ölçümleri döndür"""
+    template = app.templates.get()
+    budget = RetryBudget(app.retry_budget_ratio)
+    latencies = []
+    success = failure = 0
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    for batch in iter_batches(iter_fake_tokens(size), batch_size):
+        batch_started = time.perf_counter()
+        try:
+            response = app._send_with_retries(firebase_app, batch, "Benchmark", "Gönderim yolu ölçümü",
+                                              {'bench': '1'}, template, budget=budget)
+        except Exception as e:
+            print(f"❌ Parti gönderilemedi: {e}")
+            failure += len(batch)
+            continue
+        latencies.append(time.perf_counter() - batch_started)
+        success += response.success_count
+        failure += response.failure_count
+
+    elapsed = time.perf_counter() - started
+    heap_peak = None
+    if trace_memory:
+        heap_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    return {
+        'size': size,
+        'elapsed': elapsed,
+        'rate': size / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'rss': peak_rss_mb(),
+        'heap': heap_peak,
+        'success': success,
+        'failure': failure,
+    }
+
+
+def print_report(results: List[dict], args):
+    print(f"\n📊 BENCHMARK SONUÇLARI (altyapı: {args.backend}, parti: {args.batch_size})")
+    print("=" * 100)
+    print(f"{'Token':>10} {'Süre (sn)':>10} {'Mesaj/sn':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} "
+          f"{'Tepe RSS (MB)':>14} {'Heap (MB)':>10} {'Başarılı':>10} {'Başarısız':>10}")
+    print("-" * 100)
+    for result in results:
+        heap = f"{result['heap']:.1f}" if result['heap'] is not None else "-"
+        print(f"{result['size']:>10} {result['elapsed']:>10.2f} {result['rate']:>10.0f} "
+              f"{result['p50'] * 1000:>10.1f} {result['p99'] * 1000:>10.1f} {result['rss']:>14.1f} {heap:>10} "
+              f"{result['success']:>10} {result['failure']:>10}")
+    print("=" * 100)
+    print("p50/p99: parti (multicast) başına gönderim süresi; Tepe RSS süreç genelindedir, boyutlar artan sırada çalışır")
+
+
+def run_startup_probe(workdir: Path) -> dict:
+    """Ölçüm betiğini taze bir Python sürecinde çalıştır"""
+    env = dict(os.environ)
+    repo_dir = str(Path(__file__).resolve().parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [repo_dir, env.get('PYTHONPATH')]))
+    result = subprocess.run([sys.executable, '-c', STARTUP_PROBE, json.dumps(STARTUP_FORBIDDEN_MODULES)],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Başlama ölçümü başarısız: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(args) -> int:
+    """Salt okunur komutların başlama süresini ölç; bütçe aşılırsa veya ağır modül yüklenirse 1 döndür"""
+    with tempfile.TemporaryDirectory(prefix='fcm_startup_') as workdir:
+        # Sahte anahtar yeterli: salt okunur yol anahtarı sadece proje listesi için okur
+        keys_dir = Path(workdir) / 'firebase_keys'
+        keys_dir.mkdir()
+        (keys_dir / 'startup-probe.json').write_text(json.dumps({'project_id': 'startup-probe'}), encoding='utf-8')
+
+        # İlk çalıştırma .pyc ve dosya yapısını oluşturur; ölçüme katılmaz
+        run_startup_probe(Path(workdir))
+        runs = [run_startup_probe(Path(workdir)) for _ in range(max(1, args.startup_runs))]
+
+    stages = ('import', 'init', 'status', 'tokens', 'total')
+    medians = {stage: statistics.median(run['timings'][stage] for run in runs) * 1000 for stage in stages}
+    loaded = sorted({name for run in runs for name in run['loaded']})
+
+    print(f"\n📊 BAŞLAMA SÜRESİ ({len(runs)} çalıştırma, medyan)")
+    print("=" * 50)
+    print(f"   • import fcm_sender: {medians['import']:.1f} ms")
+    print(f"   • FCMSender(): {medians['init']:.1f} ms")
+    print(f"   • show_status: {medians['status']:.1f} ms")
+    print(f"   • Token ekle/sil: {medians['tokens']:.1f} ms")
+    print(f"   • Toplam: {medians['total']:.1f} ms (bütçe: {args.startup_budget_ms:.0f} ms)")
+    print("=" * 50)
+
+    failed = False
+    if loaded:
+        print(f"❌ Salt okunur yolda yüklenen ağır modüller: {', '.join(loaded)}")
+        failed = True
+    if medians['total'] > args.startup_budget_ms:
+        print(f"❌ Başlama süresi bütçeyi aştı: {medians['total']:.1f} ms > {args.startup_budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Başlama süresi bütçe içinde")
+    return 1 if failed else 0
+
+
+def write_token_file(path: Path, count: int):
+    """device_tokens.json biçiminde count token'lık dosya yaz (her token'ın oluşturulma zamanı farklı)"""
+    now = datetime.now()
+    tokens = {category: {} for category in TOKEN_MEMORY_CATEGORIES}
+    for i, token in enumerate(iter_fake_tokens(count)):
+        category = TOKEN_MEMORY_CATEGORIES[i % len(TOKEN_MEMORY_CATEGORIES)]
+        name = f"{category}_{i + 1}"
+        created = (now - timedelta(seconds=i, microseconds=i % 1000000)).isoformat()
+        tokens[category][name] = {'token': token, 'name': name, 'created': created}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'bench': {'project_id': 'bench', 'display_name': 'bench', 'tokens': tokens}}, f)
+
+
+def measure_allocation(load) -> (float, float, object):
+    """load() sonucunun kalıcı bellek kullanımını (MB), tepe değeri (MB) ve sonucu döndür"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / (1024 * 1024), peak / (1024 * 1024), result
+
+
+def run_token_memory_benchmark(args) -> int:
+    """Token yapısının bellek kullanımını eski sözlük yapısı ve TokenRecord için ölç"""
+    count = args.token_count
+    with tempfile.TemporaryDirectory(prefix='fcm_tokens_') as workdir:
+        path = Path(workdir) / 'device_tokens.json'
+        print(f"⏱️  {count} token'lık dosya hazırlanıyor...")
+        write_token_file(path, count)
+
+        def load_legacy():
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        def build_index(data):
+            index = TokenIndex()
+            index.rebuild(data)
+            return index
+
+        results = []
+        for label, load in (("Sözlük (eski)", load_legacy), ("TokenRecord", JsonTokenStore(path).load)):
+            started = time.perf_counter()
+            current, peak, data = measure_allocation(load)
+            elapsed = time.perf_counter() - started
+            index_mb = None
+            if label == "TokenRecord":
+                index_mb, _, index = measure_allocation(lambda: build_index(data))
+                del index
+            results.append((label, current, peak, elapsed, index_mb))
+            del data
+
+    per_million = 1000000 / count
+    print(f"\n📊 TOKEN BELLEĞİ ({count} token, milyon token başına)")
+    print("=" * 80)
+    print(f"{'Yapı':<16} {'Yapı (MB)':>10} {'Tepe (MB)':>10} {'Bayt/token':>11} {'İndeks (MB)':>12} {'Yükleme (sn)':>13}")
+    print("-" * 80)
+    for label, current, peak, elapsed, index_mb in results:
+        index = f"{index_mb * per_million:.1f}" if index_mb is not None else "-"
+        print(f"{label:<16} {current * per_million:>10.1f} {peak * per_million:>10.1f} "
+              f"{current * 1024 * 1024 / count:>11.0f} {index:>12} {elapsed:>13.2f}")
+    print("=" * 80)
+    print("Yapı: yükleme sonrası kalıcı Python heap'i (token metinleri dahil); İndeks: TokenIndex ters indeksi")
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FCM gönderim yolu benchmark'ı")
+    parser.add_argument('--project', help="firebase_keys/ içindeki proje anahtarı (varsayılan: ilk proje)")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Virgülle ayrılmış kampanya boyutları")
+    parser.add_argument('--backend', choices=SEND_BACKENDS, default='async', help="Gönderim altyapısı")
+    parser.add_argument('--batch-size', type=int, default=500, help="Tek çağrıda gönderilen token sayısı")
+    parser.add_argument('--concurrency', type=int, default=4, help="sdk altyapısında eşzamanlı parça sayısı")
+    parser.add_argument('--max-retries', type=int, default=0, help="Geçici hatalar için yeniden deneme turu")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="İstemci tarafı hız sınırı (mesaj/sn)")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Senaryo başına Python heap tepe değerini ölç (gönderimi yavaşlatır)")
+    parser.add_argument('--api-base', help="Çalışan bir sunucu kullan (verilmezse sahte sunucu başlatılır)")
+    parser.add_argument('--startup', action='store_true',
+                        help="Gönderim yerine salt okunur komutların başlama süresini ölç")
+    parser.add_argument('--startup-runs', type=int, default=DEFAULT_STARTUP_RUNS, help="Başlama ölçümü tekrar sayısı")
+    parser.add_argument('--startup-budget-ms', type=float, default=DEFAULT_STARTUP_BUDGET_MS,
+                        help="Başlama süresi bütçesi (ms, medyan toplam)")
+    parser.add_argument('--token-memory', action='store_true',
+                        help="Gönderim yerine token deposunun bellek kullanımını ölç")
+    parser.add_argument('--token-count', type=int, default=DEFAULT_TOKEN_MEMORY_COUNT,
+                        help="Bellek ölçümündeki token sayısı")
+    add_server_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_arg_parser().parse_args(argv)
+    if args.startup:
+        return run_startup_benchmark(args)
+    if args.token_memory:
+        return run_token_memory_benchmark(args)
+    sizes = sorted(int(size) for size in args.sizes.split(',') if size.strip())
+
+    server, api_base = (None, args.api_base) if args.api_base else start_mock_server(args)
+    print(f"🧪 FCM adresi: {api_base}")
+
+    try:
+        app = FCMSender(send_concurrency=args.concurrency, send_backend=args.backend, fcm_api_base=api_base,
+                        max_retries=args.max_retries, rate_limit=args.rate_limit)
+        # Parti başına bilgi logları ölçümü kirletmesin
+        logging.getLogger().setLevel(logging.WARNING)
+
+        project_key = args.project or next(iter(app.available_projects), None)
+        if not project_key:
+            print("❌ Benchmark için firebase_keys/ altında bir proje gerekli")
+            return 1
+
+        results = []
+        with app.leased_firebase(project_key) as firebase_app:
+            if firebase_app is None:
+                return 1
+            for size in sizes:
+                print(f"⏱️  {size} token gönderiliyor...")
+                results.append(run_scenario(app, firebase_app, size, args.batch_size, args.tracemalloc))
+        print_report(results, args)
+        app.app_pool.close_all()
+        app.token_store.close()
+        app.shutdown_logging()
+    finally:
+        if server:
+            stats = stop_mock_server(server)
+            if stats:
+                print(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uzun süre çalışan HTTP servis modu
+Projeler, token'lar ve Firebase uygulamaları bir kez yüklenip sıcak tutulur; gönderim, token
+yönetimi ve durum istekleri yerel bir JSON API üzerinden eşzamanlı karşılanır:
+
+    python fcm_sender.py serve --port 8787
+    curl -X POST http://127.0.0.1:8787/send/tokens \\
+         -d '{"project": "proje1-firebase", "tokens": ["..."], "title": "Merhaba", "body": "Test"}'
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_DAEMON_HOST = '127.0.0.1'
+DEFAULT_DAEMON_PORT = 8787
+
+# Kabul edilen en büyük istek gövdesi (byte)
+MAX_REQUEST_BODY = 16 * 1024 * 1024
+
+# Yanıtta ayrıntısıyla döndürülecek en fazla başarısız token
+MAX_REPORTED_FAILURES = 100
+
+
+class DaemonError(Exception):
+    """İstemciye HTTP durum koduyla döndürülecek hata"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _require_string(payload: dict, key: str) -> str:
+    value = payload.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise DaemonError(400, f"'{key}' alanı boş olmayan bir metin olmalı")
+    return value.strip()
+
+
+def _optional_string_list(payload: dict, key: str) -> Optional[List[str]]:
+    """Verilmişse metin listesi olması gereken alanı döndür (boş veya eksikse None)"""
+    value = payload.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise DaemonError(400, f"'{key}' bir metin listesi olmalı")
+    return value or None
+
+
+class DaemonHTTPServer(ThreadingHTTPServer):
+    """Her isteği ayrı thread'de işleyen HTTP sunucusu"""
+
+    daemon_threads = True
+    # Varsayılan listen kuyruğu (5) eşzamanlı bağlantı patlamalarında SYN kayıplarına ve 1 sn gecikmeye yol açar
+    request_queue_size = 128
+
+
+class FCMDaemon:
+    """FCMSender örneğini sıcak tutup JSON API isteklerini eşzamanlı işler"""
+
+    def __init__(self, sender, host: str = DEFAULT_DAEMON_HOST, port: int = DEFAULT_DAEMON_PORT):
+        self.sender = sender
+        self.logger = sender.logger
+        self.host = host
+        self.port = port
+        self.started_at = time.time()
+        self._server = None
+
+    def warm_up(self) -> List[str]:
+        """Havuz kapasitesi kadar projenin Firebase uygulamasını önceden aç"""
+        # Servis modunda uygulamalar boşta kaldı diye kapatılmaz
+        self.sender.app_pool.idle_timeout = 0
+        warmed = []
+        for project_key in list(self.sender.available_projects)[:self.sender.app_pool.max_apps]:
+            try:
+                app = self._get_app(project_key)
+                if self.sender.send_backend == 'async':
+                    # OAuth token'ı ve SSL bağlamı ilk istekte değil şimdi hazırlanır
+                    self.sender._get_async_engine(app)
+                warmed.append(project_key)
+            except DaemonError as e:
+                self.logger.warning(f"Servis ısınması - {project_key}: {e}")
+        return warmed
+
+    def start(self) -> DaemonHTTPServer:
+        """Dinleyiciyi aç (serve_forever çağrılana kadar istek işlenmez)"""
+        self._server = DaemonHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self._server.server_address[1]
+        return self._server
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start_in_thread(self) -> str:
+        """Sunucuyu arka plan thread'inde başlat ve adresini döndür"""
+        self.start()
+        threading.Thread(target=self.serve_forever, name='fcm-daemon', daemon=True).start()
+        return f"http://{self.host}:{self.port}"
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # --- İstek yönlendirme ---
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], payload: dict):
+        """(durum kodu, JSON gövde) döndür"""
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+
+        if method == 'GET' and parts == ['status']:
+            return 200, self.status()
+        if method == 'POST' and parts == ['send', 'tokens']:
+            return 200, self.send_to_tokens(payload)
+        if method == 'POST' and parts == ['send', 'selection']:
+            return 200, self.send_to_selection(payload)
+        if method == 'POST' and parts == ['send', 'topic']:
+            return 200, self.send_to_topic(payload)
+
+        # /projects/<proje>/tokens[/<kategori>/<ad>]
+        if len(parts) >= 3 and parts[0] == 'projects' and parts[2] == 'tokens':
+            project_key = parts[1]
+            if len(parts) == 3 and method == 'GET':
+                return 200, self.list_tokens(project_key, query.get('category'))
+            if len(parts) == 3 and method == 'POST':
+                return 201, self.add_token(project_key, payload)
+            if len(parts) == 5 and method == 'PATCH':
+                return 200, self.rename_token(project_key, parts[3], parts[4], payload)
+            if len(parts) == 5 and method == 'DELETE':
+                return 200, self.remove_token(project_key, parts[3], parts[4])
+            raise DaemonError(405, f"Desteklenmeyen işlem: {method} {path}")
+
+        raise DaemonError(404, f"Bilinmeyen adres: {method} {path}")
+
+    # --- Gönderim ---
+
+    def _get_app(self, project_key: str, lease: bool = False):
+        project = self.sender.available_projects.get(project_key)
+        if not project:
+            raise DaemonError(404, f"Proje bulunamadı: {project_key}")
+        try:
+            if lease:
+                return self.sender.app_pool.acquire(project_key, project['file_path'])
+            return self.sender.app_pool.get(project_key, project['file_path'])
+        except Exception as e:
+            raise DaemonError(502, f"Firebase başlatılamadı: {e}")
+
+    @contextmanager
+    def _leased_app(self, project_key: str):
+        """Gönderim süresince projenin uygulamasını kirala; eşzamanlı istekler onu tahliye edemez"""
+        app = self._get_app(project_key, lease=True)
+        try:
+            yield app
+        finally:
+            self.sender.app_pool.release(project_key, app)
+
+    def _notification(self, payload: dict) -> tuple:
+        """İstekten (başlık, mesaj, veri, şablon) oluştur"""
+        title = _require_string(payload, 'title')
+        body = _require_string(payload, 'body')
+        data = payload.get('data') or {}
+        if not isinstance(data, dict):
+            raise DaemonError(400, "'data' alanı bir JSON nesnesi olmalı")
+        # FCM veri alanında sadece metin değer kabul eder
+        data = {str(key): value if isinstance(value, str) else json.dumps(value) for key, value in data.items()}
+        try:
+            template = self.sender.templates.get(payload.get('template') or 'default')
+        except (OSError, ValueError) as e:
+            raise DaemonError(400, str(e))
+        return title, body, data, template
+
+    def _idempotency_key(self, payload: dict) -> Optional[str]:
+        """İsteğe bağlı gönderim anahtarı; aynı anahtarla tekrarlanan istekte teslim edilmiş token'lar atlanır"""
+        key = payload.get('idempotency_key')
+        if key is not None and (not isinstance(key, str) or not key.strip()):
+            raise DaemonError(400, "'idempotency_key' boş olmayan bir metin olmalı")
+        return key.strip() if key else None
+
+    def _send_project(self, project_key: str, tokens: List[str], notification: tuple,
+                      idempotency_key: Optional[str] = None) -> dict:
+        """Bir projenin token'larını gönder, yanıtı işle ve özetini döndür"""
+        title, body, data, _ = notification
+        with self._leased_app(project_key) as app:
+            project_id = app.project_id
+            pending = self.sender._skip_delivered(idempotency_key, tokens)
+            skipped = len(tokens) - len(pending)
+            if not pending:
+                return {'project_id': project_id, 'success': 0, 'failure': 0, 'skipped': skipped, 'retried': 0,
+                        'duration': 0.0, 'failures': []}
+            tokens = pending
+            self.logger.info(f"Servis gönderimi - Proje: {project_id}, Token: {len(tokens)}, Başlık: {title}")
+
+            try:
+                response = self.sender._send_with_retries(app, tokens, *notification)
+            except Exception as e:
+                self.logger.error(f"KRITIK HATA - Servis gönderimi - Proje: {project_id}, Hata: {e}")
+                self.sender._save_critical_error(project_id, str(e), tokens, title, body, data)
+                self.sender._release_reserved(idempotency_key, tokens)
+                raise DaemonError(502, f"Bildirim gönderilemedi: {e}")
+
+        # Teslim kaydı önce yazılır; ayrılan token'lar yanıt işlenirken hata olsa da serbest kalır
+        self.sender._record_delivered(idempotency_key, tokens, response)
+        # Hata kayıtları ve temizlik adayları; depo değişiklikleri tokens_lock altında yapılır
+        self.sender._process_detailed_response(response, tokens, project_id, title, body, project_key)
+        self.sender._apply_token_prune()
+
+        failures = []
+        for idx, resp in enumerate(response.responses):
+            if not resp.success and len(failures) < MAX_REPORTED_FAILURES:
+                failures.append({
+                    'token': tokens[idx],
+                    'error_type': type(resp.exception).__name__ if resp.exception else 'Unknown',
+                    'error': str(resp.exception) if resp.exception else "Bilinmeyen hata"
+                })
+        return {
+            'project_id': project_id,
+            'success': response.success_count,
+            'failure': response.failure_count,
+            'skipped': skipped,
+            'retried': len(response.retry_counts),
+            'duration': round(response.duration, 4) if response.duration is not None else None,
+            'failures': failures
+        }
+
+    def send_to_tokens(self, payload: dict) -> dict:
+        project_key = _require_string(payload, 'project')
+        tokens = payload.get('tokens')
+        if not isinstance(tokens, list) or not tokens or not all(isinstance(token, str) for token in tokens):
+            raise DaemonError(400, "'tokens' boş olmayan bir metin listesi olmalı")
+        tokens = [token.strip() for token in tokens if token.strip()]
+        notification = self._notification(payload)
+        return {project_key: self._send_project(project_key, tokens, notification, self._idempotency_key(payload))}
+
+    def _selection_groups(self, payload: dict) -> Dict[str, List[str]]:
+        """Seçim anahtarlarını ('proje:kategori:ad') veya proje/kategori filtresini proje -> token listesine çözümle
+
+        Filtre seçimi depoda sorgu olarak çalışır (SQLite deposunda yapı belleğe alınmaz).
+        """
+        selection = payload.get('selection')
+        if selection is not None:
+            if not isinstance(selection, list):
+                raise DaemonError(400, "'selection' bir liste olmalı")
+            with self.sender.tokens_lock:
+                return self.sender._group_selection_by_project([str(key) for key in selection])
+
+        projects = _optional_string_list(payload, 'projects') or self.sender.token_store.project_keys()
+        categories = _optional_string_list(payload, 'categories')
+        groups = {}
+        for project_key in projects:
+            tokens = list(self.sender.iter_store_tokens(project_key, categories))
+            if tokens:
+                groups[project_key] = tokens
+        return groups
+
+    def send_to_selection(self, payload: dict) -> dict:
+        """Kayıtlı token seçimini proje bazında gruplayıp projeleri paralel gönder"""
+        notification = self._notification(payload)
+        idempotency_key = self._idempotency_key(payload)
+        groups = self._selection_groups(payload)
+        if not groups:
+            raise DaemonError(400, "Seçimde gönderilecek token yok")
+
+        results = {}
+        # Uygulamalar gönderim süresince kiralanır; işçi sayısı sadece havuzu taşırmamak içindir
+        with ThreadPoolExecutor(max_workers=min(len(groups), self.sender.app_pool.max_apps)) as executor:
+            futures = {project_key: executor.submit(self._send_project, project_key, tokens, notification, idempotency_key)
+                       for project_key, tokens in groups.items()}
+            for project_key, future in futures.items():
+                try:
+                    results[project_key] = future.result()
+                except DaemonError as e:
+                    results[project_key] = {'error': str(e), 'failure': len(groups[project_key]), 'success': 0}
+        return results
+
+    def send_to_topic(self, payload: dict) -> dict:
+        project_key = _require_string(payload, 'project')
+        topic = _require_string(payload, 'topic')
+        notification = self._notification(payload)
+        title, body, data, template = notification
+        idempotency_key = self._idempotency_key(payload)
+
+        with self._leased_app(project_key) as app:
+            if not self.sender._skip_delivered(idempotency_key, [f"/topics/{topic}"]):
+                return {'project_id': app.project_id, 'topic': topic, 'message_id': None, 'skipped': True}
+            self.logger.info(f"Servis topic gönderimi - Proje: {app.project_id}, Topic: {topic}")
+            try:
+                message_id = self.sender._send_topic_message(app, topic, title, body, data, template)
+            except Exception as e:
+                self.logger.error(f"KRITIK HATA - Servis topic gönderimi - Proje: {app.project_id}, Topic: {topic}, Hata: {e}")
+                self.sender._save_topic_error(app.project_id, topic, str(e), title, body, data)
+                self.sender._release_reserved(idempotency_key, [f"/topics/{topic}"])
+                raise DaemonError(502, f"Topic bildirimi gönderilemedi: {e}")
+        if idempotency_key:
+            self.sender.delivery_ledger().record(idempotency_key, [f"/topics/{topic}"])
+        return {'project_id': app.project_id, 'topic': topic, 'message_id': message_id, 'skipped': False}
+
+    # --- Token yönetimi ---
+
+    def _project_tokens(self, project_key: str) -> dict:
+        project = self.sender.device_tokens.get(project_key)
+        if project is None:
+            raise DaemonError(404, f"Projede token yapısı yok: {project_key}")
+        return project
+
+    def list_tokens(self, project_key: str, categories: Optional[List[str]] = None) -> dict:
+        with self.sender.tokens_lock:
+            project = self._project_tokens(project_key)
+            tokens = {category: {name: record.to_dict() for name, record in category_tokens.items()}
+                      for category, category_tokens in project['tokens'].items()
+                      if not categories or category in categories}
+            return {'project_id': project.get('project_id'), 'display_name': project.get('display_name'),
+                    'tokens': tokens}
+
+    def add_token(self, project_key: str, payload: dict) -> dict:
+        category = _require_string(payload, 'category')
+        token = _require_string(payload, 'token')
+        name = payload.get('name')
+        if name is not None and (not isinstance(name, str) or not name.strip()):
+            raise DaemonError(400, "'name' boş olmayan bir metin olmalı")
+
+        if project_key not in self.sender.device_tokens:
+            if project_key not in self.sender.available_projects:
+                raise DaemonError(404, f"Proje bulunamadı: {project_key}")
+            self.sender.ensure_token_project(project_key)
+        try:
+            token_name = self.sender.store_token(project_key, category, token, name.strip() if name else None)
+        except ValueError as e:
+            raise DaemonError(409, str(e))
+        return {'project': project_key, 'category': category, 'name': token_name}
+
+    def rename_token(self, project_key: str, category: str, token_name: str, payload: dict) -> dict:
+        new_name = _require_string(payload, 'name')
+        try:
+            self.sender.rename_stored_token(project_key, category, token_name, new_name)
+        except KeyError:
+            raise DaemonError(404, f"Token bulunamadı: {project_key}/{category}/{token_name}")
+        return {'project': project_key, 'category': category, 'name': new_name}
+
+    def remove_token(self, project_key: str, category: str, token_name: str) -> dict:
+        try:
+            self.sender.delete_token(project_key, category, token_name)
+        except KeyError:
+            raise DaemonError(404, f"Token bulunamadı: {project_key}/{category}/{token_name}")
+        return {'project': project_key, 'category': category, 'name': token_name, 'deleted': True}
+
+    # --- Durum ---
+
+    def status(self) -> dict:
+        sender = self.sender
+        warm = set(sender.app_pool.warm_projects())
+        sent = sender._sent_metric.values()
+        succeeded = sender._succeeded_metric.values()
+        token_counts = sender.project_token_counts()
+        projects = {}
+        for project_key, project in sender.available_projects.items():
+            project_id = project['project_id']
+            projects[project_key] = {
+                'project_id': project_id,
+                'display_name': project['display_name'],
+                'tokens': token_counts.get(project_key, 0),
+                'warm': project_key in warm,
+                'sent': sent.get((project_id,), 0),
+                'succeeded': succeeded.get((project_id,), 0)
+            }
+        return {
+            'uptime': round(time.time() - self.started_at, 1),
+            'backend': sender.send_backend,
+            'token_count': sum(token_counts.values()),
+            'warm_apps': len(warm),
+            'projects': projects
+        }
+
+    def _make_handler(self):
+        daemon = self
+
+        class DaemonHandler(BaseHTTPRequestHandler):
+            # Keep-alive: istemci aynı bağlantıyla ardışık istek gönderebilir
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self, method: str):
+                started = time.monotonic()
+                url = urlsplit(self.path)
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    if length > MAX_REQUEST_BODY:
+                        raise DaemonError(413, "İstek gövdesi çok büyük")
+                    raw = self.rfile.read(length) if length else b''
+                    try:
+                        payload = json.loads(raw) if raw else {}
+                    except ValueError:
+                        raise DaemonError(400, "Geçersiz JSON")
+                    if not isinstance(payload, dict):
+                        raise DaemonError(400, "İstek gövdesi bir JSON nesnesi olmalı")
+                    status, result = daemon.handle(method, url.path, parse_qs(url.query), payload)
+                except DaemonError as e:
+                    status, result = e.status, {'error': str(e)}
+                except Exception as e:
+                    daemon.logger.error(f"Servis isteği başarısız - {method} {url.path}: {e}")
+                    status, result = 500, {'error': str(e)}
+
+                body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                daemon.logger.info(f"Servis isteği - {method} {url.path} {status} "
+                                   f"({(time.monotonic() - started) * 1000:.1f} ms)")
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PATCH(self):
+                self._dispatch('PATCH')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, format, *args):
+                # İstekler yukarıda uygulama loguna yazılır
+                pass
+
+        return DaemonHandler
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teslim defteri (idempotency)
+Bir gönderim anahtarıyla (kampanya anahtarı) başarılı teslim edilen token'ları kaydeder; aynı
+anahtarla yapılan sonraki gönderimler bu token'ları atlar. Kayıtlar (anahtar, token) çiftinin
+16 baytlık özetidir ve süresi (TTL) dolunca silinir; milyonlarca alıcıda da bellek kullanımı sınırlıdır.
+Gönderim öncesi token'lar ayrılır (rezervasyon); aynı anahtarla eşzamanlı gelen ikinci gönderim
+uçuştaki token'ları atlar
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from fcm_queue import lease_owner, owner_alive
+
+DELIVERY_LEDGER_FILE = Path("delivery_ledger.db")
+
+# Teslim kaydının saklanma süresi (saniye)
+DEFAULT_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Süresi dolan kayıtların en sık temizlenme aralığı (saniye)
+EVICTION_INTERVAL = 60
+
+# Tek sorguda aranan özet sayısı (SQLite parametre sınırının altında)
+LOOKUP_CHUNK_SIZE = 500
+
+# Bu süreden eski rezervasyon, sahibi canlı görünse de devralınır (saniye)
+RESERVATION_TIMEOUT = 15 * 60
+
+
+def delivery_key(idempotency_key: str, token: str) -> bytes:
+    """(anahtar, token) çiftinin sabit boyutlu özeti"""
+    return hashlib.blake2b(f"{idempotency_key}\n{token}".encode('utf-8'), digest_size=16).digest()
+
+
+class DeliveryLedger:
+    """SQLite (WAL) üzerinde süreli teslim kayıtları"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS deliveries (
+            key BLOB PRIMARY KEY,
+            delivered_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_deliveries_time ON deliveries (delivered_at);
+        -- Gönderimi süren (henüz teslim edilmemiş) token'lar; holder: makine:pid
+        CREATE TABLE IF NOT EXISTS reservations (
+            key BLOB PRIMARY KEY,
+            holder TEXT NOT NULL,
+            reserved_at REAL NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: Path = DELIVERY_LEDGER_FILE, ttl: float = DEFAULT_IDEMPOTENCY_TTL):
+        self.path = Path(path)
+        self.ttl = max(0.0, ttl)
+        self.holder = lease_owner()
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        self.evict_expired()
+
+    def close(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM reservations WHERE holder = ?", (self.holder,))
+            self._conn.close()
+
+    def pending(self, idempotency_key: str, tokens: List[str]) -> List[str]:
+        """Bu anahtarla henüz teslim edilmemiş token'ları sırayı koruyarak döndür"""
+        if not tokens:
+            return []
+        keys = [delivery_key(idempotency_key, token) for token in tokens]
+        cutoff = time.time() - self.ttl
+        delivered = set()
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT key FROM deliveries WHERE key IN ({','.join('?' * len(chunk))}) AND delivered_at >= ?",
+                    (*chunk, cutoff)).fetchall()
+                delivered.update(row[0] for row in rows)
+        if not delivered:
+            return list(tokens)
+        return [token for token, key in zip(tokens, keys) if key not in delivered]
+
+    def reserve(self, idempotency_key: str, tokens: List[str]) -> Tuple[List[str], List[str]]:
+        """Teslim edilmemiş token'ları bu süreç adına ayır
+
+        (ayrılan, uçuştaki) döndürür: uçuştaki token'lar aynı anahtarla başka bir gönderimde ayrılmıştır.
+        Ayrılan token'lar record() ile teslim edildi olarak işaretlenmeli veya release() ile bırakılmalıdır.
+        """
+        # Ön eleme; kesin kontrol aşağıda rezervasyonla aynı transaction'da yapılır
+        pending = self.pending(idempotency_key, tokens)
+        if not pending:
+            return [], []
+        keys = [delivery_key(idempotency_key, token) for token in pending]
+        now = time.time()
+        cutoff = now - self.ttl
+        reserved = set()
+        delivered = set()
+        with self._lock, self._conn:
+            for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+                # Çökmüş süreçten veya zaman aşımından kalan rezervasyonlar devralınır
+                stale = [(key, holder) for key, holder, reserved_at in self._conn.execute(
+                            f"SELECT key, holder, reserved_at FROM reservations WHERE key IN ({','.join('?' * len(chunk))})",
+                            chunk)
+                         if reserved_at < now - RESERVATION_TIMEOUT or not owner_alive(holder)]
+                self._conn.executemany("DELETE FROM reservations WHERE key = ? AND holder = ?", stale)
+                # Ön elemeden sonra başka bir gönderimin record() ile teslim ettiği token ayrılmaz
+                for key in chunk:
+                    if self._conn.execute(
+                            "INSERT OR IGNORE INTO reservations (key, holder, reserved_at) SELECT ?, ?, ? "
+                            "WHERE NOT EXISTS (SELECT 1 FROM deliveries WHERE key = ? AND delivered_at >= ?)",
+                            (key, self.holder, now, key, cutoff)).rowcount:
+                        reserved.add(key)
+                missed = [key for key in chunk if key not in reserved]
+                if missed:
+                    delivered.update(row[0] for row in self._conn.execute(
+                        f"SELECT key FROM deliveries WHERE key IN ({','.join('?' * len(missed))}) AND delivered_at >= ?",
+                        (*missed, cutoff)))
+        if len(reserved) == len(keys):
+            return pending, []
+        return ([token for token, key in zip(pending, keys) if key in reserved],
+                [token for token, key in zip(pending, keys) if key not in reserved and key not in delivered])
+
+    def release(self, idempotency_key: str, tokens: Iterable[str]):
+        """Teslim edilemeyen token'ların rezervasyonunu bırak (sonraki gönderim yeniden dener)"""
+        rows = [(delivery_key(idempotency_key, token), self.holder) for token in tokens]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM reservations WHERE key = ? AND holder = ?", rows)
+
+    def record(self, idempotency_key: str, tokens: Iterable[str]):
+        """Teslim edilen token'ları kaydet (rezervasyonları kalkar)"""
+        now = time.time()
+        rows = [(delivery_key(idempotency_key, token), now) for token in tokens]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO deliveries (key, delivered_at) VALUES (?, ?)", rows)
+            self._conn.executemany("DELETE FROM reservations WHERE key = ?", [(key,) for key, _ in rows])
+        if now - self._last_eviction >= EVICTION_INTERVAL:
+            self.evict_expired()
+
+    def evict_expired(self) -> int:
+        """Süresi dolan kayıtları sil ve silinen kayıt sayısını döndür"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._last_eviction = now
+            self._conn.execute("DELETE FROM reservations WHERE reserved_at < ?", (now - RESERVATION_TIMEOUT,))
+            return self._conn.execute("DELETE FROM deliveries WHERE delivered_at < ?", (now - self.ttl,)).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
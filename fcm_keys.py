@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Firebase key dosyası önbellekleri
+Key dosyalarının project_id bilgisi yol + mtime + boyut ile diske yazılır; değişmeyen dosyalar
+başlangıçta yeniden okunmaz. Ayrıştırılmış kimlik bilgileri (Certificate) süreç içinde tutulur
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# Key dosyası özetlerinin (project_id) saklandığı dosya
+KEY_METADATA_CACHE_FILE = Path("firebase_keys_cache.json")
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    """Dosyanın değişip değişmediğini anlamak için (mtime_ns, boyut)"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class KeyMetadataCache:
+    """Key dosyası yolu -> {mtime_ns, size, project_id}; imza tutmayan kayıt yok sayılır"""
+
+    def __init__(self, path: Path = KEY_METADATA_CACHE_FILE, logger=None):
+        self.path = Path(path)
+        self.logger = logger
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self._entries = entries
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            # Bozuk önbellek sadece yeniden okumaya yol açar
+            self._dirty = True
+            if self.logger:
+                self.logger.warning(f"{self.path} okunamadı, key dosyaları yeniden okunacak: {e}")
+
+    def lookup(self, key_file: Path, signature: Tuple[int, int]) -> Optional[dict]:
+        """Dosya değişmediyse önbellekteki özeti döndür"""
+        entry = self._entries.get(str(key_file))
+        if entry and (entry.get('mtime_ns'), entry.get('size')) == signature:
+            return entry
+        return None
+
+    def store(self, key_file: Path, signature: Tuple[int, int], project_id: str):
+        self._entries[str(key_file)] = {'mtime_ns': signature[0], 'size': signature[1], 'project_id': project_id}
+        self._dirty = True
+
+    def retain(self, key_files: Iterable[Path]):
+        """Artık bulunmayan dosyaların kayıtlarını at"""
+        present = {str(key_file) for key_file in key_files}
+        for stale in [name for name in self._entries if name not in present]:
+            del self._entries[stale]
+            self._dirty = True
+
+    def save(self):
+        """Değişiklik varsa önbelleği atomik olarak yaz"""
+        if not self._dirty:
+            return
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            # Önbellek yazılamazsa sadece bir sonraki başlangıç yavaşlar
+            if self.logger:
+                self.logger.warning(f"{self.path} yazılamadı: {e}")
+
+
+class CredentialCache:
+    """Key dosyası başına en fazla bir Certificate; dosya değişirse yeniden oluşturulur"""
+
+    def __init__(self):
+        self._credentials: Dict[str, tuple] = {}  # yol -> (imza, Certificate)
+        self._lock = threading.Lock()
+
+    def get(self, key_file: Path):
+        """Dosyanın kimlik bilgisini döndür (firebase_admin ilk çağrıda yüklenir)"""
+        signature = file_signature(key_file)
+        with self._lock:
+            entry = self._credentials.get(str(key_file))
+            if entry and entry[0] == signature:
+                return entry[1]
+            from firebase_admin import credentials
+            credential = credentials.Certificate(str(key_file))
+            self._credentials[str(key_file)] = (signature, credential)
+            return credential
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._credentials)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Süreç içi metrik kaydı
+Sayaç, gösterge ve histogramları thread-safe tutar; Prometheus metin biçiminde küçük bir
+yerel HTTP dinleyicisinden (/metrics) ve show_status özetinden sunulur
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Saniye cinsinden varsayılan gecikme kovaları
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Etiketli metriklerin ortak tabanı"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        """(örnek adı, etiket değerleri, değer) listesi"""
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for sample_name, key, value, *extra in self.samples():
+            # Histogram kovaları ek 'le' etiketi taşır
+            lines.append(f"{sample_name}{_format_labels(self.label_names, key, *extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Sadece artan sayaç"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """Anlık değer; callback verilirse değerler her okumada hesaplanır"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def values(self) -> Dict[Tuple, float]:
+        if self.callback:
+            return dict(self.callback())
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self.values().items()]
+
+
+class Histogram(Metric):
+    """Kovalı dağılım (Prometheus histogramı)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def stats(self) -> Dict[Tuple, Tuple[int, float]]:
+        """Etiket değerleri -> (gözlem sayısı, toplam)"""
+        with self._lock:
+            return {key: (entry[2], entry[1]) for key, entry in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            entries = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        samples = []
+        for key, bucket_counts, total, count in entries:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key, cumulative, f'le="{_format_value(bound)}"'))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """İsimle kayıtlı metrikler; aynı ad ikinci kez istenirse mevcut metrik döner"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[Tuple, float]]] = None) -> Gauge:
+        return self._register(Gauge, name, help_text, label_names, callback=callback)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """Tüm metrikleri Prometheus metin biçiminde döndür"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = '127.0.0.1') -> "ThreadingHTTPServer":
+    """/metrics adresini arka plan thread'inde sun"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Her scrape'i loglama
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yerel sahte FCM HTTP v1 sunucusu
+messaging.send / send_each_for_multicast ve asenkron motorun ürettiği istekleri kabul eder;
+gecikme, hata karışımı (Unregistered, QuotaExceeded, 5xx) ve saniye başına istek sınırı ayarlanabilir.
+Gönderim yolunu gerçek Firebase'e gitmeden ölçmek için kullanılır:
+
+    python fcm_mock_server.py --port 8089 --latency-ms 20 --unregistered-rate 0.01
+    python fcm_sender.py --fcm-api-base http://127.0.0.1:8089 campaign --spec kampanya.json --recipients alicilar.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+SEND_PATH = re.compile(r'^/v1/projects/([^/]+)/messages:send$')
+
+FCM_ERROR_TYPE = 'type.googleapis.com/google.firebase.fcm.v1.FcmError'
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def _error_body(code: int, status: str, message: str, error_code: Optional[str] = None) -> dict:
+    """FCM v1 hata gövdesi"""
+    error = {'code': code, 'message': message, 'status': status}
+    if error_code:
+        error['details'] = [{'@type': FCM_ERROR_TYPE, 'errorCode': error_code}]
+    return {'error': error}
+
+
+class MockFCMServer:
+    """asyncio tabanlı, keep-alive destekli minimal HTTP/1.1 FCM v1 sunucusu"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, latency_jitter: float = 0.0,
+                 unregistered_rate: float = 0.0, quota_rate: float = 0.0, server_error_rate: float = 0.0,
+                 max_rps: int = 0, seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.latency = max(0.0, latency)
+        self.latency_jitter = max(0.0, latency_jitter)
+        self.unregistered_rate = unregistered_rate
+        self.quota_rate = quota_rate
+        self.server_error_rate = server_error_rate
+        # Saniye başına kabul edilen en fazla istek; aşılırsa 429 QUOTA_EXCEEDED
+        self.max_rps = max(0, max_rps)
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self._window = 0
+        self._window_count = 0
+        self._message_id = 0
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Sunucuyu mevcut event loop'ta başlat"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """start() ile açılan sunucuyu kapatılana kadar çalıştır"""
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> str:
+        """Sunucuyu arka plan thread'inde kendi event loop'uyla başlat ve adresini döndür"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='mock-fcm', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self):
+        """Arka plan thread'inde çalışan sunucuyu durdur"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # Küçük yanıtlar Nagle algoritması yüzünden bekletilmesin
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) < 2:
+                    break
+                method, path = parts[0], parts[1]
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+                status, payload, extra_headers = await self._respond(method, path, body)
+
+                data = json.dumps(payload).encode('utf-8')
+                head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+                        'Content-Type: application/json; charset=UTF-8',
+                        f"Content-Length: {len(data)}"]
+                head.extend(f"{name}: {value}" for name, value in extra_headers.items())
+                # Başlık ve gövde tek yazımda gönderilir
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # İstemci bağlantıyı kapattı veya sunucu durduruluyor
+            pass
+        finally:
+            writer.close()
+
+    def _over_rate_limit(self) -> bool:
+        if not self.max_rps:
+            return False
+        window = int(time.monotonic())
+        if window != self._window:
+            self._window = window
+            self._window_count = 0
+        self._window_count += 1
+        return self._window_count > self.max_rps
+
+    async def _respond(self, method: str, path: str, body: bytes):
+        """İsteği değerlendir: (durum kodu, JSON gövde, ek başlıklar)"""
+        match = SEND_PATH.match(path)
+        if method != 'POST' or not match:
+            self.stats['not_found'] += 1
+            return 404, _error_body(404, 'NOT_FOUND', f"Bilinmeyen adres: {path}"), {}
+
+        try:
+            message = json.loads(body).get('message') or {}
+        except (ValueError, AttributeError):
+            message = {}
+        if not (message.get('token') or message.get('topic') or message.get('condition')):
+            self.stats['invalid_argument'] += 1
+            return 400, _error_body(400, 'INVALID_ARGUMENT', 'Mesajda hedef yok', 'INVALID_ARGUMENT'), {}
+
+        delay = self.latency
+        if self.latency_jitter:
+            delay = max(0.0, delay + self.random.uniform(-self.latency_jitter, self.latency_jitter))
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self._over_rate_limit():
+            self.stats['rate_limited'] += 1
+            return 429, _error_body(429, 'RESOURCE_EXHAUSTED', 'Kota aşıldı', 'QUOTA_EXCEEDED'), {'Retry-After': '1'}
+
+        roll = self.random.random()
+        if roll < self.unregistered_rate:
+            self.stats['unregistered'] += 1
+            return 404, _error_body(404, 'NOT_FOUND', 'Requested entity was not found.', 'UNREGISTERED'), {}
+        roll -= self.unregistered_rate
+        if roll < self.quota_rate:
+            self.stats['quota_exceeded'] += 1
+            return 429, _error_body(429, 'RESOURCE_EXHAUSTED', 'Kota aşıldı', 'QUOTA_EXCEEDED'), {'Retry-After': '1'}
+        roll -= self.quota_rate
+        if roll < self.server_error_rate:
+            self.stats['unavailable'] += 1
+            return 503, _error_body(503, 'UNAVAILABLE', 'Servis geçici olarak kullanılamıyor', 'UNAVAILABLE'), {}
+
+        self._message_id += 1
+        self.stats['ok'] += 1
+        return 200, {'name': f"projects/{match.group(1)}/messages/{self._message_id}"}, {}
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Sunucu davranış ayarlarını argparse'a ekle (sunucu ve benchmark ortak kullanır)"""
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="İstek başına yapay gecikme (ms)")
+    parser.add_argument('--latency-jitter-ms', type=float, default=0.0, help="Gecikmeye eklenecek ± rastgele sapma (ms)")
+    parser.add_argument('--unregistered-rate', type=float, default=0.0, help="UNREGISTERED dönen istek oranı (0-1)")
+    parser.add_argument('--quota-rate', type=float, default=0.0, help="QUOTA_EXCEEDED dönen istek oranı (0-1)")
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help="503 UNAVAILABLE dönen istek oranı (0-1)")
+    parser.add_argument('--max-rps', type=int, default=0, help="Saniye başına kabul edilen en fazla istek (0: sınırsız)")
+    parser.add_argument('--seed', type=int, help="Hata karışımı için rastgelelik tohumu")
+
+
+def server_from_args(args, host: str = '127.0.0.1', port: int = 0) -> MockFCMServer:
+    return MockFCMServer(host, port, latency=args.latency_ms / 1000, latency_jitter=args.latency_jitter_ms / 1000,
+                         unregistered_rate=args.unregistered_rate, quota_rate=args.quota_rate,
+                         server_error_rate=args.server_error_rate, max_rps=args.max_rps, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yerel sahte FCM HTTP v1 sunucusu")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089, help="Dinlenecek port (0: rastgele)")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.host, args.port)
+
+    async def run():
+        await server.start()
+        # Benchmark alt süreci adresi bu satırdan okur
+        print(f"🧪 Sahte FCM sunucusu: {server.base_url}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"\n📊 İstekler: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gönderim aşaması zamanlayıcısı ve profil çıkarıcı
+Bir gönderimin Firebase başlatma, mesaj oluşturma, ağ, yanıt işleme ve kayıt yazma aşamalarında
+geçen süreyi toplar; istenirse gönderimi cProfile altında çalıştırıp sonucu dosyaya yazar
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Rapordaki aşama sırası ve adları
+SEND_STAGES = (
+    ('firebase_init', 'Firebase başlatma'),
+    ('dedup', 'Teslim defteri'),
+    ('build', 'Mesaj oluşturma'),
+    ('rate_limit', 'Hız sınırı beklemesi'),
+    ('network', 'Ağ (gönderim)'),
+    ('retry_wait', 'Yeniden deneme beklemesi'),
+    ('process', 'Yanıt işleme'),
+    ('journal', 'JSONL kayıtları'),
+    ('persist', 'Token kaydı'),
+)
+STAGE_LABELS = dict(SEND_STAGES)
+
+# Profil özet dosyasına yazılacak fonksiyon sayısı
+PROFILE_TOP_FUNCTIONS = 40
+
+# Süren gönderimin zamanlayıcısı; her thread kendi bağlamında sadece kendi gönderimini görür
+_active_timer: ContextVar[Optional['SendTimer']] = ContextVar('fcm_send_timer', default=None)
+
+
+def active_timer() -> Optional['SendTimer']:
+    """Bu thread'de süren gönderimin zamanlayıcısı (yoksa None)"""
+    return _active_timer.get()
+
+
+class SendProfiler:
+    """Gönderimi çağıran thread'de cProfile ile profille; gönderimin kendi worker'ları run_in_thread ile eklenir"""
+
+    def __init__(self, output_dir: Path, label: str):
+        # cProfile/pstats sadece --profile ile yüklenir
+        import cProfile
+        self._profile_class = cProfile.Profile
+        self.path = Path(output_dir) / f"profile_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+        self._main = cProfile.Profile()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+
+    def run_in_thread(self, fn, *args, **kwargs):
+        """fn'i bulunduğu worker thread'de ayrı bir profille ölç (başka gönderimlerin thread'leri ölçülmez)"""
+        profile = self._profile_class()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    def start(self):
+        self._main.enable()
+
+    def pause(self):
+        self._main.disable()
+
+    def resume(self):
+        self._main.enable()
+
+    def stop(self) -> Optional[Path]:
+        """Profili bitir; .prof dosyasını ve en pahalı fonksiyonların metin özetini yaz"""
+        import io
+        import pstats
+        self._main.disable()
+
+        stats = None
+        with self._lock:
+            profiles = [self._main] + self._thread_profiles
+        for profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if stats is None:
+            return None
+
+        stats.dump_stats(self.path)
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        self.path.with_suffix('.txt').write_text(summary.getvalue(), encoding='utf-8')
+        return self.path
+
+
+class SendTimer:
+    """Bir gönderimin aşama sürelerini toplar; iç içe aşamalarda süre en içteki aşamaya yazılır"""
+
+    def __init__(self, label: str, profiler: Optional[SendProfiler] = None):
+        self.label = label
+        self.profiler = profiler
+        # Aşama -> [toplam süre, çağrı sayısı]; bind ile bağlanan worker thread'ler aynı sözlüğe yazar
+        self.stages = {}
+        self.elapsed = 0.0
+        self._started = None
+        self._paused = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._token = None
+
+    def start(self):
+        """Ölçümü başlat ve zamanlayıcıyı bu thread'in etkin zamanlayıcısı yap"""
+        self._token = _active_timer.set(self)
+        self._started = time.perf_counter()
+        if self.profiler:
+            self.profiler.start()
+
+    def stop(self) -> Optional[Path]:
+        """Ölçümü bitir; profil açıksa yazılan dosyanın yolunu döndür"""
+        self.elapsed = time.perf_counter() - self._started - self._paused
+        _active_timer.reset(self._token)
+        if self.profiler:
+            return self.profiler.stop()
+        return None
+
+    def bind(self, fn):
+        """fn'i worker thread'de bu gönderimin zamanlayıcısıyla (ve açıksa profiliyle) çalışacak şekilde sar"""
+        def run(*args, **kwargs):
+            token = _active_timer.set(self)
+            try:
+                if self.profiler:
+                    return self.profiler.run_in_thread(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            finally:
+                _active_timer.reset(token)
+        return run
+
+    @contextmanager
+    def span(self, name: str):
+        stack = self._local.__dict__.setdefault('stack', [])
+        # [iç aşamalarda geçen süre]
+        entry = [0.0]
+        stack.append(entry)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1][0] += duration
+            with self._lock:
+                stage = self.stages.setdefault(name, [0.0, 0])
+                stage[0] += duration - entry[0]
+                stage[1] += 1
+
+    @contextmanager
+    def paused(self):
+        """Kullanıcı girişi gibi ölçüme girmemesi gereken bölüm"""
+        if self.profiler:
+            self.profiler.pause()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._paused += time.perf_counter() - started
+            if self.profiler:
+                self.profiler.resume()
+
+    def breakdown(self) -> List[Tuple[str, float, int]]:
+        """(aşama, toplam süre, çağrı sayısı) listesi, rapor sırasıyla"""
+        order = {name: i for i, (name, _) in enumerate(SEND_STAGES)}
+        with self._lock:
+            items = [(name, total, count) for name, (total, count) in self.stages.items()]
+        return sorted(items, key=lambda item: order.get(item[0], len(order)))
+
+    def summary(self) -> str:
+        """Tek satırlık süre dağılımı (loglar için)"""
+        parts = [f"{name}: {total * 1000:.1f} ms" for name, total, _ in self.breakdown()]
+        return f"Toplam: {self.elapsed * 1000:.1f} ms, " + ', '.join(parts)
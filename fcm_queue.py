@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kalıcı giden mesaj kuyruğu
+Kampanyalar SQLite'a parça (job) olarak yazılır; worker havuzu parçaları kiralar, gönderir ve
+onaylar. Süreç çökerse onaylanmamış kiraları yeniden başlatmada (sahibi bu makinede artık
+çalışmıyorsa) veya kira süresi dolunca başka worker devralır; bir parça en az bir kez gönderilir
+(çökme anında uçuştaki parça tekrar gönderilebilir)
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+OUTBOUND_QUEUE_FILE = Path("outbound_queue.db")
+
+# Parça başına token sayısı (FCM multicast sınırı)
+DEFAULT_JOB_SIZE = 500
+
+# Kiralama süresi; worker bu sürede onaylamazsa parça başka worker'a verilir
+DEFAULT_LEASE_SECONDS = 300.0
+
+# Kalıcı hata sayılmadan önce bir parçanın en fazla deneme sayısı
+DEFAULT_MAX_ATTEMPTS = 5
+
+DEFAULT_QUEUE_WORKERS = 4
+
+JOB_STATES = ('pending', 'leased', 'done', 'failed')
+
+
+def lease_owner() -> str:
+    """Bu sürecin kira sahibi kimliği (makine:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """Kira sahibi (makine:pid) süreç hâlâ çalışıyor mu; başka makinedeki sahipler canlı sayılır"""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+        return True
+    if os.name == 'nt':
+        # Windows'ta os.kill süreci sonlandırır; kira süresinin dolması beklenir
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # İzin hatası: süreç var ama başka kullanıcıya ait
+        return True
+    return True
+
+
+class QueueJob:
+    """Kiralanmış kuyruk parçası"""
+
+    __slots__ = ('id', 'campaign_id', 'seq', 'tokens', 'attempts')
+
+    def __init__(self, job_id: int, campaign_id: str, seq: int, tokens: List[str], attempts: int):
+        self.id = job_id
+        self.campaign_id = campaign_id
+        self.seq = seq
+        self.tokens = tokens
+        self.attempts = attempts
+
+
+class OutboundQueue:
+    """SQLite (WAL) üzerinde kampanya ve parça kayıtları"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS campaigns (
+            id TEXT PRIMARY KEY,
+            spec TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            job_count INTEGER NOT NULL DEFAULT 0,
+            token_count INTEGER NOT NULL DEFAULT 0
+        );
+        -- tokens: satır sonu ile ayrılmış token listesi (onaylanınca boşaltılır)
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            campaign_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            tokens TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            success INTEGER,
+            failure INTEGER,
+            error TEXT,
+            updated_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_campaign ON jobs (campaign_id, state);
+    """
+
+    def __init__(self, path: Path = OUTBOUND_QUEUE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Diğer süreçler yazarken kısa süre beklenir
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, spec: dict, tokens: Iterable[str], job_size: int = DEFAULT_JOB_SIZE) -> str:
+        """Kampanyayı parçalara bölüp tek transaction'da kuyruğa yaz ve kampanya ID'sini döndür"""
+        campaign_id = uuid.uuid4().hex[:16]
+        job_size = max(1, job_size)
+        now = time.time()
+        job_count = token_count = 0
+
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO campaigns (id, spec, created_at) VALUES (?, ?, ?)",
+                               (campaign_id, json.dumps(spec, ensure_ascii=False), now))
+            batch = []
+            for token in tokens:
+                batch.append(token)
+                if len(batch) == job_size:
+                    self._insert_job(campaign_id, job_count, batch, now)
+                    job_count += 1
+                    token_count += len(batch)
+                    batch = []
+            if batch or (job_count == 0 and spec.get('topic')):
+                # Topic kampanyası token'sız tek parça olarak yazılır
+                self._insert_job(campaign_id, job_count, batch, now)
+                job_count += 1
+                token_count += len(batch)
+            self._conn.execute("UPDATE campaigns SET job_count = ?, token_count = ? WHERE id = ?",
+                               (job_count, token_count, campaign_id))
+        return campaign_id
+
+    def _insert_job(self, campaign_id: str, seq: int, tokens: List[str], now: float):
+        self._conn.execute(
+            "INSERT INTO jobs (campaign_id, seq, tokens, token_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (campaign_id, seq, '\n'.join(tokens), len(tokens), now))
+
+    def campaign_spec(self, campaign_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT spec FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lease(self, owner: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[QueueJob]:
+        """Sıradaki bekleyen (veya kirası dolmuş) parçayı kirala"""
+        now = time.time()
+        with self._lock, self._conn:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE state = 'pending' ORDER BY id LIMIT 1").fetchone()
+                if row is None:
+                    row = self._conn.execute(
+                        "SELECT id FROM jobs WHERE state = 'leased' AND lease_expires < ? ORDER BY id LIMIT 1",
+                        (now,)).fetchone()
+                if row is None:
+                    return None
+
+                # Başka bir süreç araya girip parçayı kiraladıysa (süresi dolmuş kira yenilendiyse de)
+                # koşul tutmaz; sıradaki parçayı dene
+                job = self._conn.execute(
+                    "UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                    "RETURNING id, campaign_id, seq, tokens, attempts",
+                    (owner, now + lease_seconds, now, row[0], now)).fetchone()
+                if job:
+                    tokens = job[3].split('\n') if job[3] else []
+                    return QueueJob(job[0], job[1], job[2], tokens, job[4])
+
+    def extend_leases(self, job_ids: List[int], owner: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """Uzun süren parçaların kirasını yenile"""
+        if not job_ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                [(time.time() + lease_seconds, job_id, owner) for job_id in job_ids])
+
+    def ack(self, job_id: int, success: int, failure: int):
+        """Parçayı tamamlandı olarak işaretle (token listesi artık gerekmez)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'done', tokens = '', success = ?, failure = ?, error = NULL, "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (success, failure, time.time(), job_id))
+
+    def fail(self, job_id: int, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        """Gönderilemeyen parçayı yeniden kuyruğa al; deneme hakkı bittiyse 'failed' yap ve yeni durumu döndür"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (max_attempts, error, time.time(), job_id))
+            row = self._conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else 'failed'
+
+    def requeue_stale_leases(self) -> int:
+        """Kirası dolmuş veya bu makinede artık çalışmayan süreçlere ait kiraları kuyruğa geri al
+
+        Aynı dosyayı paylaşan canlı bir `queue run` sürecinin kiralarına dokunulmaz; başka makinedeki
+        sahiplerin kiraları ancak süresi dolunca devralınır.
+        """
+        now = time.time()
+        # Bu süreç henüz kiralama yapmadı; kendi kimliğindeki kira aynı PID'li önceki çalıştırmadan kalmıştır
+        current = lease_owner()
+        with self._lock, self._conn:
+            stale = [(now, job_id, owner, expires) for job_id, owner, expires in self._conn.execute(
+                        "SELECT id, lease_owner, lease_expires FROM jobs WHERE state = 'leased'")
+                     if expires is None or expires < now or owner == current or not owner_alive(owner)]
+            # Seçim ile güncelleme arasında kira el değiştirdiyse satır güncellenmez
+            cursor = self._conn.executemany(
+                "UPDATE jobs SET state = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND state = 'leased' AND lease_owner IS ? AND lease_expires IS ?", stale)
+            return cursor.rowcount
+
+    def has_work(self) -> bool:
+        """Bekleyen veya kiralanmış parça var mı"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+        return row is not None
+
+    def status(self, campaign_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Durum -> {'jobs', 'tokens', 'success', 'failure'} (isteğe bağlı tek kampanya için)"""
+        query = ("SELECT state, COUNT(*), SUM(token_count), SUM(COALESCE(success, 0)), SUM(COALESCE(failure, 0)) "
+                 "FROM jobs")
+        args = ()
+        if campaign_id:
+            query += " WHERE campaign_id = ?"
+            args = (campaign_id,)
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY state", args).fetchall()
+        return {state: {'jobs': jobs, 'tokens': tokens or 0, 'success': success, 'failure': failure}
+                for state, jobs, tokens, success, failure in rows}
+
+    def campaigns(self, limit: int = 20, campaign_id: Optional[str] = None) -> List[Tuple[str, dict, float, int, int]]:
+        """Son kampanyalar: (id, tanım, oluşturulma zamanı, parça sayısı, token sayısı)"""
+        query = "SELECT id, spec, created_at, job_count, token_count FROM campaigns"
+        args = (limit,)
+        if campaign_id:
+            query += " WHERE id = ?"
+            args = (campaign_id, limit)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", args).fetchall()
+        return [(campaign_id, json.loads(spec), created_at, job_count, token_count)
+                for campaign_id, spec, created_at, job_count, token_count in rows]
+
+
+class QueueWorkerPool:
+    """Kuyruktan parça kiralayıp handler ile gönderen ve onaylayan worker thread'leri"""
+
+    def __init__(self, queue: OutboundQueue, handler: Callable[[QueueJob, dict], Tuple[int, int]],
+                 workers: int = DEFAULT_QUEUE_WORKERS, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, poll_interval: float = 1.0, logger=None,
+                 on_give_up: Optional[Callable[[QueueJob, dict, Exception], None]] = None):
+        self.queue = queue
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.logger = logger
+        # Deneme hakkı biten parça için çağrılır (kritik hata kaydı vb.)
+        self.on_give_up = on_give_up
+        self.owner = lease_owner()
+        self.stats = {'done': 0, 'failed': 0, 'requeued': 0}
+        self._specs = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._exit_when_empty = False
+
+    def start(self, exit_when_empty: bool = False):
+        self._exit_when_empty = exit_when_empty
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._worker, name=f"queue-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name='queue-heartbeat', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def is_running(self) -> bool:
+        """Çalışan worker var mı (exit_when_empty ile kuyruk boşalınca biterler)"""
+        return any(thread.is_alive() for thread in self._threads[:-1])
+
+    def stop(self):
+        """Yeni parça almayı bırak; uçuştaki parçalar bitince worker'lar çıkar"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def _campaign_spec(self, campaign_id: str) -> dict:
+        with self._lock:
+            spec = self._specs.get(campaign_id)
+        if spec is None:
+            spec = self.queue.campaign_spec(campaign_id)
+            if spec is None:
+                raise ValueError(f"Kampanya bulunamadı: {campaign_id}")
+            with self._lock:
+                self._specs[campaign_id] = spec
+        return spec
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self.queue.lease(self.owner, self.lease_seconds)
+            if job is None:
+                if self._exit_when_empty and not self.queue.has_work():
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+
+            with self._lock:
+                self._active.add(job.id)
+            spec = None
+            try:
+                spec = self._campaign_spec(job.campaign_id)
+                success, failure = self.handler(job, spec)
+                self.queue.ack(job.id, success, failure)
+                with self._lock:
+                    self.stats['done'] += 1
+            except Exception as e:
+                state = self.queue.fail(job.id, str(e), self.max_attempts)
+                with self._lock:
+                    self.stats['failed' if state == 'failed' else 'requeued'] += 1
+                self._log('error', f"Kuyruk parçası gönderilemedi - Kampanya: {job.campaign_id}, Parça: {job.seq}, "
+                                   f"Deneme: {job.attempts}/{self.max_attempts}, Durum: {state}, Hata: {e}")
+                if state == 'failed' and spec is not None and self.on_give_up:
+                    self.on_give_up(job, spec, e)
+            finally:
+                with self._lock:
+                    self._active.discard(job.id)
+
+    def _heartbeat(self):
+        # Kira süresinin üçte birinde bir, uçuştaki parçaların kirası uzatılır
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                active = list(self._active)
+            try:
+                self.queue.extend_leases(active, self.owner, self.lease_seconds)
+            except sqlite3.Error as e:
+                self._log('warning', f"Kuyruk kirası uzatılamadı: {e}")
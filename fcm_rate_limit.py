@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Proje başına istemci tarafı hız sınırlayıcı (token bucket)
+Thread'ler ve asenkron worker'lar aynı kovayı paylaşır; her gönderim önce kovadan
+yer ayırır, böylece akış izin verilen hızda sabit kalır
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Varsayılan hız (mesaj/sn); 0 sınırsız demektir
+DEFAULT_RATE_LIMIT = 0.0
+
+# Proje bazlı hız ayarlarının okunduğu dosya
+PROJECT_LIMITS_FILE = Path("project_limits.json")
+
+
+class TokenBucket:
+    """Thread-safe token bucket; kova borca girebilir, bekleme süresi çağırana döner"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int = 1) -> float:
+        """count mesajlık yer ayır ve gönderimden önce beklenmesi gereken süreyi döndür"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Yetersizse borç yazılır; sonraki çağıranlar sırayla daha uzun bekler
+            self._tokens -= count
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, count: int = 1) -> float:
+        """Senkron kod için: yer ayır ve gerekiyorsa bekle"""
+        wait = self.reserve(count)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def load_project_limits(path: Path = PROJECT_LIMITS_FILE) -> Dict[str, dict]:
+    """Proje anahtarı veya project_id -> {'rate_limit', 'rate_burst'} ayarlarını oku"""
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        limits = json.load(f)
+    if not isinstance(limits, dict):
+        raise ValueError(f"{path} bir JSON nesnesi olmalı")
+    return limits
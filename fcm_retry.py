@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geçici FCM hataları için yeniden deneme politikası
+Hataları geçici/kalıcı olarak sınıflandırır, üstel geri çekilme ve jitter ile
+bekleme süresini hesaplar, kampanya başına yeniden deneme bütçesini tutar
+"""
+
+import functools
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Başarısız alt küme için en fazla yeniden deneme turu
+DEFAULT_MAX_RETRIES = 3
+
+# Geri çekilme taban ve üst süreleri (saniye)
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+
+# Yeniden deneme bütçesi: gönderilen token sayısının bu oranı kadar yeniden deneme yapılabilir
+DEFAULT_RETRY_BUDGET_RATIO = 0.2
+# Küçük gönderimlerde oran ne olursa olsun izin verilen yeniden deneme sayısı
+DEFAULT_RETRY_BUDGET_MIN = 100
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """Tekrar gönderildiğinde başarılı olabilecek hatalar (firebase_admin ilk çağrıda yüklenir)"""
+    from firebase_admin import exceptions, messaging
+    return (
+        messaging.QuotaExceededError,
+        exceptions.ResourceExhaustedError,
+        exceptions.UnavailableError,
+        exceptions.InternalError,
+        exceptions.DeadlineExceededError,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def sdk_transport_retry():
+    """SDK HTTP istemcisi için sadece bağlantı/okuma hatalarını tekrarlayan urllib3 ayarı
+
+    firebase_admin varsayılanı 500/503 yanıtlarını kendi içinde 4 kez daha dener; bu katmanla üst üste
+    binince token başına deneme (4+1)×(max_retries+1)'e çıkar ve yeniden deneme bütçesi bunları görmez.
+    """
+    from firebase_admin import _http_client
+    return _http_client.DEFAULT_RETRY_CONFIG.new(status_forcelist=(), respect_retry_after_header=False)
+
+
+def _http_response(exception):
+    return getattr(exception, 'http_response', None)
+
+
+def is_retryable(exception: Optional[Exception]) -> bool:
+    """Hata geçici mi (kota, UNAVAILABLE, INTERNAL, 5xx)?"""
+    if exception is None:
+        return False
+    if isinstance(exception, retryable_errors()):
+        return True
+    status_code = getattr(_http_response(exception), 'status_code', None)
+    return status_code is not None and (status_code >= 500 or status_code == 429)
+
+
+def retry_after_seconds(exception: Optional[Exception]) -> Optional[float]:
+    """Yanıttaki Retry-After başlığını saniyeye çevir (saniye veya HTTP tarihi)"""
+    headers = getattr(_http_response(exception), 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """Kampanya başına yeniden deneme bütçesi; her gönderilen token bütçeye oran kadar ekler"""
+
+    def __init__(self, ratio: float = DEFAULT_RETRY_BUDGET_RATIO, min_retries: int = DEFAULT_RETRY_BUDGET_MIN):
+        self.ratio = max(0.0, ratio)
+        self.min_retries = max(0, min_retries)
+        self.sent = 0
+        self.spent = 0
+
+    def deposit(self, count: int):
+        """İlk kez gönderilen token'ları bütçeye ekle"""
+        self.sent += count
+
+    @property
+    def available(self) -> int:
+        return max(0, self.min_retries + int(self.sent * self.ratio) - self.spent)
+
+    def withdraw(self, count: int) -> int:
+        """En fazla count yeniden deneme ayır, ayrılabilen sayıyı döndür"""
+        granted = min(count, self.available)
+        self.spent += granted
+        return granted
+
+
+class RetryPolicy:
+    """Yeniden deneme turu sayısı ve geri çekilme süreleri"""
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """attempt. (0'dan başlar) tur öncesi bekleme; Retry-After üst sınırı aşıyorsa None"""
+        # Full jitter: aynı anda hata alan gönderimler aynı anda geri dönmesin
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            delay = max(delay, retry_after)
+        return delay
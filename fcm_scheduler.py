@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zamanlanmış ve gecikmeli gönderimler
+İleri tarihli gönderimler (isteğe bağlı tekrar aralığıyla) SQLite'a yazılır; zamanlayıcı thread'i
+sıradaki zamana kadar uyur, vakti gelen işleri aynı bildirim için birleştirerek gönderim yoluna verir
+"""
+
+import hashlib
+import heapq
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+SCHEDULE_FILE = Path("scheduled_sends.db")
+
+# Bu kadar saniye içinde vakti gelen işler aynı turda ateşlenir (en fazla bu kadar erken)
+DEFAULT_COALESCE_WINDOW = 1.0
+
+# Başka bir süreç (örn. 'schedule add') depoyu değiştirdiyse en geç bu sürede fark edilir
+DEFAULT_RESYNC_INTERVAL = 30.0
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+SCHEDULE_STATES = ('active', 'done', 'failed', 'cancelled')
+
+
+def parse_duration(value: str) -> float:
+    """'90', '30s', '15m', '2h', '1d' biçimindeki süreyi saniyeye çevir"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', value.lower())
+    if not match:
+        raise ValueError(f"Geçersiz süre: {value} (örn. 30s, 15m, 2h, 1d)")
+    seconds = float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+    if seconds <= 0:
+        raise ValueError(f"Süre sıfırdan büyük olmalı: {value}")
+    return seconds
+
+
+class ScheduledSend:
+    """Depodaki tek bir zamanlanmış gönderim"""
+
+    __slots__ = ('id', 'spec', 'recipients', 'due_at', 'interval', 'state', 'runs', 'last_result')
+
+    def __init__(self, schedule_id: str, spec: dict, recipients: dict, due_at: float, interval: Optional[float],
+                 state: str, runs: int, last_result: Optional[str]):
+        self.id = schedule_id
+        self.spec = spec
+        self.recipients = recipients
+        self.due_at = due_at
+        self.interval = interval
+        self.state = state
+        self.runs = runs
+        self.last_result = last_result
+
+    def coalesce_key(self) -> str:
+        """Aynı anahtarlı işler tek gönderimde birleştirilebilir (aynı proje ve bildirim)"""
+        return json.dumps(self.spec, sort_keys=True, ensure_ascii=False)
+
+
+class ScheduleStore:
+    """SQLite (WAL) üzerinde zamanlanmış gönderim kayıtları"""
+
+    SCHEMA = """
+        -- recipients: {"tokens": [...]}, {"file": "..."} veya {"categories": [...] | null} (token deposu)
+        CREATE TABLE IF NOT EXISTS schedules (
+            id TEXT PRIMARY KEY,
+            spec TEXT NOT NULL,
+            recipients TEXT NOT NULL,
+            due_at REAL NOT NULL,
+            interval REAL,
+            state TEXT NOT NULL DEFAULT 'active',
+            created_at REAL NOT NULL,
+            runs INTEGER NOT NULL DEFAULT 0,
+            last_run_at REAL,
+            last_result TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedules_due ON schedules (state, due_at);
+    """
+
+    COLUMNS = "id, spec, recipients, due_at, interval, state, runs, last_result"
+
+    def __init__(self, path: Path = SCHEDULE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(row) -> ScheduledSend:
+        return ScheduledSend(row[0], json.loads(row[1]), json.loads(row[2]), *row[3:])
+
+    def add(self, spec: dict, recipients: dict, due_at: float, interval: Optional[float] = None) -> str:
+        """Gönderimi zamanla ve ID'sini döndür"""
+        schedule_id = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO schedules (id, spec, recipients, due_at, interval, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (schedule_id, json.dumps(spec, ensure_ascii=False), json.dumps(recipients, ensure_ascii=False),
+                 due_at, interval, time.time()))
+        return schedule_id
+
+    def cancel(self, schedule_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE schedules SET state = 'cancelled' WHERE id = ? AND state = 'active'", (schedule_id,))
+            return cursor.rowcount > 0
+
+    def get(self, schedule_id: str) -> Optional[ScheduledSend]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self.COLUMNS} FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def due_times(self) -> List[Tuple[float, str]]:
+        """Aktif işlerin (zaman, ID) listesi; zamanlayıcı yığını bundan kurulur"""
+        with self._lock:
+            return self._conn.execute("SELECT due_at, id FROM schedules WHERE state = 'active'").fetchall()
+
+    def list(self, include_inactive: bool = False, limit: int = 100) -> List[ScheduledSend]:
+        query = f"SELECT {self.COLUMNS} FROM schedules"
+        if not include_inactive:
+            query += " WHERE state = 'active'"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY due_at LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def complete(self, schedule_id: str, fired_due_at: float, result: str, next_due_at: Optional[float],
+                 failed: bool = False) -> bool:
+        """Ateşlenen işi kaydet: tekrarlıysa sonraki zamana kur, değilse kapat"""
+        if next_due_at is not None:
+            state = 'active'
+        else:
+            state = 'failed' if failed else 'done'
+        with self._lock, self._conn:
+            # İş bu arada iptal edildi veya yeniden kurulduysa dokunma
+            cursor = self._conn.execute(
+                "UPDATE schedules SET state = ?, due_at = COALESCE(?, due_at), runs = runs + 1, last_run_at = ?, "
+                "last_result = ? WHERE id = ? AND state = 'active' AND due_at = ?",
+                (state, next_due_at, time.time(), result, schedule_id, fired_due_at))
+            return cursor.rowcount > 0
+
+    def data_version(self) -> int:
+        """Başka bağlantılar değişiklik yaptıkça artan sayaç"""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+class Scheduler:
+    """Yığın (heap) tabanlı zamanlayıcı thread'i; boştayken sıradaki işin zamanına kadar uyur"""
+
+    def __init__(self, store: ScheduleStore, dispatch: Callable[[dict, List[ScheduledSend], str], str],
+                 coalesce_window: float = DEFAULT_COALESCE_WINDOW,
+                 resync_interval: float = DEFAULT_RESYNC_INTERVAL, logger=None):
+        self.store = store
+        # dispatch(spec, işler, gönderim anahtarı) -> sonuç metni; hata fırlatırsa iş başarısız sayılır
+        self.dispatch = dispatch
+        self.coalesce_window = max(0.0, coalesce_window)
+        self.resync_interval = resync_interval
+        self.logger = logger
+        self.stats = {'fired': 0, 'dispatches': 0, 'failed': 0}
+        self._heap = []
+        self._data_version = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def _reload(self):
+        # Çağıran _cond'u tutar
+        self._data_version = self.store.data_version()
+        self._heap = list(self.store.due_times())
+        heapq.heapify(self._heap)
+
+    def start(self):
+        with self._cond:
+            self._stopped = False
+            self._reload()
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def schedule(self, spec: dict, recipients: dict, due_at: float, interval: Optional[float] = None) -> str:
+        """İşi depoya yaz ve zamanlayıcıya ekle"""
+        schedule_id = self.store.add(spec, recipients, due_at, interval)
+        with self._cond:
+            heapq.heappush(self._heap, (due_at, schedule_id))
+            self._cond.notify()
+        return schedule_id
+
+    def cancel(self, schedule_id: str) -> bool:
+        # Yığındaki kayıt ateşlenme anında depodan doğrulanır; burada silinmez
+        return self.store.cancel(schedule_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = self._take_due()
+                while not due and not self._stopped:
+                    timeout = self.resync_interval
+                    if self._heap:
+                        timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+                    self._cond.wait(timeout)
+                    if self.store.data_version() != self._data_version:
+                        self._reload()
+                    due = self._take_due()
+                if self._stopped:
+                    return
+            self._fire(due)
+
+    def _take_due(self) -> List[Tuple[float, str]]:
+        # Çağıran _cond'u tutar
+        due = []
+        limit = time.time() + self.coalesce_window
+        if self._heap and self._heap[0][0] <= time.time():
+            while self._heap and self._heap[0][0] <= limit:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def _fire(self, due: List[Tuple[float, str]]):
+        """Vakti gelen işleri bildirim bazında grupla ve her grubu tek gönderimde çalıştır"""
+        groups: Dict[str, List[ScheduledSend]] = {}
+        for due_at, schedule_id in due:
+            schedule = self.store.get(schedule_id)
+            # İptal edilmiş veya başka süreç tarafından yeniden kurulmuş kayıtlar atlanır
+            if schedule is None or schedule.state != 'active' or schedule.due_at != due_at:
+                continue
+            groups.setdefault(schedule.coalesce_key(), []).append(schedule)
+
+        for schedules in groups.values():
+            # Aynı tur tekrar ateşlenirse (çökme sonrası) aynı anahtar üretilir ve teslim edilmiş token'lar atlanır
+            occurrence = ','.join(sorted(f"{s.id}@{s.due_at}" for s in schedules))
+            idempotency_key = 'schedule:' + hashlib.sha256(occurrence.encode('utf-8')).hexdigest()[:32]
+            self._log('info', f"Zamanlanmış gönderim ateşlendi - İş: {', '.join(s.id for s in schedules)}, "
+                              f"Proje: {schedules[0].spec.get('project')}")
+            failed = False
+            try:
+                result = self.dispatch(schedules[0].spec, schedules, idempotency_key)
+            except Exception as e:
+                failed = True
+                result = f"Hata: {e}"
+                self._log('error', f"Zamanlanmış gönderim başarısız - İş: {', '.join(s.id for s in schedules)}, Hata: {e}")
+            self.stats['dispatches'] += 1
+            self.stats['fired'] += len(schedules)
+            self.stats['failed'] += failed
+
+            now = time.time()
+            for schedule in schedules:
+                next_due_at = None
+                if schedule.interval:
+                    # Kaçırılan tekrarlar toplu gönderilmez; sıradaki gelecek zamana atlanır
+                    missed = max(0, int((now - schedule.due_at) // schedule.interval))
+                    next_due_at = schedule.due_at + (missed + 1) * schedule.interval
+                if self.store.complete(schedule.id, schedule.due_at, result, next_due_at, failed) and next_due_at:
+                    with self._cond:
+                        heapq.heappush(self._heap, (next_due_at, schedule.id))
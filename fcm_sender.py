@@ -6,23 +6,528 @@ Birden çok Firebase projesi için bildirim gönderme
 """
 
 import os
+import argparse
+import csv
+import functools
+import hashlib
 import json
 import sys
+import atexit
+import heapq
+import importlib.util
 import logging
+import logging.handlers
+import queue
+import random
+import signal
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
-import firebase_admin
-from firebase_admin import credentials, messaging
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
-class FCMSender:
+# firebase_admin, requests ve fcm_async (httpx) ilk gerçek gönderimde yüklenir; durum, log ve token
+# yönetimi komutları google-auth bağımlılık ağacını hiç yüklemeden açılır
+from fcm_idempotency import DEFAULT_IDEMPOTENCY_TTL, DELIVERY_LEDGER_FILE, DeliveryLedger
+from fcm_keys import KEY_METADATA_CACHE_FILE, CredentialCache, KeyMetadataCache, file_signature
+from fcm_metrics import MetricsRegistry, start_metrics_server
+from fcm_profiling import STAGE_LABELS, SendProfiler, SendTimer, active_timer
+from fcm_queue import (DEFAULT_JOB_SIZE, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, DEFAULT_QUEUE_WORKERS,
+                       OUTBOUND_QUEUE_FILE, OutboundQueue, QueueJob, QueueWorkerPool)
+from fcm_rate_limit import DEFAULT_RATE_LIMIT, PROJECT_LIMITS_FILE, TokenBucket, load_project_limits
+from fcm_retry import (DEFAULT_MAX_RETRIES, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_BUDGET_RATIO,
+                       DEFAULT_RETRY_MAX_DELAY, RetryBudget, RetryPolicy, is_retryable, retry_after_seconds,
+                       sdk_transport_retry)
+from fcm_scheduler import SCHEDULE_FILE, ScheduledSend, Scheduler, ScheduleStore, parse_duration
+from fcm_templates import DEFAULT_TEMPLATE_NAME, MESSAGE_TEMPLATES_FILE, MessageTemplate, TemplateRegistry
+from fcm_token_store import (DEFAULT_TOKEN_SAVE_DELAY, TOKEN_STORE_BACKENDS, TokenIndex, TokenRecord, atomic_write_text,
+                             create_token_store, iter_token_records, load_token_tree)
+
+# FCM tek bir multicast isteğinde en fazla 500 token kabul eder
+MULTICAST_TOKEN_LIMIT = 500
+
+# Aynı anda gönderilecek multicast parçası sayısı
+DEFAULT_SEND_CONCURRENCY = 4
+
+# Gönderim altyapıları: firebase_admin (thread tabanlı) veya asenkron HTTP/2 v1 motoru
+SEND_BACKENDS = ('sdk', 'async')
+
+# Kampanya çalıştırıcısında dosyadan okunup tek seferde gönderilecek token sayısı
+DEFAULT_CAMPAIGN_BATCH_SIZE = 5000
+
+# Kampanya çıkış kodları
+EXIT_OK = 0              # Tüm token'lar başarılı
+EXIT_PARTIAL = 1         # Bazı token'lar başarısız
+EXIT_FAILED = 2          # Hiçbir gönderim başarılı olmadı
+EXIT_INVALID_CAMPAIGN = 3  # Kampanya tanımı veya alıcı kaynağı geçersiz
+
+# Log görüntüleyicinin dosyaları okurken kullandığı blok boyutu
+LOG_READ_CHUNK_SIZE = 64 * 1024
+
+# Log satırı zaman damgası biçimi ('2024-01-01 10:00:00,123 - INFO - ...')
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Log ayrıntı düzeyleri: parti başına özet veya her başarılı token için satır
+LOG_VERBOSITY_LEVELS = ('summary', 'tokens')
+
+# Ölü token temizleme politikaları: kapalı, doğrudan sil, karantinaya al
+PRUNE_POLICIES = ('off', 'remove', 'quarantine')
+
+# Bu kadar art arda InvalidArgument hatası alan token temizlenir
+DEFAULT_INVALID_ARGUMENT_THRESHOLD = 3
+
+# Sıcak tutulacak en fazla Firebase uygulaması ve boşta kalma süresi (saniye)
+DEFAULT_MAX_WARM_APPS = 8
+DEFAULT_APP_IDLE_TIMEOUT = 30 * 60
+
+
+class ChunkErrorResponse:
+    """Tamamı hata veren bir parçadaki token için SendResponse benzeri kayıt"""
+    
+    def __init__(self, exception: Exception):
+        self.message_id = None
+        self.exception = exception
+    
+    @property
+    def success(self) -> bool:
+        return False
+
+
+class MergedBatchResponse:
+    """Parçalar halinde gönderilen multicast yanıtlarını tek yanıt gibi birleştir"""
+    
     def __init__(self):
+        self.responses = []
+        self.success_count = 0
+        self.failure_count = 0
+        # Gönderim süresi (saniye), özet loglar için
+        self.duration = None
+        # Token indeksi -> yeniden deneme sayısı
+        self.retry_counts = {}
+    
+    def extend(self, responses):
+        """Bir parçanın yanıtlarını token sırasını koruyarak ekle"""
+        for resp in responses:
+            self.responses.append(resp)
+            if resp.success:
+                self.success_count += 1
+            else:
+                self.failure_count += 1
+    
+    def replace(self, index: int, resp):
+        """Yeniden denenen token'ın sonucunu son sonuçla değiştir"""
+        previous = self.responses[index]
+        if previous.success != resp.success:
+            self.success_count += 1 if resp.success else -1
+            self.failure_count += -1 if resp.success else 1
+        self.responses[index] = resp
+        self.retry_counts[index] = self.retry_counts.get(index, 0) + 1
+
+
+def load_campaign_spec(spec_path) -> dict:
+    """Kampanya tanımını JSON dosyasından oku ve doğrula"""
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    
+    if not isinstance(spec, dict) or not spec.get('project'):
+        raise ValueError("Kampanya tanımında 'project' alanı zorunludur")
+    
+    notification = spec.get('notification') or {}
+    if not notification.get('title') or not notification.get('body'):
+        raise ValueError("Kampanya tanımında notification.title ve notification.body zorunludur")
+    
+    data = spec.get('data') or {}
+    if not isinstance(data, dict):
+        raise ValueError("Kampanya tanımında 'data' bir nesne olmalıdır")
+    
+    return {
+        'project': spec['project'],
+        'title': notification['title'],
+        'body': notification['body'],
+        # FCM data değerleri string olmalı
+        'data': {str(k): str(v) for k, v in data.items()},
+        'android_priority': (spec.get('android') or {}).get('priority', 'high'),
+        'ios_priority': str((spec.get('apns') or {}).get('priority', '10')),
+        'sound': spec.get('sound', 'default'),
+        # İsimli şablon verilirse platform ayarları şablondan alınır
+        'template': spec.get('template'),
+        'topic': spec.get('topic'),
+        # Aynı anahtarla tekrar çalıştırılırsa teslim edilmiş token'lar atlanır
+        'idempotency_key': spec.get('idempotency_key'),
+    }
+
+
+def iter_recipients_file(path) -> Iterator[str]:
+    """JSONL veya CSV alıcı dosyasından token'ları satır satır oku (dosya belleğe alınmaz)"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            # Başlıkta 'token' sütunu varsa onu kullan, yoksa ilk satır da veridir
+            columns = [c.strip().lower() for c in header]
+            if 'token' in columns:
+                token_index = columns.index('token')
+            else:
+                token_index = 0
+                if header and header[0].strip():
+                    yield header[0].strip()
+            for row in reader:
+                if len(row) > token_index and row[token_index].strip():
+                    yield row[token_index].strip()
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                token = record.get('token') if isinstance(record, dict) else record
+                if isinstance(token, str) and token.strip():
+                    yield token.strip()
+
+
+def iter_batches(items: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """Bir akışı sabit boyutlu listelere böl"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def tail_lines(path, count: int, block_size: int = LOG_READ_CHUNK_SIZE) -> List[str]:
+    """Dosyanın sonundan geriye doğru blok blok okuyarak son satırları döndür"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # count satır için count adet satır sonu + yarım ilk satırı ayıklamak için bir fazlası gerekir
+        while position > 0 and data.count(b'\n') <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-count:] if count > 0 else []
+
+
+def parse_log_time(value: str) -> datetime:
+    """Kullanıcının girdiği zamanı çöz ('YYYY-MM-DD HH:MM[:SS]' veya bugün için 'HH:MM[:SS]')"""
+    value = value.strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return datetime.combine(datetime.now().date(), parsed.time())
+        except ValueError:
+            pass
+    raise ValueError(f"Geçersiz zaman: {value}")
+
+
+def _log_line_time(line: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(line[:19], LOG_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def _seek_log_time(f, since: datetime, file_size: int):
+    """Zamana göre sıralı log dosyasında ikili arama ile 'since' öncesini atla"""
+    low, high = 0, file_size
+    while high - low > LOG_READ_CHUNK_SIZE:
+        middle = (low + high) // 2
+        f.seek(middle)
+        f.readline()  # Yarım satırı atla
+        line_time = None
+        # Zaman damgası olmayan (çok satırlı) kayıtları geç
+        for _ in range(10):
+            line = f.readline()
+            if not line:
+                break
+            line_time = _log_line_time(line.decode('utf-8', errors='replace'))
+            if line_time:
+                break
+        if line_time is None or line_time >= since:
+            high = middle
+        else:
+            low = middle
+    f.seek(low)
+    if low:
+        f.readline()
+
+
+def iter_filtered_log_lines(path, level: Optional[str] = None, project_id: Optional[str] = None,
+                            since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            substring: Optional[str] = None) -> Iterator[str]:
+    """Log dosyasını sabit boyutlu bloklarla tarayıp filtreye uyan satırları ver (sabit bellek)"""
+    level_marker = f" - {level.upper()} - " if level else None
+    project_marker = project_id or None
+    
+    with open(path, 'rb', buffering=LOG_READ_CHUNK_SIZE) as f:
+        if since:
+            _seek_log_time(f, since, os.fstat(f.fileno()).st_size)
+        
+        for raw_line in f:
+            line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+            if since or until:
+                line_time = _log_line_time(line)
+                if line_time is None:
+                    continue
+                if since and line_time < since:
+                    continue
+                if until and line_time > until:
+                    # Dosya zamana göre sıralı; sonrası da aralık dışında
+                    break
+            if level_marker and level_marker not in line:
+                continue
+            if project_marker and project_marker not in line:
+                continue
+            if substring and substring not in line:
+                continue
+            yield line
+
+
+def format_file_size(file_size: int) -> str:
+    size_str = f"{file_size} bytes"
+    if file_size > 1024:
+        size_str = f"{file_size / 1024:.1f} KB"
+    if file_size > 1024 * 1024:
+        size_str = f"{file_size / (1024 * 1024):.1f} MB"
+    return size_str
+
+
+def timed_send(label: str):
+    """FCMSender gönderim akışını aşama zamanlayıcısıyla (ve açıksa profil ile) çalıştır"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._send_timing(label):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class FirebaseAppPool:
+    """Proje anahtarıyla isimlendirilmiş Firebase uygulamalarını sıcak tut (LRU + boşta kalma tahliyesi)"""
+    
+    def __init__(self, max_apps: int = DEFAULT_MAX_WARM_APPS, idle_timeout: float = DEFAULT_APP_IDLE_TIMEOUT,
+                 logger: Optional[logging.Logger] = None, init_histogram=None):
+        self.max_apps = max(1, max_apps)
+        self.idle_timeout = idle_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        # Uygulama oluşturma süresi (fcm_firebase_init_seconds)
+        self.init_histogram = init_histogram
+        # Uygulama LRU/boşta tahliyesiyle kapatılıp yeniden açılsa da Certificate bir kez ayrıştırılır
+        self.credentials = CredentialCache()
+        # project_key -> [app, son kullanım zamanı, kira sayısı, kapatılacak mı]
+        # Kiralanmış (gönderimi süren) uygulama tahliye edilmez; kapasite geçici olarak aşılabilir
+        self._apps = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, project_key: str, file_path) -> "firebase_admin.App":
+        """Projenin uygulamasını döndür, yoksa oluştur"""
+        with self._lock:
+            return self._acquire(project_key, file_path, 0)
+    
+    def acquire(self, project_key: str, file_path) -> "firebase_admin.App":
+        """Uygulamayı kirala; release çağrılana kadar LRU/boşta tahliyesi onu kapatmaz"""
+        with self._lock:
+            return self._acquire(project_key, file_path, 1)
+    
+    def release(self, project_key: str, app):
+        """Kirayı bırak; kapasite aşıldıysa artık boşta olan uygulamaları kapat"""
+        with self._lock:
+            entry = self._apps.get(project_key)
+            if entry and entry[0] is app:
+                entry[1] = time.monotonic()
+                entry[2] -= 1
+                if entry[3] and not entry[2]:
+                    del self._apps[project_key]
+                    self._delete_app(project_key, app, "manuel")
+            self._evict_over_capacity()
+    
+    @contextmanager
+    def lease(self, project_key: str, file_path):
+        """Gönderim süresince uygulamayı kirala"""
+        app = self.acquire(project_key, file_path)
+        try:
+            yield app
+        finally:
+            self.release(project_key, app)
+    
+    def is_warm(self, project_key: str) -> bool:
+        """Proje için açık bir uygulama var mı"""
+        with self._lock:
+            return project_key in self._apps
+    
+    def warm_projects(self) -> List[str]:
+        """Sıcak tutulan proje anahtarları (en eskiden en yeniye)"""
+        with self._lock:
+            return list(self._apps.keys())
+    
+    def evict(self, project_key: str):
+        """Tek bir projenin uygulamasını kapat (kiralıksa kira bitince kapatılır)"""
+        with self._lock:
+            entry = self._apps.get(project_key)
+            if not entry:
+                return
+            if entry[2]:
+                entry[3] = True
+                return
+            del self._apps[project_key]
+            self._delete_app(project_key, entry[0], "manuel")
+    
+    def close_all(self):
+        """Tüm uygulamaları kapat"""
+        with self._lock:
+            while self._apps:
+                project_key, entry = self._apps.popitem(last=False)
+                self._delete_app(project_key, entry[0], "kapanış")
+    
+    def _acquire(self, project_key: str, file_path, leases: int):
+        """Uygulamayı bul veya oluştur (kilit altında çağrılır)"""
+        now = time.monotonic()
+        self._evict_idle(now)
+        
+        entry = self._apps.get(project_key)
+        if entry:
+            entry[1] = now
+            entry[2] += leases
+            entry[3] = False
+            self._apps.move_to_end(project_key)
+            return entry[0]
+        
+        import firebase_admin
+        app = firebase_admin.initialize_app(self.credentials.get(file_path), name=project_key)
+        if self.init_histogram:
+            self.init_histogram.observe(time.monotonic() - now, project_key=project_key)
+        self._apps[project_key] = [app, now, leases, False]
+        self.logger.info(f"Firebase uygulaması havuza eklendi: {project_key}")
+        self._evict_over_capacity()
+        return app
+    
+    def _evict_over_capacity(self):
+        """Kapasite aşıldıysa kiralanmamış en uzun süredir kullanılmayanları kapat (kilit altında çağrılır)"""
+        if len(self._apps) <= self.max_apps:
+            return
+        for project_key in [k for k, entry in self._apps.items() if not entry[2]]:
+            app = self._apps.pop(project_key)[0]
+            self._delete_app(project_key, app, "LRU")
+            if len(self._apps) <= self.max_apps:
+                return
+    
+    def _evict_idle(self, now: float):
+        """Boşta kalma süresini aşan uygulamaları kapat (kilit altında çağrılır)"""
+        if not self.idle_timeout:
+            return
+        for project_key in [k for k, entry in self._apps.items()
+                            if not entry[2] and now - entry[1] > self.idle_timeout]:
+            app = self._apps.pop(project_key)[0]
+            self._delete_app(project_key, app, "boşta")
+    
+    def _delete_app(self, project_key: str, app, reason: str):
+        import firebase_admin
+        try:
+            firebase_admin.delete_app(app)
+            self.logger.info(f"Firebase uygulaması kapatıldı ({reason}): {project_key}")
+        except Exception as e:
+            self.logger.warning(f"Firebase uygulaması kapatılamadı: {project_key} - {e}")
+
+
+class FCMSender:
+    def __init__(self, send_concurrency: int = DEFAULT_SEND_CONCURRENCY,
+                 max_warm_apps: int = DEFAULT_MAX_WARM_APPS,
+                 app_idle_timeout: float = DEFAULT_APP_IDLE_TIMEOUT,
+                 send_backend: str = 'sdk',
+                 fcm_api_base: Optional[str] = None,
+                 token_backend: str = 'json',
+                 token_save_delay: float = DEFAULT_TOKEN_SAVE_DELAY,
+                 token_journal: bool = False,
+                 prune_policy: str = 'off',
+                 prune_invalid_threshold: int = DEFAULT_INVALID_ARGUMENT_THRESHOLD,
+                 log_verbosity: str = 'summary',
+                 log_sample_rate: float = 0.0,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 retry_max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+                 retry_budget_ratio: float = DEFAULT_RETRY_BUDGET_RATIO,
+                 rate_limit: float = DEFAULT_RATE_LIMIT,
+                 rate_burst: Optional[float] = None,
+                 profile_sends: bool = False,
+                 idempotency_ttl: float = DEFAULT_IDEMPOTENCY_TTL):
         self.firebase_keys_dir = Path("firebase_keys")
+        self.key_metadata_cache_file = KEY_METADATA_CACHE_FILE
         self.tokens_file = Path("device_tokens.json")
+        self.tokens_db_file = Path("device_tokens.db")
+        self.token_health_file = Path("token_health.json")
+        self.quarantine_file = Path("quarantined_tokens.jsonl")
         self.logs_dir = Path("logs")
-        self.current_app = None
         self.available_projects = {}
-        self.device_tokens = {}
+        # Token yapısı; sorgu destekleyen depoda ilk ihtiyaçta yüklenir (bkz. device_tokens)
+        self._device_tokens = None
+        # Token değeri -> (kategori, ad) ters indeksi; device_tokens ile birlikte güncellenir
+        self._token_index = TokenIndex()
+        # device_tokens, indeks ve depo değişiklikleri için (servis modunda istekler eşzamanlıdır)
+        self.tokens_lock = threading.RLock()
+        self.send_concurrency = max(1, send_concurrency)
+        if send_backend not in SEND_BACKENDS:
+            raise ValueError(f"Geçersiz gönderim altyapısı: {send_backend} ({', '.join(SEND_BACKENDS)})")
+        self.send_backend = send_backend
+        # Yerel test sunucusu adresi verilirse OAuth kullanılmaz
+        self.fcm_api_base = fcm_api_base
+        if prune_policy not in PRUNE_POLICIES:
+            raise ValueError(f"Geçersiz temizleme politikası: {prune_policy} ({', '.join(PRUNE_POLICIES)})")
+        self.prune_policy = prune_policy
+        self.prune_invalid_threshold = max(1, prune_invalid_threshold)
+        # Gönderim sonunda toplu uygulanacak temizlik adayları: (project_key, token) -> neden
+        self._prune_candidates = {}
+        self._token_health = None
+        # Sağlık sayaçları son yazımdan beri değişti mi (dosya sadece değişince yazılır)
+        self._token_health_dirty = False
+        
+        # Geçici hata alan token'lar için yeniden deneme ayarları
+        self.retry_policy = RetryPolicy(max_retries, retry_base_delay, retry_max_delay)
+        self.retry_budget_ratio = retry_budget_ratio
+        
+        # Proje başına hız sınırı (mesaj/sn); project_limits.json ile proje bazında değiştirilebilir
+        self.project_limits_file = PROJECT_LIMITS_FILE
+        self.default_rate_limit = max(0.0, rate_limit)
+        self.default_rate_burst = rate_burst
+        # project_id -> TokenBucket; aynı projeye giden tüm thread/worker'lar paylaşır
+        self._rate_limiters = {}
+        self._rate_limiters_lock = threading.Lock()
+        # project_id -> AsyncFCMEngine (async altyapı)
+        self._async_engines = {}
+        
+        # Anahtarlı gönderimlerde teslim edilen token'lar (delivery_ledger.db); ilk kullanımda açılır
+        self.delivery_ledger_file = DELIVERY_LEDGER_FILE
+        self.idempotency_ttl = idempotency_ttl
+        self._delivery_ledger = None
+        self._delivery_ledger_lock = threading.Lock()
+        
+        # İsimli mesaj şablonları (message_templates.json), platform blokları önceden derlenir
+        self.templates = TemplateRegistry(MESSAGE_TEMPLATES_FILE)
+        
+        if log_verbosity not in LOG_VERBOSITY_LEVELS:
+            raise ValueError(f"Geçersiz log düzeyi: {log_verbosity} ({', '.join(LOG_VERBOSITY_LEVELS)})")
+        self.log_verbosity = log_verbosity
+        # Özet modunda bireysel başarılı token satırlarının örneklenme oranı (0-1)
+        self.log_sample_rate = min(max(log_sample_rate, 0.0), 1.0)
+        
+        # Gönderim aşama süreleri; profile_sends açıksa her gönderim cProfile ile logs/ altına yazılır
+        self.profile_sends = profile_sends
         
         # Klasörleri oluştur
         self.firebase_keys_dir.mkdir(exist_ok=True)
@@ -31,35 +536,281 @@ class FCMSender:
         # Logging sistemini kur
         self.setup_logging()
         
+        # Süreç içi metrikler (Prometheus /metrics ve show_status özeti)
+        self.metrics = MetricsRegistry()
+        self._metrics_server = None
+        self._setup_metrics()
+        
+        # Proje başına sıcak tutulan Firebase uygulamaları
+        self.app_pool = FirebaseAppPool(max_warm_apps, app_idle_timeout, self.logger, self._firebase_init_metric)
+        
         # Mevcut projeleri yükle
         self.load_available_projects()
         
         # Cihaz token'larını yükle (yeni yapı)
-        self.load_device_tokens()
+        self.token_store = create_token_store(token_backend, self.tokens_file, self.tokens_db_file,
+                                              token_save_delay, token_journal, self.tokens_lock)
+        # SQLite deposu açılışta belleğe alınmaz: seçimler, sayımlar ve aramalar sorgu olarak çalışır,
+        # yapı menü veya token yönetimi gibi ilk ihtiyaçta yüklenir. Taşıma ve JSON deposu hemen yüklenir.
+        if not (self.token_store.supports_queries and self.token_store.exists()):
+            self._load_token_tree()
+        # Gecikmeli yazım bekliyorsa çıkışta diske aktarılır (komutlar ayrıca close() çağırır)
+        atexit.register(self.token_store.flush)
     
     def setup_logging(self):
-        """Logging sistemini kur"""
+        """Logging sistemini kur (dosya ve konsol yazımı arka plan thread'inde)"""
         log_file = self.logs_dir / f"fcm_log_{datetime.now().strftime('%Y%m%d')}.log"
+        self._log_listener = None
+        self._log_queue_handler = None
         
-        # Logger'ı yapılandır
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
+        # Logger'ı yapılandır; gönderim döngüsü sadece kuyruğa yazar
+        if not logging.getLogger().handlers:
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handlers = [
                 logging.FileHandler(log_file, encoding='utf-8'),
                 logging.StreamHandler(sys.stdout)
             ]
-        )
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            
+            log_queue = queue.SimpleQueue()
+            self._log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            self._log_listener.start()
+            atexit.register(self.shutdown_logging)
+            
+            # Biçimlendirme listener tarafındaki handler'larda yapılır
+            self._log_queue_handler = logging.handlers.QueueHandler(log_queue)
+            self._log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+            logging.basicConfig(level=logging.INFO, handlers=[self._log_queue_handler])
+        
+        # HTTP istemcilerinin istek başına INFO satırlarını kapat
+        for noisy_logger in ('httpx', 'httpcore', 'urllib3'):
+            logging.getLogger(noisy_logger).setLevel(logging.WARNING)
         
         self.logger = logging.getLogger(__name__)
         self.logger.info("FCM Sender başlatıldı")
     
+    def shutdown_logging(self):
+        """Kuyruktaki logları yazıp arka plan thread'ini durdur"""
+        if self._log_listener:
+            # Kuyruk handler'ı root'tan kaldırılır; aynı süreçte sonra oluşturulan FCMSender kendi listener'ını kurar
+            logging.getLogger().removeHandler(self._log_queue_handler)
+            self._log_queue_handler = None
+            self._log_listener.stop()
+            for handler in self._log_listener.handlers:
+                handler.close()
+            self._log_listener = None
+    
+    def _setup_metrics(self):
+        """Gönderim, gecikme ve depolama metriklerini tanımla"""
+        self._sent_metric = self.metrics.counter(
+            'fcm_messages_sent_total', "Gönderilen mesajlar (yeniden denemeler dahil)", ('project_id',))
+        self._succeeded_metric = self.metrics.counter(
+            'fcm_messages_succeeded_total', "Başarılı mesajlar", ('project_id',))
+        self._failed_metric = self.metrics.counter(
+            'fcm_messages_failed_total', "Başarısız mesajlar", ('project_id', 'error_type'))
+        self._batch_latency_metric = self.metrics.histogram(
+            'fcm_batch_duration_seconds', "Multicast parti gönderim süresi", ('project_id', 'backend'))
+        self._firebase_init_metric = self.metrics.histogram(
+            'fcm_firebase_init_seconds', "Firebase uygulaması başlatma süresi", ('project_key',))
+        self._persist_metric = self.metrics.histogram(
+            'fcm_token_persist_seconds', "Token deposuna yazma süresi", ('operation',))
+        self._dedup_skipped_metric = self.metrics.counter(
+            'fcm_idempotent_skipped_total', "Aynı anahtarla daha önce teslim edildiği için atlanan token'lar")
+        # Depo boyutu her okumada ters indeksten (yapı yüklenmediyse depodan) hesaplanır
+        self.metrics.gauge(
+            'fcm_token_store_size', "Projedeki token sayısı", ('project_key',),
+            callback=lambda: {(project_key,): count for project_key, count in self.project_token_counts().items()})
+    
+    def _record_send_metrics(self, project_id: str, responses, duration: Optional[float] = None):
+        """Bir gönderim çağrısının sonuçlarını metriklere işle"""
+        succeeded = 0
+        failed = Counter()
+        for resp in responses:
+            if resp.success:
+                succeeded += 1
+            else:
+                failed[type(resp.exception).__name__ if resp.exception else 'Unknown'] += 1
+        
+        self._sent_metric.inc(len(responses), project_id=project_id)
+        if succeeded:
+            self._succeeded_metric.inc(succeeded, project_id=project_id)
+        for error_type, count in failed.items():
+            self._failed_metric.inc(count, project_id=project_id, error_type=error_type)
+        if duration is not None:
+            self._batch_latency_metric.observe(duration, project_id=project_id, backend=self.send_backend)
+    
+    def start_metrics_server(self, port: int, host: str = '127.0.0.1'):
+        """Metrikleri Prometheus biçiminde http://host:port/metrics adresinde sun"""
+        self._metrics_server = start_metrics_server(self.metrics, port, host)
+        print(f"📈 Metrikler: http://{host}:{self._metrics_server.server_port}/metrics")
+        self.logger.info(f"Metrik sunucusu başlatıldı - http://{host}:{self._metrics_server.server_port}/metrics")
+    
+    def stop_metrics_server(self):
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+    
+    def delivery_ledger(self) -> DeliveryLedger:
+        """Teslim defterini döndür (ilk çağrıda açılır)"""
+        with self._delivery_ledger_lock:
+            if self._delivery_ledger is None:
+                self._delivery_ledger = DeliveryLedger(self.delivery_ledger_file, self.idempotency_ttl)
+            return self._delivery_ledger
+    
+    def close_delivery_ledger(self):
+        with self._delivery_ledger_lock:
+            if self._delivery_ledger is not None:
+                self._delivery_ledger.close()
+                self._delivery_ledger = None
+    
+    def _skip_delivered(self, idempotency_key: Optional[str], tokens: List[str]) -> List[str]:
+        """Bu anahtarla teslim edilmiş veya şu an başka bir gönderimde olan token'ları çıkar, kalanları ayır
+
+        Ayrılan token'lar _record_delivered ile işaretlenir; gönderim hata verirse _release_reserved çağrılır.
+        """
+        if not idempotency_key or not tokens:
+            return tokens
+        with self._span('dedup'):
+            pending, in_flight = self.delivery_ledger().reserve(idempotency_key, tokens)
+        skipped = len(tokens) - len(pending)
+        if skipped:
+            self._dedup_skipped_metric.inc(skipped)
+        if skipped - len(in_flight):
+            print(f"⏭️  {skipped - len(in_flight)} token bu gönderim anahtarıyla daha önce teslim edildi, atlandı")
+        if in_flight:
+            print(f"⏭️  {len(in_flight)} token aynı anahtarla şu an başka bir gönderimde, atlandı")
+        if skipped:
+            self.logger.info(f"Tekrar gönderim engellendi - Anahtar: {idempotency_key}, Atlanan: {skipped}, "
+                             f"Uçuşta: {len(in_flight)}, Kalan: {len(pending)}")
+        return pending
+    
+    def _record_delivered(self, idempotency_key: Optional[str], tokens: List[str], response):
+        """Başarılı token'ları teslim defterine yaz, başarısızların rezervasyonunu bırak"""
+        if not idempotency_key:
+            return
+        delivered = [token for token, resp in zip(tokens, response.responses) if resp.success]
+        undelivered = [token for token, resp in zip(tokens, response.responses) if not resp.success]
+        with self._span('dedup'):
+            ledger = self.delivery_ledger()
+            ledger.record(idempotency_key, delivered)
+            ledger.release(idempotency_key, undelivered)
+    
+    def _release_reserved(self, idempotency_key: Optional[str], tokens: List[str]):
+        """Gönderilemeyen token'ların rezervasyonunu bırak"""
+        if idempotency_key:
+            self.delivery_ledger().release(idempotency_key, tokens)
+    
+    def _span(self, stage: str):
+        """Süren gönderimin zamanlayıcısında bir aşama ölç (zamanlayıcı yoksa etkisiz)"""
+        timer = active_timer()
+        return timer.span(stage) if timer else nullcontext()
+    
+    def _timing_paused(self):
+        """Kullanıcı girişi süresini gönderim ölçümünden çıkar"""
+        timer = active_timer()
+        return timer.paused() if timer else nullcontext()
+    
+    def _bind_send_timer(self, fn):
+        """Worker thread'de çalışacak fn'i süren gönderimin zamanlayıcısına bağla"""
+        timer = active_timer()
+        return timer.bind(fn) if timer else fn
+    
+    @contextmanager
+    def _send_timing(self, label: str):
+        """Bir gönderimi baştan sona ölç ve sonunda aşama dağılımını raporla (iç içe çağrılar dıştakine yazar)
+        
+        Zamanlayıcı thread'e özeldir; eşzamanlı gönderimler birbirinin dağılımına yazmaz.
+        """
+        timer = active_timer()
+        if timer:
+            yield timer
+            return
+        
+        profiler = SendProfiler(self.logs_dir, label) if self.profile_sends else None
+        timer = SendTimer(label, profiler)
+        timer.start()
+        try:
+            yield timer
+        finally:
+            try:
+                profile_path = timer.stop()
+            except Exception as e:
+                profile_path = None
+                self.logger.error(f"Profil kaydedilemedi: {e}")
+            self._report_send_timing(timer, profile_path)
+    
+    def _report_send_timing(self, timer: SendTimer, profile_path: Optional[Path] = None):
+        """Gönderimin aşama süre dağılımını yazdır ve logla"""
+        breakdown = timer.breakdown()
+        # Gönderime ulaşmadan iptal edilen akışlar raporlanmaz
+        if not any(stage == 'network' for stage, _, _ in breakdown):
+            return
+        
+        print(f"\n⏱️  Süre dağılımı ({timer.label}): toplam {timer.elapsed * 1000:.1f} ms")
+        measured = 0.0
+        for stage, total, count in breakdown:
+            measured += total
+            share = total / timer.elapsed * 100 if timer.elapsed else 0.0
+            print(f"   • {STAGE_LABELS.get(stage, stage)}: {total * 1000:.1f} ms ({count} kez, %{share:.0f})")
+        if timer.elapsed > measured:
+            print(f"   • Diğer: {(timer.elapsed - measured) * 1000:.1f} ms")
+        else:
+            # Eşzamanlı parçalarda thread sürelerinin toplamı duvar saatini aşabilir
+            print("   💡 Eşzamanlı parçaların süreleri toplandığı için aşamalar toplam süreyi aşabilir")
+        self.logger.info(f"Süre dağılımı ({timer.label}) - {timer.summary()}")
+        
+        if profile_path:
+            print(f"🔬 Profil kaydedildi: {profile_path} (özet: {profile_path.with_suffix('.txt').name})")
+            self.logger.info(f"Profil kaydedildi: {profile_path}")
+    
+    @property
+    def device_tokens(self) -> Dict:
+        """Proje -> token yapısı (yüklenmediyse depodan yüklenir)"""
+        self._ensure_token_tree()
+        return self._device_tokens
+    
+    @device_tokens.setter
+    def device_tokens(self, data: Dict):
+        self._device_tokens = data
+    
+    @property
+    def token_index(self) -> TokenIndex:
+        self._ensure_token_tree()
+        return self._token_index
+    
+    def _ensure_token_tree(self):
+        if self._device_tokens is None:
+            with self.tokens_lock:
+                if self._device_tokens is None:
+                    self._load_token_tree()
+    
+    def _load_token_tree(self):
+        """Token yapısını depodan yükle ve ters indeksi kur"""
+        self.load_device_tokens()
+        if self._device_tokens is None:
+            self._device_tokens = {}
+        self._token_index.rebuild(self._device_tokens)
+    
+    def project_token_counts(self) -> Dict[str, int]:
+        """Proje -> token sayısı; yapı yüklenmediyse depoda sayılır"""
+        if self._device_tokens is None:
+            return self.token_store.project_token_counts()
+        with self.tokens_lock:
+            return {project_key: self._token_index.project_size(project_key) for project_key in self._device_tokens}
+    
+    def _locate_token(self, project_key: str, token: str) -> Optional[tuple]:
+        """Token'ın proje içindeki (kategori, ad) konumu; yapı yüklenmediyse depoda aranır"""
+        if self._device_tokens is None:
+            return self.token_store.locate_token(project_key, token)
+        return self._token_index.locate(project_key, token)
+    
     def load_device_tokens(self):
-        """Cihaz token'larını JSON dosyasından yükle - Yeni yapı"""
-        if self.tokens_file.exists():
+        """Cihaz token'larını depodan yükle - Yeni yapı"""
+        if self.token_store.exists():
             try:
-                with open(self.tokens_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = self.token_store.load()
                 
                 # Eski yapıyı yeni yapıya dönüştür
                 if isinstance(data, dict) and "iPhone" in data:
@@ -67,16 +818,49 @@ class FCMSender:
                     self._convert_old_structure(data)
                 else:
                     self.device_tokens = data
+                    self.token_store.attach(self.device_tokens)
                 
                 total_tokens = sum(len(project_data.get('tokens', {})) for project_data in self.device_tokens.values())
                 self.logger.info(f"Token yapısı yüklendi: {total_tokens} token")
             except Exception as e:
                 self.logger.error(f"Token dosyası okunamadı: {e}")
                 print(f"❌ Token dosyası okunamadı: {e}")
+                # Okunamayan dosyanın üzerine boş yapı yazılmaz; kurtarma için kenara alınır
+                for backup in self.token_store.backup_unreadable():
+                    print(f"⚠️  Okunamayan dosya yedeklendi: {backup}")
+                    self.logger.warning(f"Okunamayan token dosyası yedeklendi: {backup}")
                 self._create_default_structure()
+        elif self.tokens_file.exists() and self.token_store.path != self.tokens_file:
+            self._migrate_json_tokens()
         else:
             self._create_default_structure()
     
+    def _migrate_json_tokens(self):
+        """Mevcut device_tokens.json dosyasını yeni depoya tek seferlik taşı"""
+        try:
+            with open(self.tokens_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.error(f"Taşınacak token dosyası okunamadı: {e}")
+            print(f"❌ Token dosyası okunamadı: {e}")
+            self._create_default_structure()
+            return
+        
+        if isinstance(data, dict) and "iPhone" in data:
+            self.logger.info("Eski token yapısı algılandı, yeniye dönüştürülüyor...")
+            self._convert_old_structure(data)
+        else:
+            self.device_tokens = load_token_tree(data)
+            self.save_device_tokens()
+        
+        total_tokens = sum(
+            len(category_tokens)
+            for project_data in self.device_tokens.values()
+            for category_tokens in project_data.get('tokens', {}).values()
+        )
+        print(f"✅ {total_tokens} token {self.token_store.path} deposuna taşındı")
+        self.logger.info(f"Token'lar JSON dosyasından taşındı: {self.tokens_file} -> {self.token_store.path} ({total_tokens} token)")
+    
     def _create_default_structure(self):
         """Varsayılan token yapısını oluştur"""
         self.device_tokens = {}
@@ -105,24 +889,37 @@ class FCMSender:
             }
             
             # Eski token'ları yeni yapıya taşı
+            created = int(time.time())
             for category, tokens in old_data.items():
                 if category in ['iPhone', 'Android', 'iPad', 'Web', 'Test']:
                     for i, token in enumerate(tokens):
                         token_name = f"{category}_{i+1}"
-                        self.device_tokens[first_project]['tokens'][category][token_name] = {
-                            'token': token,
-                            'name': token_name,
-                            'created': datetime.now().isoformat()
-                        }
+                        self.device_tokens[first_project]['tokens'][category][token_name] = TokenRecord(
+                            token, token_name, created)
         
         self.save_device_tokens()
         self.logger.info("Eski yapı yeni yapıya dönüştürüldü")
     
     def save_device_tokens(self):
-        """Cihaz token'larını JSON dosyasına kaydet"""
+        """Cihaz token yapısının tamamını depoya kaydet"""
         try:
-            with open(self.tokens_file, 'w', encoding='utf-8') as f:
-                json.dump(self.device_tokens, f, indent=2, ensure_ascii=False)
+            started = time.monotonic()
+            with self._span('persist'):
+                self.token_store.attach(self.device_tokens)
+                self.token_store.save_all(self.device_tokens)
+            self._persist_metric.observe(time.monotonic() - started, operation='save_all')
+            self.logger.info("Token yapısı kaydedildi")
+        except Exception as e:
+            self.logger.error(f"Token dosyası kaydedilemedi: {e}")
+            print(f"❌ Token dosyası kaydedilemedi: {e}")
+    
+    def _persist(self, operation: str, *args):
+        """Tek bir token/proje değişikliğini depoya yaz"""
+        try:
+            started = time.monotonic()
+            with self._span('persist'):
+                getattr(self.token_store, operation)(*args)
+            self._persist_metric.observe(time.monotonic() - started, operation=operation)
             self.logger.info("Token yapısı kaydedildi")
         except Exception as e:
             self.logger.error(f"Token dosyası kaydedilemedi: {e}")
@@ -169,27 +966,35 @@ class FCMSender:
             print("❌ Lütfen geçerli bir numara girin!")
             return None
     
-    def initialize_firebase(self, project_key: str) -> bool:
-        """Firebase'i seçilen proje ile başlat"""
+    @contextmanager
+    def leased_firebase(self, project_key: str):
+        """Firebase uygulamasını gönderim boyunca kirala (havuzda varsa sıcak uygulamayı kullan)
+        
+        Başlatılamazsa None verir. Kiralanan uygulamayı servis, zamanlayıcı veya kuyruk işleri tahliye edemez.
+        """
+        app = None
         try:
-            # Mevcut uygulamayı temizle
-            if self.current_app:
-                firebase_admin.delete_app(self.current_app)
-                self.logger.info("Önceki Firebase uygulaması temizlendi")
-            
             project = self.available_projects[project_key]
-            cred = credentials.Certificate(str(project['file_path']))
-            self.current_app = firebase_admin.initialize_app(cred)
+            was_warm = self.app_pool.is_warm(project_key)
+            with self._span('firebase_init'):
+                app = self.app_pool.acquire(project_key, project['file_path'])
             
-            print(f"✅ Firebase başlatıldı: {project['display_name']}")
-            self.logger.info(f"Firebase başlatıldı - Proje: {project['project_id']}, Dosya: {project['file_path']}")
-            return True
+            if was_warm:
+                self.logger.info(f"Sıcak Firebase uygulaması kullanılıyor - Proje: {project['project_id']}")
+            else:
+                print(f"✅ Firebase başlatıldı: {project['display_name']}")
+                self.logger.info(f"Firebase başlatıldı - Proje: {project['project_id']}, Dosya: {project['file_path']}")
             
         except Exception as e:
             error_msg = str(e)
             print(f"❌ Firebase başlatılamadı: {error_msg}")
             self.logger.error(f"Firebase başlatılamadı - Proje: {project_key}, Hata: {error_msg}")
-            return False
+        
+        try:
+            yield app
+        finally:
+            if app is not None:
+                self.app_pool.release(project_key, app)
     
     def show_device_categories(self) -> List[str]:
         """Proje seçip o projenin token'larını göster ve seçim yap"""
@@ -203,41 +1008,27 @@ class FCMSender:
             return []
         
         project_data = self.device_tokens[project_key]
-        project_id = project_data.get('project_id', 'Bilinmeyen')
-        tokens = project_data.get('tokens', {})
         
         print(f"\n📱 {project_data.get('display_name', project_key)} TOKEN'LARI:")
         print("-" * 80)
         
-        all_tokens = []
-        token_map = {}
-        
-        # Tüm token'ları tek listede topla
-        for category, category_tokens in tokens.items():
-            for token_name, token_data in category_tokens.items():
-                all_tokens.append({
-                    'category': category,
-                    'name': token_data.get('name', token_name),
-                    'token': token_data['token'],
-                    'full_key': f"{project_key}:{category}:{token_name}"
-                })
+        # (kategori, ad, kayıt) üçlüleri; kayıtlar kopyalanmaz, seçim anahtarı sadece seçilenler için üretilir
+        all_tokens = list(iter_token_records(project_data))
         
         if not all_tokens:
             print("❌ Bu projede hiç token bulunamadı!")
             return []
         
         # Token'ları numaralı liste olarak göster
-        for i, token_info in enumerate(all_tokens, 1):
-            token_map[i] = token_info['full_key']
-            
+        for i, (category, token_name, record) in enumerate(all_tokens, 1):
             # Token'ın ilk ve son 6 karakterini göster
-            token = token_info['token']
+            token = record.token
             if len(token) > 12:
                 token_preview = f"{token[:6]}...{token[-6:]}"
             else:
                 token_preview = token
             
-            print(f"  {i}. [{token_info['category']}] {token_info['name']}")
+            print(f"  {i}. [{category}] {record.name}")
             print(f"     📱 {token_preview}")
         
         print(f"\n{len(all_tokens) + 1}. Tümü")
@@ -250,9 +1041,10 @@ class FCMSender:
             selected_tokens = []
             for c in choices:
                 if c == len(all_tokens) + 1:  # Tümü seçeneği
-                    return [token_info['full_key'] for token_info in all_tokens]
+                    return [f"{project_key}:{category}:{token_name}" for category, token_name, _ in all_tokens]
                 elif 1 <= c <= len(all_tokens):
-                    selected_tokens.append(token_map[c])
+                    category, token_name, _ = all_tokens[c - 1]
+                    selected_tokens.append(f"{project_key}:{category}:{token_name}")
             
             return selected_tokens if selected_tokens else []
             
@@ -260,44 +1052,26 @@ class FCMSender:
             print("❌ Geçersiz seçim!")
             return []
     
-    def get_tokens_from_categories(self, categories: List[str]) -> List[str]:
-        """Seçilen token'lardan token değerlerini al"""
-        all_tokens = []
+    def _iter_selection(self, categories: List[str]) -> Iterator[tuple]:
+        """Seçim anahtarlarını (project_key:category:token_name) token kayıtlarına çözümle"""
         for token_full in categories:
-            try:
-                parts = token_full.split(':', 2)  # project_key:category:token_name
-                if len(parts) == 3:
-                    project_key, category, token_name = parts
-                    if project_key in self.device_tokens:
-                        category_tokens = self.device_tokens[project_key]['tokens'].get(category, {})
-                        if token_name in category_tokens:
-                            all_tokens.append(category_tokens[token_name]['token'])
-            except ValueError:
+            parts = token_full.split(':', 2)
+            if len(parts) != 3:
                 continue
-        return [token for token in all_tokens if token.strip()]
+            project_key, category, token_name = parts
+            record = self.device_tokens.get(project_key, {}).get('tokens', {}).get(category, {}).get(token_name)
+            if record:
+                yield project_key, category, token_name, record
+    
+    def get_tokens_from_categories(self, categories: List[str]) -> List[str]:
+        """Seçilen token'lardan token değerlerini al"""
+        return [record.token for _, _, _, record in self._iter_selection(categories) if record.token.strip()]
     
-    def get_token_details_from_categories(self, categories: List[str]) -> Dict[str, List[Dict]]:
-        """Seçilen token'lardan token detaylarını al"""
+    def get_token_details_from_categories(self, categories: List[str]) -> Dict[str, List[TokenRecord]]:
+        """Seçilen token kayıtlarını proje:kategori bazında grupla (kayıtlar kopyalanmaz)"""
         token_details = {}
-        for token_full in categories:
-            try:
-                parts = token_full.split(':', 2)  # project_key:category:token_name
-                if len(parts) == 3:
-                    project_key, category, token_name = parts
-                    if project_key in self.device_tokens:
-                        category_tokens = self.device_tokens[project_key]['tokens'].get(category, {})
-                        if token_name in category_tokens:
-                            category_key = f"{project_key}:{category}"
-                            if category_key not in token_details:
-                                token_details[category_key] = []
-                            
-                            token_data = category_tokens[token_name]
-                            token_details[category_key].append({
-                                'name': token_data.get('name', token_name),
-                                'token': token_data['token']
-                            })
-            except ValueError:
-                continue
+        for project_key, category, _, record in self._iter_selection(categories):
+            token_details.setdefault(f"{project_key}:{category}", []).append(record)
         return token_details
     
     def send_notification(self):
@@ -307,6 +1081,7 @@ class FCMSender:
         print("-" * 30)
         print("1. Token'lara Gönder")
         print("2. Topic'e Gönder")
+        print("3. Birden Çok Projeye Gönder")
         print("-" * 30)
         
         try:
@@ -315,19 +1090,28 @@ class FCMSender:
                 self._send_to_tokens()
             elif send_type == 2:
                 self._send_to_topic()
+            elif send_type == 3:
+                self._send_fanout()
             else:
                 print("❌ Geçersiz seçim!")
         except ValueError:
             print("❌ Geçerli bir numara girin!")
     
+    @timed_send('token')
     def _send_to_tokens(self):
         """Token'lara bildirim gönder"""
         # Token seçimi (içinde proje seçimi de var)
-        selected_tokens = self.show_device_categories()
+        with self._timing_paused():
+            selected_tokens = self.show_device_categories()
         if not selected_tokens:
             print("❌ Hiç token seçilmedi!")
             return
         
+        # Seçim birden çok projeye yayılıyorsa her projeyi kendi uygulamasıyla gönder
+        if len(self._group_selection_by_project(selected_tokens)) > 1:
+            self._send_fanout(selected_tokens)
+            return
+        
         # Seçilen token'lardan proje bilgisini al
         project_key = selected_tokens[0].split(':')[0]  # İlk token'dan proje bilgisini al
         
@@ -335,200 +1119,561 @@ class FCMSender:
             print("❌ Proje bulunamadı!")
             return
         
-        # Firebase'i başlat
-        if not self.initialize_firebase(project_key):
-            return
+        # Uygulama gönderim boyunca kiralanır; eşzamanlı işler onu tahliye edemez
+        with self.leased_firebase(project_key) as app:
+            if app is None:
+                return
+            
+            project_info = self.available_projects[project_key]
+            project_id = project_info['project_id']
+            
+            tokens = self.get_tokens_from_categories(selected_tokens)
+            token_details = self.get_token_details_from_categories(selected_tokens)
+            
+            if not tokens:
+                print("❌ Hiç token bulunamadı!")
+                self.logger.warning(f"Proje {project_id} için token bulunamadı")
+                return
+            
+            # Token'ları bu proje ile eşleştir (gerekirse proje oluştur)
+            self.ensure_token_project(project_key)
+            
+            print(f"\n📤 {len(tokens)} cihaza bildirim gönderilecek")
+            print(f"🗂️  Proje: {project_info['display_name']}")
+            
+            # Seçilen token'ların detaylarını göster
+            if token_details:
+                print(f"\n📱 Seçilen Cihazlar:")
+                for category_key, category_token_list in token_details.items():
+                    project_name, category_name = category_key.split(':', 1)
+                    print(f"   🏷️  {category_name}:")
+                    for record in category_token_list:
+                        print(f"      • {record.name}")
+            
+            # Bildirim detaylarını al
+            with self._timing_paused():
+                notification_data = self._get_notification_details()
+            if not notification_data:
+                return
+            
+            title, body, data, template = notification_data
+            
+            # Aynı bildirim tekrar tetiklendiyse daha önce teslim edilen cihazlar atlanır
+            with self._timing_paused():
+                idempotency_key = self._menu_idempotency_key(tokens, title, body, data, template)
+            tokens = self._skip_delivered(idempotency_key, tokens)
+            if not tokens:
+                print("✅ Seçilen tüm cihazlar bu bildirimi zaten aldı")
+                return
+            
+            # Log başlangıcı
+            self.logger.info(f"Token bildirim gönderme başlatıldı - Proje: {project_id}, Token sayısı: {len(tokens)}")
+            self.logger.info(f"Başlık: {title}, Mesaj: {body}")
+            if data:
+                self.logger.info(f"Ek veriler: {data}")
+            
+            # Seçilen token adlarını da logla
+            for category_key, category_token_list in token_details.items():
+                project_name, category_name = category_key.split(':', 1)
+                token_names = [record.name for record in category_token_list]
+                self.logger.info(f"Seçilen {category_name} token'ları: {', '.join(token_names)}")
+            
+            # Bildirimi gönder
+            try:
+                # 500'lük parçalar halinde, eşzamanlı olarak gönder; geçici hatalar yeniden denenir
+                response = self._send_with_retries(
+                    app, tokens, title, body, data, template
+                )
+                
+                print(f"\n✅ Bildirim gönderildi!")
+                print(f"📊 Başarılı: {response.success_count}")
+                print(f"❌ Başarısız: {response.failure_count}")
+                if response.retry_counts:
+                    print(f"🔁 Yeniden denenen: {len(response.retry_counts)}")
+                
+                # Başarılı gönderim logu
+                self.logger.info(f"Token bildirim gönderildi - Başarılı: {response.success_count}, Başarısız: {response.failure_count}")
+                
+                # Detaylı hata analizi
+                with self._span('process'):
+                    self._process_detailed_response(response, tokens, project_id, title, body, project_key)
+                self._record_delivered(idempotency_key, tokens, response)
+                self._apply_token_prune()
+            
+            except Exception as e:
+                error_msg = str(e)
+                print(f"❌ Bildirim gönderilemedi: {error_msg}")
+                
+                # Detaylı hata logu
+                self.logger.error(f"KRITIK HATA - Token bildirim gönderilemedi")
+                self.logger.error(f"Proje: {project_id}")
+                self.logger.error(f"Hata: {error_msg}")
+                self.logger.error(f"Token sayısı: {len(tokens)}")
+                
+                # Hata detaylarını ayrı dosyaya kaydet
+                self._save_critical_error(project_id, error_msg, tokens, title, body, data)
+                self._release_reserved(idempotency_key, tokens)
+    
+    def show_fanout_selection(self) -> List[str]:
+        """Birden çok proje (ve isteğe bağlı kategori) seçip tüm token anahtarlarını döndür"""
+        project_list = [key for key in self.device_tokens if key in self.available_projects]
+        if not project_list:
+            print("❌ Key dosyası ve token'ı olan proje bulunamadı!")
+            return []
         
-        project_info = self.available_projects[project_key]
-        project_id = project_info['project_id']
+        print("\n🗂️  PROJELER:")
+        print("-" * 50)
+        for i, project_key in enumerate(project_list, 1):
+            token_count = self.token_index.project_size(project_key)
+            print(f"{i}. {self.available_projects[project_key]['display_name']} - {token_count} token")
+        print(f"{len(project_list) + 1}. Tümü")
+        print("-" * 50)
         
-        tokens = self.get_tokens_from_categories(selected_tokens)
-        token_details = self.get_token_details_from_categories(selected_tokens)
+        try:
+            choices = [int(x.strip()) for x in input("📌 Projeleri seçin (virgülle): ").split(',')]
+        except ValueError:
+            print("❌ Geçersiz seçim!")
+            return []
         
-        if not tokens:
-            print("❌ Hiç token bulunamadı!")
-            self.logger.warning(f"Proje {project_id} için token bulunamadı")
+        if len(project_list) + 1 in choices:
+            selected_projects = project_list
+        else:
+            selected_projects = [project_list[c - 1] for c in choices if 1 <= c <= len(project_list)]
+        
+        category_input = input("🏷️  Kategoriler (virgülle, Enter ile tümü): ").strip()
+        categories = {c.strip() for c in category_input.split(',') if c.strip()} if category_input else None
+        
+        selection = []
+        for project_key in selected_projects:
+            for category, category_tokens in self.device_tokens[project_key].get('tokens', {}).items():
+                if categories and category not in categories:
+                    continue
+                selection.extend(f"{project_key}:{category}:{token_name}" for token_name in category_tokens)
+        return selection
+    
+    def _group_selection_by_project(self, selection: List[str]) -> Dict[str, List[str]]:
+        """Seçim anahtarlarını proje anahtarına göre token listelerine grupla"""
+        groups = {}
+        for project_key, _, _, record in self._iter_selection(selection):
+            if record.token.strip():
+                groups.setdefault(project_key, []).append(record.token)
+        return groups
+    
+    @timed_send('fanout')
+    def _send_fanout(self, selection: Optional[List[str]] = None):
+        """Aynı bildirimi birden çok projeye gönder (interaktif)"""
+        if selection is None:
+            with self._timing_paused():
+                selection = self.show_fanout_selection()
+        groups = self._group_selection_by_project(selection)
+        if not groups:
+            print("❌ Hiç token seçilmedi!")
             return
         
-        # Token'ları bu proje ile eşleştir (gerekirse proje oluştur)
-        if project_key not in self.device_tokens:
-            self.device_tokens[project_key] = {
-                'project_id': project_id,
-                'display_name': project_info['display_name'],
-                'tokens': {
-                    'iPhone': {},
-                    'Android': {},
-                    'iPad': {},
-                    'Web': {},
-                    'Test': {}
-                }
-            }
-            self.save_device_tokens()
-        
-        print(f"\n📤 {len(tokens)} cihaza bildirim gönderilecek")
-        print(f"🗂️  Proje: {project_info['display_name']}")
-        
-        # Seçilen token'ların detaylarını göster
-        if token_details:
-            print(f"\n📱 Seçilen Cihazlar:")
-            for category_key, category_token_list in token_details.items():
-                project_name, category_name = category_key.split(':', 1)
-                print(f"   🏷️  {category_name}:")
-                for token_info in category_token_list:
-                    print(f"      • {token_info['name']}")
+        print(f"\n📤 {sum(len(tokens) for tokens in groups.values())} cihaza, {len(groups)} projeye bildirim gönderilecek")
+        for project_key, tokens in groups.items():
+            print(f"   📂 {project_key}: {len(tokens)} token")
         
-        # Bildirim detaylarını al
-        notification_data = self._get_notification_details()
+        with self._timing_paused():
+            notification_data = self._get_notification_details()
         if not notification_data:
             return
         
-        title, body, data, android_priority, ios_priority, sound = notification_data
+        with self._timing_paused():
+            idempotency_key = self._menu_idempotency_key(
+                [token for tokens in groups.values() for token in tokens], *notification_data)
+        self.send_fanout(groups, *notification_data, idempotency_key=idempotency_key)
+    
+    @timed_send('fanout')
+    def send_fanout(self, groups: Dict[str, List[str]], title: str, body: str, data: dict,
+                    template: MessageTemplate, idempotency_key: Optional[str] = None) -> Dict[str, MergedBatchResponse]:
+        """Her proje grubunu kendi Firebase uygulamasıyla paralel gönder ve tek raporda topla"""
+        options = (title, body, data, template)
+        results = {}
+        errors = {}
+        started = time.monotonic()
+        
+        if idempotency_key:
+            groups = {project_key: self._skip_delivered(idempotency_key, tokens) for project_key, tokens in groups.items()}
+            groups = {project_key: tokens for project_key, tokens in groups.items() if tokens}
+            if not groups:
+                print("✅ Seçilen tüm cihazlar bu bildirimi zaten aldı")
+                return results
+        
+        self.logger.info(f"Çoklu proje gönderimi başlatıldı - Proje: {len(groups)}, "
+                         f"Token: {sum(len(tokens) for tokens in groups.values())}, Başlık: {title}")
+        
+        def send_group(project_key, app):
+            return self._send_with_retries(app, groups[project_key], *options)
+        
+        # Havuz kapasitesi kadar projeyi aynı anda aç; fazlası sonraki dalgaya kalır
+        # Uygulamalar dalga boyunca kiralanır, eşzamanlı başka bir gönderim onları tahliye edemez
+        for wave in iter_batches(groups, self.app_pool.max_apps):
+            with ExitStack() as leases:
+                apps = {}
+                for project_key in wave:
+                    project = self.available_projects.get(project_key)
+                    if not project:
+                        errors[project_key] = "Key dosyası bulunamadı"
+                        continue
+                    try:
+                        with self._span('firebase_init'):
+                            apps[project_key] = leases.enter_context(self.app_pool.lease(project_key, project['file_path']))
+                    except Exception as e:
+                        errors[project_key] = f"Firebase başlatılamadı: {e}"
+                
+                if not apps:
+                    continue
+                with ThreadPoolExecutor(max_workers=len(apps)) as executor:
+                    futures = {project_key: executor.submit(self._bind_send_timer(send_group), project_key, app) for project_key, app in apps.items()}
+                    for project_key, future in futures.items():
+                        try:
+                            results[project_key] = future.result()
+                        except Exception as e:
+                            errors[project_key] = str(e)
+        
+        # Yanıtları proje proje işle (prune adayları ve hata kayıtları burada toplanır)
+        for project_key, response in results.items():
+            project_id = self.available_projects[project_key]['project_id']
+            print(f"\n📂 {self.available_projects[project_key]['display_name']}")
+            with self._span('process'):
+                self._process_detailed_response(response, groups[project_key], project_id, title, body, project_key)
+            self._record_delivered(idempotency_key, groups[project_key], response)
+        
+        for project_key, error_msg in errors.items():
+            project_id = self.available_projects.get(project_key, {}).get('project_id', project_key)
+            self.logger.error(f"KRITIK HATA - Çoklu proje gönderimi - Proje: {project_id}, Hata: {error_msg}")
+            self._save_critical_error(project_id, error_msg, groups[project_key], title, body, data)
+            self._release_reserved(idempotency_key, groups[project_key])
+        
+        self._apply_token_prune()
+        
+        # Proje bazlı özet rapor
+        total_success = sum(response.success_count for response in results.values())
+        total_failure = (sum(response.failure_count for response in results.values())
+                         + sum(len(groups[project_key]) for project_key in errors))
+        print("\n📊 PROJE BAZLI SONUÇ:")
+        print("-" * 60)
+        for project_key in groups:
+            if project_key in results:
+                response = results[project_key]
+                duration = f"{response.duration:.2f} sn" if response.duration is not None else "-"
+                print(f"  ✅ {project_key}: Başarılı {response.success_count}, Başarısız {response.failure_count} ({duration})")
+            else:
+                print(f"  ❌ {project_key}: {len(groups[project_key])} token gönderilemedi - {errors[project_key]}")
+        print("-" * 60)
+        elapsed = time.monotonic() - started
+        print(f"📊 Toplam - Başarılı: {total_success}, Başarısız: {total_failure}, Süre: {elapsed:.2f} sn")
+        self.logger.info(f"Çoklu proje gönderimi tamamlandı - Proje: {len(groups)}, Başarılı: {total_success}, "
+                         f"Başarısız: {total_failure}, Süre: {elapsed:.2f} sn")
+        return results
+    
+    def _send_multicast_chunked(self, app, tokens: List[str], title: str, body: str, data: dict,
+                                template: MessageTemplate) -> MergedBatchResponse:
+        """Token'ları 500'lük parçalara böl, sınırlı iş parçacığı havuzuyla gönder ve yanıtları birleştir"""
+        if self.send_backend == 'async':
+            return self._send_multicast_async(app, tokens, title, body, data, template)
+        
+        from firebase_admin import messaging
+        self._configure_sdk_endpoint(app)
+        started = time.monotonic()
+        rate_limiter = self._get_rate_limiter(app)
+        # Hız sınırı varsa parça, kovanın anlık izin verdiğinden büyük olmasın
+        chunk_size = min(MULTICAST_TOKEN_LIMIT, max(1, int(rate_limiter.burst))) if rate_limiter else MULTICAST_TOKEN_LIMIT
+        chunks = [tokens[i:i + chunk_size] for i in range(0, len(tokens), chunk_size)]
+        
+        def send_chunk(chunk):
+            with self._span('build'):
+                message = template.build_multicast(chunk, title, body, data)
+            if rate_limiter:
+                with self._span('rate_limit'):
+                    rate_limiter.acquire(len(chunk))
+            chunk_started = time.monotonic()
+            try:
+                # send_each_for_multicast kullanarak daha detaylı sonuç al
+                with self._span('network'):
+                    responses, error = messaging.send_each_for_multicast(message, app=app).responses, None
+            except Exception as e:
+                # Parçanın tamamı başarısız: her token için hata kaydı üret
+                self.logger.error(f"Multicast parçası gönderilemedi ({len(chunk)} token): {e}")
+                responses, error = [ChunkErrorResponse(e) for _ in chunk], e
+            self._record_send_metrics(app.project_id, responses, time.monotonic() - chunk_started)
+            return responses, error
+        
+        if len(chunks) > 1:
+            self.logger.info(f"{len(tokens)} token {len(chunks)} parçaya bölündü (eşzamanlılık: {self.send_concurrency})")
+            with ThreadPoolExecutor(max_workers=min(self.send_concurrency, len(chunks))) as executor:
+                # map sonuçları parça sırasıyla döndürür, indeksler token listesiyle eşleşir
+                results = list(executor.map(self._bind_send_timer(send_chunk), chunks))
+        else:
+            results = [send_chunk(chunk) for chunk in chunks]
+        
+        # Hiçbir parça gönderilemediyse kritik hata olarak yukarı ilet
+        chunk_errors = [error for _, error in results if error is not None]
+        if chunk_errors and len(chunk_errors) == len(results):
+            raise chunk_errors[0]
+        
+        merged = MergedBatchResponse()
+        for responses, _ in results:
+            merged.extend(responses)
+        merged.duration = time.monotonic() - started
+        return merged
+    
+    def _send_with_retries(self, app, tokens: List[str], title: str, body: str, data: dict,
+                           template: MessageTemplate, budget: Optional[RetryBudget] = None) -> MergedBatchResponse:
+        """Gönder, ardından sadece geçici hata alan token'ları geri çekilmeyle yeniden gönder"""
+        options = (title, body, data, template)
+        if budget is None:
+            budget = RetryBudget(self.retry_budget_ratio)
+        
+        started = time.monotonic()
+        try:
+            response = self._send_multicast_chunked(app, tokens, *options)
+        except Exception as e:
+            if not is_retryable(e) or not self.retry_policy.max_retries:
+                raise
+            # Tüm parçalar geçici hatayla düştü; yeniden deneme turlarına bırak
+            response = MergedBatchResponse()
+            response.extend(ChunkErrorResponse(e) for _ in tokens)
+        budget.deposit(len(tokens))
+        
+        for attempt in range(self.retry_policy.max_retries):
+            retry_indices = [idx for idx, resp in enumerate(response.responses)
+                             if not resp.success and is_retryable(resp.exception)]
+            if not retry_indices:
+                break
+            
+            granted = budget.withdraw(len(retry_indices))
+            if granted < len(retry_indices):
+                self.logger.warning(f"Yeniden deneme bütçesi yetersiz - {len(retry_indices) - granted} token yeniden denenmeyecek")
+                retry_indices = retry_indices[:granted]
+                if not retry_indices:
+                    break
+            
+            # Sunucunun istediği en uzun Retry-After süresine uy
+            retry_after = max((value for value in (retry_after_seconds(response.responses[idx].exception)
+                                                   for idx in retry_indices) if value is not None), default=None)
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            if delay is None:
+                self.logger.warning(f"Retry-After ({retry_after:.0f} sn) bekleme sınırını aşıyor - yeniden deneme yapılmadı")
+                break
+            
+            self.logger.info(f"Yeniden deneme {attempt + 1}/{self.retry_policy.max_retries} - "
+                             f"{len(retry_indices)} token, bekleme: {delay:.2f} sn")
+            with self._span('retry_wait'):
+                time.sleep(delay)
+            
+            retry_tokens = [tokens[idx] for idx in retry_indices]
+            try:
+                retry_responses = self._send_multicast_chunked(app, retry_tokens, *options).responses
+            except Exception as e:
+                retry_responses = [ChunkErrorResponse(e) for _ in retry_tokens]
+            for idx, resp in zip(retry_indices, retry_responses):
+                response.replace(idx, resp)
         
-        # Log başlangıcı
-        self.logger.info(f"Token bildirim gönderme başlatıldı - Proje: {project_id}, Token sayısı: {len(tokens)}")
-        self.logger.info(f"Başlık: {title}, Mesaj: {body}")
-        if data:
-            self.logger.info(f"Ek veriler: {data}")
+        # Yeniden denemelerden sonra da hiçbir token gönderilemediyse kritik hata olarak yukarı ilet
+        if not response.success_count and all(isinstance(resp, ChunkErrorResponse) for resp in response.responses):
+            raise response.responses[0].exception
         
-        # Seçilen token adlarını da logla
-        for category_key, category_token_list in token_details.items():
-            project_name, category_name = category_key.split(':', 1)
-            token_names = [token_info['name'] for token_info in category_token_list]
-            self.logger.info(f"Seçilen {category_name} token'ları: {', '.join(token_names)}")
+        response.duration = time.monotonic() - started
+        return response
+    
+    def _configure_sdk_endpoint(self, app):
+        """SDK'nın messaging servisini ayarla
         
-        # Bildirimi gönder
+        fcm_api_base verildiyse istekler yerel sunucuya yönlendirilir (OAuth kullanılmaz). Bu uygulama
+        geçici hataları kendisi yeniden deniyorsa SDK'nın 500/503 tekrarları kapatılır; her deneme bütçeden geçer.
+        """
+        if not self.fcm_api_base and not self.retry_policy.max_retries:
+            return
+        from firebase_admin import _http_client, messaging
+        service = messaging._get_messaging_service(app)
+        retries = sdk_transport_retry() if self.retry_policy.max_retries else _http_client.DEFAULT_RETRY_CONFIG
+        if self.fcm_api_base:
+            # SDK adres değiştirmeye izin vermediği için uygulamaya bağlı iç servis güncellenir; sadece test içindir
+            fcm_url = f"{self.fcm_api_base.rstrip('/')}/v1/projects/{app.project_id}/messages:send"
+            if service._fcm_url != fcm_url:
+                service._fcm_url = fcm_url
+                service._client = _http_client.JsonHttpClient()
+        
+        if getattr(service._client, '_fcm_sender_retries', None) is not retries:
+            import requests
+            # SDK'nın fcm.googleapis.com için kurduğu geniş bağlantı havuzunun aynısı, farklı yeniden deneme ayarıyla
+            service._client.session.mount(self.fcm_api_base or 'https://fcm.googleapis.com', requests.adapters.HTTPAdapter(
+                pool_connections=100, pool_maxsize=100, max_retries=retries))
+            service._client._fcm_sender_retries = retries
+    
+    def _get_rate_limiter(self, app) -> Optional[TokenBucket]:
+        """Uygulamanın projesi için paylaşılan hız sınırlayıcıyı döndür (sınırsızsa None)"""
+        project = self.available_projects.get(app.name, {})
+        rate = project.get('rate_limit', self.default_rate_limit)
+        if not rate:
+            return None
+        burst = project.get('rate_burst') or self.default_rate_burst
+        
+        with self._rate_limiters_lock:
+            limiter = self._rate_limiters.get(app.project_id)
+            # Ayarlar değiştiyse (proje listesi yenilendi) kovayı yeniden oluştur
+            if limiter is None or limiter.rate != rate or (burst and limiter.burst != burst):
+                limiter = TokenBucket(rate, burst)
+                self._rate_limiters[app.project_id] = limiter
+            return limiter
+    
+    def _get_async_engine(self, app) -> "AsyncFCMEngine":
+        """Uygulamanın projesi için asenkron v1 motorunu döndür (OAuth token'ı ve SSL bağlamı gönderimler arasında korunur)"""
+        from fcm_async import AsyncFCMEngine, FCM_API_BASE
+        rate_limiter = self._get_rate_limiter(app)
+        credential = None if self.fcm_api_base else app.credential
+        
+        with self._rate_limiters_lock:
+            engine = self._async_engines.get(app.project_id)
+            # Uygulama yeniden oluşturulduysa veya hız ayarı değiştiyse motoru yenile
+            if engine is None or engine.credential is not credential or engine.rate_limiter is not rate_limiter:
+                engine = AsyncFCMEngine(app.project_id, credential=credential,
+                                        base_url=self.fcm_api_base or FCM_API_BASE, rate_limiter=rate_limiter)
+                self._async_engines[app.project_id] = engine
+            return engine
+    
+    def _send_multicast_async(self, app, tokens: List[str], title: str, body: str, data: dict,
+                              template: MessageTemplate) -> MergedBatchResponse:
+        """Token'ları asenkron HTTP/2 motoruyla tek event loop üzerinden gönder"""
+        # Ortak gövde bir kez serileştirilir, her token için sadece hedef eklenir
+        with self._span('build'):
+            base_message = template.encode_base(title, body, data)
+        engine = self._get_async_engine(app)
+        self.logger.info(f"{len(tokens)} token asenkron v1 motoruyla gönderiliyor (eşzamanlılık: {engine.worker_count})")
+        
+        started = time.monotonic()
+        merged = MergedBatchResponse()
+        # Token başına hedef ekleme ve hız sınırı beklemesi gönderimle iç içe olduğundan ağ aşamasına yazılır
+        with self._span('network'):
+            merged.extend(engine.send_all_sync(tokens, build=lambda token: template.encode_target(base_message, token=token)))
+        merged.duration = time.monotonic() - started
+        self._record_send_metrics(app.project_id, merged.responses, merged.duration)
+        return merged
+    
+    def _send_topic_message(self, app, topic: str, title: str, body: str, data: dict,
+                            template: MessageTemplate) -> str:
+        """Topic mesajını gönder; geçici hatalar multicast ile aynı politikayla yeniden denenir"""
+        for attempt in range(self.retry_policy.max_retries + 1):
+            try:
+                return self._send_topic_once(app, topic, title, body, data, template)
+            except Exception as e:
+                if attempt == self.retry_policy.max_retries or not is_retryable(e):
+                    raise
+                delay = self.retry_policy.backoff(attempt, retry_after_seconds(e))
+                if delay is None:
+                    raise
+                self.logger.info(f"Topic yeniden deneme {attempt + 1}/{self.retry_policy.max_retries} - "
+                                 f"Topic: {topic}, bekleme: {delay:.2f} sn")
+                with self._span('retry_wait'):
+                    time.sleep(delay)
+    
+    def _send_topic_once(self, app, topic: str, title: str, body: str, data: dict,
+                         template: MessageTemplate) -> str:
+        """Topic mesajını seçili altyapıyla bir kez gönder ve mesaj ID'sini döndür"""
+        started = time.monotonic()
+        if self.send_backend == 'async':
+            with self._span('build'):
+                payload = template.encode_target(template.encode_base(title, body, data), topic=topic)
+            with self._span('network'):
+                result = self._get_async_engine(app).send_sync(payload)
+            self._record_send_metrics(app.project_id, [result], time.monotonic() - started)
+            if result.exception:
+                raise result.exception
+            return result.message_id
+        
+        from firebase_admin import messaging
+        from fcm_async import AsyncSendResponse
+        self._configure_sdk_endpoint(app)
+        with self._span('build'):
+            message = template.build_message(title, body, data, topic=topic)
+        rate_limiter = self._get_rate_limiter(app)
+        if rate_limiter:
+            with self._span('rate_limit'):
+                rate_limiter.acquire()
         try:
-            # Gelişmiş mesaj konfigürasyonu
-            message = messaging.MulticastMessage(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body
-                ),
-                android=messaging.AndroidConfig(
-                    priority=android_priority,
-                    notification=messaging.AndroidNotification(
-                        sound=sound,
-                        channel_id='default'
-                    ),
-                ),
-                apns=messaging.APNSConfig(
-                    headers={'apns-priority': ios_priority},
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            sound=sound,
-                            badge=1
-                        )
-                    ),
-                ),
-                data=data if data else None,
-                tokens=tokens
-            )
-            
-            # send_each_for_multicast kullanarak daha detaylı sonuç al
-            response = messaging.send_each_for_multicast(message)
-            
-            print(f"\n✅ Bildirim gönderildi!")
-            print(f"📊 Başarılı: {response.success_count}")
-            print(f"❌ Başarısız: {response.failure_count}")
-            
-            # Başarılı gönderim logu
-            self.logger.info(f"Token bildirim gönderildi - Başarılı: {response.success_count}, Başarısız: {response.failure_count}")
-            
-            # Detaylı hata analizi
-            self._process_detailed_response(response, tokens, project_id, title, body)
-        
+            with self._span('network'):
+                message_id = messaging.send(message, app=app)
         except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Bildirim gönderilemedi: {error_msg}")
-            
-            # Detaylı hata logu
-            self.logger.error(f"KRITIK HATA - Token bildirim gönderilemedi")
-            self.logger.error(f"Proje: {project_id}")
-            self.logger.error(f"Hata: {error_msg}")
-            self.logger.error(f"Token sayısı: {len(tokens)}")
-            
-            # Hata detaylarını ayrı dosyaya kaydet
-            self._save_critical_error(project_id, error_msg, tokens, title, body, data)
+            self._record_send_metrics(app.project_id, [ChunkErrorResponse(e)], time.monotonic() - started)
+            raise
+        self._record_send_metrics(app.project_id, [AsyncSendResponse(message_id, None)], time.monotonic() - started)
+        return message_id
     
+    @timed_send('topic')
     def _send_to_topic(self):
         """Topic'e bildirim gönder"""
         # Proje seç
-        project_key = self.show_project_selection()
+        with self._timing_paused():
+            project_key = self.show_project_selection()
         if not project_key:
             return
         
-        # Firebase'i başlat
-        if not self.initialize_firebase(project_key):
-            return
-        
-        project_info = self.available_projects[project_key]
-        project_id = project_info['project_id']
-        
-        print(f"\n📡 Topic'e bildirim gönderimi")
-        print(f"🗂️  Proje: {project_info['display_name']}")
-        
-        topic = input("📌 Topic adı: ").strip()
-        if not topic:
-            print("❌ Topic adı boş olamaz!")
-            return
-        
-        # Bildirim detaylarını al
-        notification_data = self._get_notification_details()
-        if not notification_data:
-            return
-        
-        title, body, data, android_priority, ios_priority, sound = notification_data
-        
-        # Log başlangıcı
-        self.logger.info(f"Topic bildirim gönderme başlatıldı - Proje: {project_id}, Topic: {topic}")
-        self.logger.info(f"Başlık: {title}, Mesaj: {body}")
-        
-        try:
-            # Topic mesajı konfigürasyonu
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body
-                ),
-                android=messaging.AndroidConfig(
-                    priority=android_priority,
-                    notification=messaging.AndroidNotification(
-                        sound=sound,
-                        channel_id='default'
-                    ),
-                ),
-                apns=messaging.APNSConfig(
-                    headers={'apns-priority': ios_priority},
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            sound=sound,
-                            badge=1
-                        )
-                    ),
-                ),
-                data=data if data else None,
-                topic=topic
-            )
-            
-            response = messaging.send(message)
-            
-            print(f"\n✅ Topic bildirimi gönderildi!")
-            print(f"📡 Topic: {topic}")
-            print(f"📋 Mesaj ID: {response}")
-            
-            self.logger.info(f"Topic bildirim başarılı - Topic: {topic}, Mesaj ID: {response}")
-        
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Topic bildirimi gönderilemedi: {error_msg}")
+        # Uygulama gönderim boyunca kiralanır; eşzamanlı işler onu tahliye edemez
+        with self.leased_firebase(project_key) as app:
+            if app is None:
+                return
+            
+            project_info = self.available_projects[project_key]
+            project_id = project_info['project_id']
+            
+            print(f"\n📡 Topic'e bildirim gönderimi")
+            print(f"🗂️  Proje: {project_info['display_name']}")
+            
+            with self._timing_paused():
+                topic = input("📌 Topic adı: ").strip()
+            if not topic:
+                print("❌ Topic adı boş olamaz!")
+                return
             
-            self.logger.error(f"KRITIK HATA - Topic bildirim gönderilemedi")
-            self.logger.error(f"Proje: {project_id}")
-            self.logger.error(f"Topic: {topic}")
-            self.logger.error(f"Hata: {error_msg}")
+            # Bildirim detaylarını al
+            with self._timing_paused():
+                notification_data = self._get_notification_details()
+            if not notification_data:
+                return
+            
+            title, body, data, template = notification_data
+            
+            # Log başlangıcı
+            self.logger.info(f"Topic bildirim gönderme başlatıldı - Proje: {project_id}, Topic: {topic}")
+            self.logger.info(f"Başlık: {title}, Mesaj: {body}")
+            
+            try:
+                response = self._send_topic_message(
+                    app, topic, title, body, data, template
+                )
+                
+                print(f"\n✅ Topic bildirimi gönderildi!")
+                print(f"📡 Topic: {topic}")
+                print(f"📋 Mesaj ID: {response}")
+                
+                self.logger.info(f"Topic bildirim başarılı - Topic: {topic}, Mesaj ID: {response}")
             
-            # Topic hata kaydetme
-            self._save_topic_error(project_id, topic, error_msg, title, body, data)
+            except Exception as e:
+                error_msg = str(e)
+                print(f"❌ Topic bildirimi gönderilemedi: {error_msg}")
+                
+                self.logger.error(f"KRITIK HATA - Topic bildirim gönderilemedi")
+                self.logger.error(f"Proje: {project_id}")
+                self.logger.error(f"Topic: {topic}")
+                self.logger.error(f"Hata: {error_msg}")
+                
+                # Topic hata kaydetme
+                self._save_topic_error(project_id, topic, error_msg, title, body, data)
+    
+    def _menu_idempotency_key(self, tokens: List[str], title: str, body: str, data: dict,
+                              template: MessageTemplate) -> Optional[str]:
+        """Menüden gönderilen bildirimin içerikten türetilen anahtarı; tekrar gönderim istenirse None"""
+        content = json.dumps([title, body, data, template.name], ensure_ascii=False, sort_keys=True)
+        idempotency_key = 'menu:' + hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+        delivered = len(tokens) - len(self.delivery_ledger().pending(idempotency_key, tokens))
+        if delivered:
+            print(f"\n🔁 Bu bildirim {delivered} cihaza daha önce teslim edildi.")
+            if input("Bu cihazlar atlansın mı? (E/h): ").strip().lower() == 'h':
+                self.logger.info(f"Tekrar gönderim onaylandı - {delivered} cihaz yeniden bildirim alacak")
+                return None
+        return idempotency_key
     
     def _get_notification_details(self):
         """Bildirim detaylarını kullanıcıdan al"""
@@ -543,10 +1688,19 @@ class FCMSender:
             self.logger.warning("Boş başlık veya mesaj nedeniyle bildirim gönderilmedi")
             return None
         
-        # Varsayılan ayarlar
-        android_priority = 'high'
-        ios_priority = '10'
-        sound = 'default'
+        # Platform ayarları şablondan gelir (varsayılan: high / 10 / default ses)
+        try:
+            template_names = self.templates.names()
+        except (OSError, ValueError) as e:
+            print(f"❌ Şablon dosyası okunamadı: {e}")
+            return None
+        template_name = DEFAULT_TEMPLATE_NAME
+        if len(template_names) > 1:
+            template_name = input(f"🧩 Şablon ({', '.join(template_names)}) [Enter: {DEFAULT_TEMPLATE_NAME}]: ").strip() or DEFAULT_TEMPLATE_NAME
+            if template_name not in template_names:
+                print(f"❌ Şablon bulunamadı: {template_name}")
+                return None
+        template = self.templates.get(template_name)
         
         # Ek veriler (isteğe bağlı)
         print("\n🔧 Ek veriler (isteğe bağlı - Enter ile geç):")
@@ -559,14 +1713,20 @@ class FCMSender:
             if value:
                 data[key] = value
         
-        return title, body, data, android_priority, ios_priority, sound
+        return title, body, data, template
     
-    def _process_detailed_response(self, response, tokens, project_id, title, body):
+    def _process_detailed_response(self, response, tokens, project_id, title, body, project_key=None):
         """Detaylı yanıt işleme"""
+        unregistered_tokens = []
+        invalid_argument_tokens = []
+        error_histogram = Counter()
+        retry_counts = getattr(response, 'retry_counts', {})
+        
         if response.failure_count > 0:
+            # Başarısız yanıt varsa gönderim yapılmıştır; firebase_admin zaten yüklüdür
+            from firebase_admin import exceptions, messaging
             print("\n❌ Başarısız olan token'lar:")
             failed_tokens = []
-            unregistered_tokens = []
             sender_mismatch_tokens = []
             quota_exceeded_tokens = []
             other_error_tokens = []
@@ -576,7 +1736,12 @@ class FCMSender:
                     failed_token = tokens[idx]
                     error_msg = str(resp.exception) if resp.exception else "Bilinmeyen hata"
                     
-                    print(f"  - {failed_token[:50]}... : {error_msg}")
+                    # Token'ın hangi cihaza ait olduğunu ters indeksten bul
+                    location = self._locate_token(project_key, failed_token) if project_key else None
+                    if location:
+                        print(f"  - [{location[0]}] {location[1]} ({failed_token[:20]}...) : {error_msg}")
+                    else:
+                        print(f"  - {failed_token[:50]}... : {error_msg}")
                     
                     # Hata türüne göre kategorilere ayır
                     if isinstance(resp.exception, messaging.UnregisteredError):
@@ -590,19 +1755,30 @@ class FCMSender:
                         self.logger.error(f"Kota aşıldı: {failed_token[:50]}...")
                     else:
                         other_error_tokens.append(failed_token)
+                        if isinstance(resp.exception, exceptions.InvalidArgumentError):
+                            invalid_argument_tokens.append(failed_token)
                         self.logger.error(f"Diğer hata - Token: {failed_token[:50]}..., Hata: {error_msg}")
                     
-                    failed_tokens.append({
+                    failed_entry = {
                         'token': failed_token,
                         'error': error_msg,
                         'error_type': type(resp.exception).__name__ if resp.exception else 'Unknown',
                         'timestamp': datetime.now().isoformat()
-                    })
+                    }
+                    if location:
+                        failed_entry['category'], failed_entry['name'] = location
+                    if idx in retry_counts:
+                        failed_entry['retries'] = retry_counts[idx]
+                    failed_tokens.append(failed_entry)
+                    error_histogram[failed_entry['error_type']] += 1
             
             # Kategorilere göre rapor
             if unregistered_tokens:
                 print(f"\n🚫 Kayıtlı olmayan token'lar: {len(unregistered_tokens)}")
-                print("💡 Bu token'ları temizlemeniz önerilir.")
+                if self.prune_policy == 'off':
+                    print("💡 Bu token'ları temizlemeniz önerilir.")
+                else:
+                    print("🧹 Bu token'lar gönderim sonunda otomatik temizlenecek.")
             
             if sender_mismatch_tokens:
                 print(f"\n⚠️  Sender ID hatası olan token'lar: {len(sender_mismatch_tokens)}")
@@ -621,15 +1797,186 @@ class FCMSender:
             if resp.success:
                 successful_tokens.append(tokens[idx])
         
-        if successful_tokens:
-            self.logger.info(f"Başarılı token'lar ({len(successful_tokens)} adet)")
-            for token in successful_tokens:
-                self.logger.info(f"  Başarılı token: {token[:50]}...")
+        if self.log_verbosity == 'tokens':
+            if successful_tokens:
+                self.logger.info(f"Başarılı token'lar ({len(successful_tokens)} adet)")
+                for token in successful_tokens:
+                    self.logger.info(f"  Başarılı token: {token[:50]}...")
+        else:
+            # Parti başına tek özet kaydı
+            duration = getattr(response, 'duration', None)
+            duration = f"{duration:.2f} sn" if duration is not None else "-"
+            errors = ', '.join(f"{name}: {count}" for name, count in error_histogram.most_common()) or "yok"
+            self.logger.info(f"Parti özeti - Proje: {project_id}, Token: {len(tokens)}, Başarılı: {len(successful_tokens)}, "
+                             f"Başarısız: {response.failure_count}, Yeniden denenen: {len(retry_counts)}, "
+                             f"Süre: {duration}, Hatalar: {errors}")
+            if self.log_sample_rate:
+                for token in successful_tokens:
+                    if random.random() < self.log_sample_rate:
+                        self.logger.info(f"  Başarılı token (örnek): {token[:50]}...")
+        
+        self._record_prune_candidates(project_key, unregistered_tokens, invalid_argument_tokens, successful_tokens)
+    
+    def _load_token_health(self) -> Dict[str, Dict[str, int]]:
+        """Art arda InvalidArgument sayaçlarını yükle: {project_key: {token: sayı}}"""
+        if self._token_health is None:
+            self._token_health = {}
+            if self.token_health_file.exists():
+                try:
+                    with open(self.token_health_file, 'r', encoding='utf-8') as f:
+                        self._token_health = json.load(f)
+                except Exception as e:
+                    self.logger.error(f"Token sağlık dosyası okunamadı: {e}")
+        return self._token_health
+    
+    def _record_prune_candidates(self, project_key: Optional[str], unregistered_tokens: List[str],
+                                 invalid_argument_tokens: List[str], successful_tokens: List[str]):
+        """Temizlenecek token'ları işaretle; silme işlemi gönderim sonunda toplu yapılır"""
+        if self.prune_policy == 'off' or not project_key:
+            return
+        
+        with self.tokens_lock:
+            health = self._load_token_health()
+            project_health = health.setdefault(project_key, {})
+            
+            # Başarılı gönderim art arda hata sayacını sıfırlar
+            if project_health:
+                for token in successful_tokens:
+                    if project_health.pop(token, None) is not None:
+                        self._token_health_dirty = True
+            
+            for token in invalid_argument_tokens:
+                if not self._locate_token(project_key, token):
+                    continue
+                project_health[token] = project_health.get(token, 0) + 1
+                self._token_health_dirty = True
+                if project_health[token] >= self.prune_invalid_threshold:
+                    self._prune_candidates[(project_key, token)] = f"InvalidArgument x{project_health[token]}"
+            
+            for token in unregistered_tokens:
+                if self._locate_token(project_key, token):
+                    self._prune_candidates[(project_key, token)] = "UnregisteredError"
+            
+            if not project_health:
+                health.pop(project_key, None)
+    
+    def _apply_token_prune(self):
+        """İşaretlenen ölü token'ları tek bir kalıcılık adımında sil veya karantinaya al"""
+        if self.prune_policy == 'off':
+            return
+        
+        with self.tokens_lock:
+            candidates, self._prune_candidates = self._prune_candidates, {}
+            health = self._load_token_health()
+            found = []
+            for (project_key, token), reason in candidates.items():
+                location = self._locate_token(project_key, token)
+                if location:
+                    found.append((project_key, token, reason) + tuple(location))
+            
+            # Karantina kaydı silmeden önce yazılır; yazılamazsa token'lar silinmez (kayıt kaybolmasın)
+            quarantined = []
+            if found and self.prune_policy == 'quarantine':
+                now = datetime.now().isoformat()
+                for project_key, token, reason, category, token_name in found:
+                    if self._device_tokens is None:
+                        record = self.token_store.get_token(project_key, category, token_name)
+                    else:
+                        record = self._device_tokens[project_key]['tokens'][category][token_name]
+                    quarantined.append({
+                        'project_key': project_key,
+                        'category': category,
+                        'token_name': token_name,
+                        'token': record.to_dict(),
+                        'reason': reason,
+                        'quarantined_at': now
+                    })
+                if not self._save_quarantined_tokens(quarantined):
+                    print(f"❌ Karantina dosyası yazılamadı; {len(found)} ölü token silinmedi")
+                    found = []
+            
+            removals = []
+            for project_key, token, _, category, token_name in found:
+                # Yapı yüklenmediyse kayıt sadece depodan silinir
+                if self._device_tokens is not None:
+                    self._device_tokens[project_key]['tokens'][category].pop(token_name)
+                    self._token_index.remove(project_key, token)
+                if health.get(project_key, {}).pop(token, None) is not None:
+                    self._token_health_dirty = True
+                removals.append((project_key, category, token_name))
+            
+            if removals:
+                self._persist('remove_tokens', removals)
+                action = "karantinaya alındı" if quarantined else "silindi"
+                print(f"🧹 {len(removals)} ölü token {action}")
+                self.logger.info(f"Ölü token temizliği - {len(removals)} token {action}")
+            
+            # Sayaçlar gönderim başına en fazla bir kez, sadece değiştiyse kaydedilir
+            if self._token_health_dirty:
+                try:
+                    with self._span('persist'):
+                        atomic_write_text(self.token_health_file, json.dumps(
+                            {k: v for k, v in health.items() if v}, indent=2, ensure_ascii=False))
+                    self._token_health_dirty = False
+                except Exception as e:
+                    self.logger.error(f"Token sağlık dosyası kaydedilemedi: {e}")
+    
+    def _save_quarantined_tokens(self, entries: List[dict]) -> bool:
+        """Karantinaya alınan token'ları neden ve zamanla birlikte kaydet; yazılabildiyse True döndür"""
+        try:
+            self._append_journal(self.quarantine_file, entries)
+            self.logger.info(f"Karantina kaydedildi: {self.quarantine_file} ({len(entries)} token)")
+            return True
+        except Exception as e:
+            self.logger.error(f"Karantina dosyası kaydedilemedi: {e}")
+            return False
+    
+    def _journal_file(self, kind: str, legacy: bool = False) -> Path:
+        """Günlük hata kaydı dosyası (JSON Lines; legacy=True eski JSON dizi dosyası)"""
+        suffix = 'json' if legacy else 'jsonl'
+        return self.logs_dir / f"{kind}_{datetime.now().strftime('%Y%m%d')}.{suffix}"
+    
+    def _journal_exists(self, kind: str) -> bool:
+        return self._journal_file(kind).exists() or self._journal_file(kind, legacy=True).exists()
+    
+    def _append_journal(self, path: Path, entries: List[dict]):
+        """Kayıtları dosya sonuna JSON Lines olarak ekle; her parti için tek fsync"""
+        with self._span('journal'):
+            lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+            with open(path, 'a+b') as f:
+                # Önceki yazma yarım kaldıysa yeni kaydı ayrı satırdan başlat
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        lines = '\n' + lines
+                f.write(lines.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def _iter_journal(self, kind: str) -> Iterator[dict]:
+        """Günün hata kayıtlarını satır satır oku; varsa eski JSON dizi dosyasını da oku"""
+        legacy_file = self._journal_file(kind, legacy=True)
+        if legacy_file.exists():
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                yield from json.load(f)
+        
+        journal_file = self._journal_file(kind)
+        if journal_file.exists():
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Çökme sırasında yarım kalmış satır; diğer kayıtlar etkilenmez
+                        continue
     
     def _save_failed_tokens(self, project_id: str, failed_tokens: List[dict], title: str, body: str):
         """Başarısız token'ları dosyaya kaydet"""
         try:
-            failed_file = self.logs_dir / f"failed_tokens_{datetime.now().strftime('%Y%m%d')}.json"
+            failed_file = self._journal_file('failed_tokens')
             
             failed_data = {
                 'timestamp': datetime.now().isoformat(),
@@ -641,17 +1988,8 @@ class FCMSender:
                 'failed_tokens': failed_tokens
             }
             
-            # Mevcut dosyayı oku
-            existing_data = []
-            if failed_file.exists():
-                with open(failed_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-            
-            existing_data.append(failed_data)
-            
-            # Dosyaya kaydet
-            with open(failed_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_data, f, indent=2, ensure_ascii=False)
+            # Dosya sonuna tek satır olarak ekle (tüm dosya yeniden yazılmaz)
+            self._append_journal(failed_file, [failed_data])
             
             self.logger.info(f"Başarısız token'lar kaydedildi: {failed_file}")
             
@@ -661,7 +1999,7 @@ class FCMSender:
     def _save_topic_error(self, project_id: str, topic: str, error_msg: str, title: str, body: str, data: dict):
         """Topic hatasını kaydet"""
         try:
-            error_file = self.logs_dir / f"topic_errors_{datetime.now().strftime('%Y%m%d')}.json"
+            error_file = self._journal_file('topic_errors')
             
             error_data = {
                 'timestamp': datetime.now().isoformat(),
@@ -675,17 +2013,8 @@ class FCMSender:
                 }
             }
             
-            # Mevcut dosyayı oku
-            existing_data = []
-            if error_file.exists():
-                with open(error_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-            
-            existing_data.append(error_data)
-            
-            # Dosyaya kaydet
-            with open(error_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_data, f, indent=2, ensure_ascii=False)
+            # Dosya sonuna tek satır olarak ekle (tüm dosya yeniden yazılmaz)
+            self._append_journal(error_file, [error_data])
             
             self.logger.info(f"Topic hatası kaydedildi: {error_file}")
             
@@ -695,7 +2024,7 @@ class FCMSender:
     def _save_critical_error(self, project_id: str, error_msg: str, tokens: List[str], title: str, body: str, data: dict):
         """Kritik hataları dosyaya kaydet"""
         try:
-            error_file = self.logs_dir / f"critical_errors_{datetime.now().strftime('%Y%m%d')}.json"
+            error_file = self._journal_file('critical_errors')
             
             error_data = {
                 'timestamp': datetime.now().isoformat(),
@@ -710,23 +2039,222 @@ class FCMSender:
                 'tokens': [token[:50] + '...' for token in tokens]  # Sadece ilk 50 karakter
             }
             
-            # Mevcut dosyayı oku
-            existing_data = []
-            if error_file.exists():
-                with open(error_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-            
-            existing_data.append(error_data)
-            
-            # Dosyaya kaydet
-            with open(error_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_data, f, indent=2, ensure_ascii=False)
+            # Dosya sonuna tek satır olarak ekle (tüm dosya yeniden yazılmaz)
+            self._append_journal(error_file, [error_data])
             
             self.logger.info(f"Kritik hata kaydedildi: {error_file}")
             
         except Exception as e:
             self.logger.error(f"Kritik hata kaydedilemedi: {e}")
     
+    def iter_store_tokens(self, project_key: str, categories: Optional[List[str]] = None) -> Iterator[str]:
+        """Token deposundaki bir projenin (isteğe bağlı kategorilerin) token'larını sırayla ver"""
+        return self.token_store.iter_tokens(project_key, categories)
+    
+    def _campaign_template(self, spec: dict) -> MessageTemplate:
+        """Kampanya tanımındaki isimli şablonu ya da platform ayarlarına uyan şablonu döndür"""
+        if spec.get('template'):
+            return self.templates.get(spec['template'])
+        return self.templates.for_options(spec['android_priority'], spec['ios_priority'], spec['sound'])
+    
+    @timed_send('campaign')
+    def run_campaign(self, spec: dict, recipients: Optional[Iterable[str]] = None,
+                     batch_size: int = DEFAULT_CAMPAIGN_BATCH_SIZE) -> int:
+        """İnteraktif giriş olmadan kampanya gönder ve çıkış kodunu döndür"""
+        project_key = spec['project']
+        if project_key not in self.available_projects:
+            print(f"❌ Proje bulunamadı: {project_key}")
+            self.logger.error(f"Kampanya projesi bulunamadı: {project_key}")
+            return EXIT_INVALID_CAMPAIGN
+        
+        # Uygulama gönderim boyunca kiralanır; eşzamanlı işler onu tahliye edemez
+        with self.leased_firebase(project_key) as app:
+            if app is None:
+                return EXIT_FAILED
+            
+            project_id = self.available_projects[project_key]['project_id']
+            title, body, data = spec['title'], spec['body'], spec['data']
+            idempotency_key = spec.get('idempotency_key')
+            try:
+                template = self._campaign_template(spec)
+            except (OSError, ValueError) as e:
+                print(f"❌ Şablon yüklenemedi: {e}")
+                return EXIT_INVALID_CAMPAIGN
+            
+            # Topic kampanyası
+            if spec.get('topic'):
+                topic = spec['topic']
+                # Topic teslim defterinde '/topics/<ad>' hedefi olarak tutulur
+                if not self._skip_delivered(idempotency_key, [f"/topics/{topic}"]):
+                    return EXIT_OK
+                self.logger.info(f"Kampanya (topic) başlatıldı - Proje: {project_id}, Topic: {topic}")
+                try:
+                    message_id = self._send_topic_message(app, topic, title, body, data, template)
+                    print(f"✅ Topic bildirimi gönderildi: {topic} ({message_id})")
+                    self.logger.info(f"Topic bildirim başarılı - Topic: {topic}, Mesaj ID: {message_id}")
+                    if idempotency_key:
+                        self.delivery_ledger().record(idempotency_key, [f"/topics/{topic}"])
+                    return EXIT_OK
+                except Exception as e:
+                    print(f"❌ Topic bildirimi gönderilemedi: {e}")
+                    self.logger.error(f"KRITIK HATA - Topic bildirim gönderilemedi - Proje: {project_id}, Topic: {topic}, Hata: {e}")
+                    self._save_topic_error(project_id, topic, str(e), title, body, data)
+                    self._release_reserved(idempotency_key, [f"/topics/{topic}"])
+                    return EXIT_FAILED
+            
+            if recipients is None:
+                print("❌ Alıcı kaynağı belirtilmedi!")
+                return EXIT_INVALID_CAMPAIGN
+            
+            self.logger.info(f"Kampanya başlatıldı - Proje: {project_id}, Başlık: {title}, Parti boyutu: {batch_size}")
+            
+            total_success = 0
+            total_failure = 0
+            total_skipped = 0
+            batch_count = 0
+            started = time.monotonic()
+            # Yeniden deneme bütçesi tüm kampanya partileri arasında paylaşılır
+            retry_budget = RetryBudget(self.retry_budget_ratio)
+            
+            for batch in iter_batches(recipients, batch_size):
+                batch_count += 1
+                pending = self._skip_delivered(idempotency_key, batch)
+                total_skipped += len(batch) - len(pending)
+                if not pending:
+                    continue
+                batch = pending
+                try:
+                    response = self._send_with_retries(app, batch, title, body, data, template,
+                                                       budget=retry_budget)
+                except Exception as e:
+                    error_msg = str(e)
+                    total_failure += len(batch)
+                    print(f"❌ Parti {batch_count}: {len(batch)} token gönderilemedi: {error_msg}")
+                    self.logger.error(f"KRITIK HATA - Kampanya partisi gönderilemedi - Proje: {project_id}, Parti: {batch_count}, Hata: {error_msg}")
+                    self._save_critical_error(project_id, error_msg, batch, title, body, data)
+                    self._release_reserved(idempotency_key, batch)
+                    continue
+                
+                total_success += response.success_count
+                total_failure += response.failure_count
+                with self._span('process'):
+                    self._process_detailed_response(response, batch, project_id, title, body, project_key)
+                self._record_delivered(idempotency_key, batch, response)
+                
+                elapsed = time.monotonic() - started
+                print(f"📦 Parti {batch_count}: {len(batch)} token - Başarılı: {response.success_count}, "
+                      f"Başarısız: {response.failure_count} | Toplam: {total_success + total_failure} ({elapsed:.1f} sn)")
+                self.logger.info(f"Kampanya partisi {batch_count} - Başarılı: {response.success_count}, Başarısız: {response.failure_count}")
+            
+            self._apply_token_prune()
+            
+            skipped_note = f", Atlanan: {total_skipped}" if total_skipped else ""
+            print(f"\n✅ Kampanya tamamlandı - Parti: {batch_count}, Başarılı: {total_success}, Başarısız: {total_failure}{skipped_note}")
+            self.logger.info(f"Kampanya tamamlandı - Proje: {project_id}, Başarılı: {total_success}, Başarısız: {total_failure}{skipped_note}")
+            
+            if total_success + total_failure == 0:
+                if total_skipped:
+                    # Tekrar çalıştırma: tüm alıcılar daha önce teslim almış
+                    return EXIT_OK
+                print("❌ Hiç alıcı bulunamadı!")
+                return EXIT_INVALID_CAMPAIGN
+            if total_success == 0:
+                return EXIT_FAILED
+            return EXIT_PARTIAL if total_failure else EXIT_OK
+    
+    def send_queue_job(self, job: QueueJob, spec: dict) -> tuple:
+        """Kuyruktan kiralanan parçayı gönder ve (başarılı, başarısız) döndür; hata fırlatırsa parça yeniden kuyruğa döner"""
+        project_key = spec['project']
+        project = self.available_projects.get(project_key)
+        if not project:
+            raise ValueError(f"Proje bulunamadı: {project_key}")
+        
+        # Anahtar verilmediyse kuyruk kampanyası kendi anahtarıdır; çökme sonrası devralınan parçada
+        # daha önce teslim edilmiş token'lar tekrar gönderilmez
+        idempotency_key = spec.get('idempotency_key') or f"queue:{job.campaign_id}"
+        targets = [f"/topics/{spec['topic']}"] if spec.get('topic') else job.tokens
+        pending = self._skip_delivered(idempotency_key, targets)
+        skipped = len(targets) - len(pending)
+        if not pending:
+            return skipped, 0
+        
+        try:
+            return self._send_reserved_queue_job(job, spec, project, pending, skipped, idempotency_key)
+        except Exception:
+            # Parça yeniden kuyruğa döner; teslim edilmeyen token'lar sonraki denemede tekrar ayrılabilsin
+            self._release_reserved(idempotency_key, pending)
+            raise
+    
+    def _send_reserved_queue_job(self, job: QueueJob, spec: dict, project: dict, pending: List[str], skipped: int,
+                                 idempotency_key: str) -> tuple:
+        """Ayrılmış token'larla kuyruk parçasını gönder"""
+        project_key = spec['project']
+        project_id = project['project_id']
+        title, body, data = spec['title'], spec['body'], spec['data']
+        template = self._campaign_template(spec)
+        
+        # Uygulama gönderim bitene kadar kiralanır; eşzamanlı başka iş onu tahliye edemez
+        with self._span('firebase_init'):
+            app = self.app_pool.acquire(project_key, project['file_path'])
+        try:
+            if spec.get('topic'):
+                message_id = self._send_topic_message(app, spec['topic'], title, body, data, template)
+                self.delivery_ledger().record(idempotency_key, pending)
+                self.logger.info(f"Kuyruk topic bildirimi başarılı - Topic: {spec['topic']}, Mesaj ID: {message_id}")
+                return 1, 0
+            
+            response = self._send_with_retries(app, pending, title, body, data, template)
+        finally:
+            self.app_pool.release(project_key, app)
+        
+        self._record_delivered(idempotency_key, pending, response)
+        with self._span('process'):
+            self._process_detailed_response(response, pending, project_id, title, body, project_key)
+        print(f"📦 Kuyruk parçası {job.campaign_id}/{job.seq}: {len(pending)} token - "
+              f"Başarılı: {response.success_count}, Başarısız: {response.failure_count}")
+        self.logger.info(f"Kuyruk parçası gönderildi - Kampanya: {job.campaign_id}, Parça: {job.seq}, Proje: {project_id}, "
+                         f"Başarılı: {response.success_count}, Başarısız: {response.failure_count}, Atlanan: {skipped}")
+        # Daha önce teslim edilmiş token'lar parça sonucunda başarılı sayılır
+        return response.success_count + skipped, response.failure_count
+    
+    def dispatch_scheduled(self, spec: dict, schedules: List[ScheduledSend], idempotency_key: str) -> str:
+        """Vakti gelen (aynı bildirimli) zamanlanmış işleri tek kampanya olarak gönder"""
+        print(f"\n⏰ Zamanlanmış gönderim: {', '.join(schedule.id for schedule in schedules)} - {spec['title']}")
+        # Her tur kendi anahtarıyla gönderilir; tekrarlı işler sonraki turlarda yine tüm alıcılara gider
+        spec = dict(spec, idempotency_key=idempotency_key)
+        recipients = None if spec.get('topic') else self._iter_scheduled_recipients(spec['project'], schedules)
+        exit_code = self.run_campaign(spec, recipients)
+        if exit_code in (EXIT_FAILED, EXIT_INVALID_CAMPAIGN):
+            raise RuntimeError(f"Kampanya çıkış kodu {exit_code}")
+        return f"Çıkış kodu {exit_code}"
+    
+    def _iter_scheduled_recipients(self, project_key: str, schedules: List[ScheduledSend]) -> Iterator[str]:
+        """Birleştirilen işlerin alıcılarını sırayla ver; birden çok iş varsa ortak token'lar bir kez gönderilir"""
+        seen = set() if len(schedules) > 1 else None
+        for schedule in schedules:
+            source = schedule.recipients
+            if 'tokens' in source:
+                tokens = source['tokens']
+            elif 'file' in source:
+                tokens = iter_recipients_file(source['file'])
+            else:
+                tokens = self.iter_store_tokens(project_key, source.get('categories'))
+            for token in tokens:
+                if seen is not None:
+                    if token in seen:
+                        continue
+                    seen.add(token)
+                yield token
+    
+    def _queue_job_failed(self, job: QueueJob, spec: dict, error: Exception):
+        """Deneme hakkı biten kuyruk parçasını kritik hata olarak kaydet"""
+        project_id = self.available_projects.get(spec['project'], {}).get('project_id', spec['project'])
+        print(f"❌ Kuyruk parçası {job.campaign_id}/{job.seq} gönderilemedi: {error}")
+        if spec.get('topic'):
+            self._save_topic_error(project_id, spec['topic'], str(error), spec['title'], spec['body'], spec['data'])
+        else:
+            self._save_critical_error(project_id, str(error), job.tokens, spec['title'], spec['body'], spec['data'])
+    
     def manage_tokens(self):
         """Token yönetimi menüsü"""
         while True:
@@ -784,10 +2312,10 @@ class FCMSender:
             for category, category_tokens in tokens.items():
                 print(f"\n   🏷️  {category} ({len(category_tokens)} token):")
                 if category_tokens:
-                    for token_name, token_data in category_tokens.items():
-                        created = token_data.get('created', 'Bilinmeyen')[:19]
-                        print(f"      • {token_data.get('name', token_name)}")
-                        print(f"        Token: {token_data['token'][:50]}...")
+                    for record in category_tokens.values():
+                        created = record.created_iso or 'Bilinmeyen'
+                        print(f"      • {record.name}")
+                        print(f"        Token: {record.token[:50]}...")
                         print(f"        Oluşturulma: {created}")
                 else:
                     print("      (Boş)")
@@ -823,34 +2351,91 @@ class FCMSender:
                 if not token_name:
                     token_name = default_name
                 
-                # Token'ın zaten var olup olmadığını kontrol et
-                existing_tokens = {}
-                for cat_tokens in self.device_tokens[project_key]['tokens'].values():
-                    existing_tokens.update(cat_tokens)
-                
-                for existing_token_data in existing_tokens.values():
-                    if existing_token_data['token'] == token:
-                        print(f"❌ Bu token zaten mevcut: {existing_token_data['name']}")
-                        return
-                
-                # Token'ı ekle
-                if category not in self.device_tokens[project_key]['tokens']:
-                    self.device_tokens[project_key]['tokens'][category] = {}
-                
-                self.device_tokens[project_key]['tokens'][category][token_name] = {
-                    'token': token,
-                    'name': token_name,
-                    'created': datetime.now().isoformat()
-                }
-                
-                self.save_device_tokens()
+                try:
+                    self.store_token(project_key, category, token, token_name)
+                except ValueError as e:
+                    print(f"❌ {e}")
+                    return
                 print(f"✅ Token '{token_name}' {category} kategorisine eklendi!")
-                self.logger.info(f"Yeni token eklendi - Proje: {project_key}, Kategori: {category}, Ad: {token_name}")
             else:
                 print("❌ Geçersiz kategori!")
         except ValueError:
             print("❌ Geçerli bir numara girin!")
     
+    def ensure_token_project(self, project_key: str) -> Dict:
+        """Key dosyası olan projeyi token yapısına ekle (yoksa) ve proje kaydını döndür"""
+        with self.tokens_lock:
+            if project_key not in self.device_tokens:
+                project_info = self.available_projects[project_key]
+                self.device_tokens[project_key] = {
+                    'project_id': project_info['project_id'],
+                    'display_name': project_info['display_name'],
+                    'tokens': {
+                        'iPhone': {},
+                        'Android': {},
+                        'iPad': {},
+                        'Web': {},
+                        'Test': {}
+                    }
+                }
+                self._persist('add_project', project_key, self.device_tokens[project_key])
+            return self.device_tokens[project_key]
+    
+    def store_token(self, project_key: str, category: str, token: str, token_name: Optional[str] = None) -> str:
+        """Token'ı projenin kategorisine ekle ve kaydet; eklenen adı döndür (token zaten varsa ValueError)"""
+        with self.tokens_lock:
+            project_tokens = self.device_tokens[project_key]['tokens']
+            
+            # Token'ın zaten var olup olmadığını kontrol et (ters indeksten)
+            location = self.token_index.locate(project_key, token)
+            if location:
+                existing_category, existing_name = location
+                raise ValueError(f"Bu token zaten mevcut: {project_tokens[existing_category][existing_name].name}")
+            
+            category_tokens = project_tokens.setdefault(sys.intern(category), {})
+            token_name = token_name or f"{category}_{len(category_tokens) + 1}"
+            
+            # Aynı adlı eski kayıt varsa üzerine yazılır, indeksten de çıkar
+            replaced = category_tokens.get(token_name)
+            if replaced:
+                self.token_index.remove(project_key, replaced.token)
+            
+            category_tokens[token_name] = TokenRecord(token, token_name, int(time.time()))
+            self.token_index.add(project_key, category, token_name, token)
+            self._persist('add_token', project_key, category, token_name, category_tokens[token_name])
+        
+        self.logger.info(f"Yeni token eklendi - Proje: {project_key}, Kategori: {category}, Ad: {token_name}")
+        return token_name
+    
+    def delete_token(self, project_key: str, category: str, token_name: str) -> TokenRecord:
+        """Token'ı sil ve silinen kaydı döndür (yoksa KeyError)"""
+        with self.tokens_lock:
+            record = self.device_tokens[project_key]['tokens'][category].pop(token_name)
+            self.token_index.remove(project_key, record.token)
+            self._persist('remove_token', project_key, category, token_name)
+        
+        self.logger.info(f"Token silindi - Proje: {project_key}, Token: {token_name}")
+        return record
+    
+    def rename_stored_token(self, project_key: str, category: str, token_name: str, new_name: str) -> TokenRecord:
+        """Token'ın adını değiştir (yoksa KeyError); yeni ad kategoride varsa o kayıt üzerine yazılır"""
+        with self.tokens_lock:
+            category_tokens = self.device_tokens[project_key]['tokens'][category]
+            # Eski anahtarı sil, yeni anahtarla ekle (kayıt yerinde değiştirilmez, yenisi oluşturulur)
+            record = category_tokens.pop(token_name)
+            current_name = record.name
+            record = record.renamed(new_name)
+            
+            replaced = category_tokens.get(new_name)
+            if replaced:
+                self.token_index.remove(project_key, replaced.token)
+            category_tokens[new_name] = record
+            self.token_index.rename(project_key, record.token, new_name)
+            self._persist('rename_token', project_key, category, token_name, new_name, new_name)
+        
+        self.logger.info(f"Token adı değiştirildi - Proje: {project_key}, Eski: {current_name}, Yeni: {new_name}")
+        return record
+    
     def _select_project_for_token(self):
         """Token işlemleri için proje seç"""
         if not self.device_tokens:
@@ -907,19 +2492,7 @@ class FCMSender:
                 project_key = available_keys[choice]
                 project_info = self.available_projects[project_key]
                 
-                self.device_tokens[project_key] = {
-                    'project_id': project_info['project_id'],
-                    'display_name': project_info['display_name'],
-                    'tokens': {
-                        'iPhone': {},
-                        'Android': {},
-                        'iPad': {},
-                        'Web': {},
-                        'Test': {}
-                    }
-                }
-                
-                self.save_device_tokens()
+                self.ensure_token_project(project_key)
                 print(f"✅ Proje eklendi: {project_info['display_name']}")
                 self.logger.info(f"Yeni proje eklendi: {project_key}")
                 return project_key
@@ -936,39 +2509,28 @@ class FCMSender:
         if not project_key:
             return
         
-        tokens = self.device_tokens[project_key]['tokens']
-        
-        # Tüm token'ları listele
-        all_tokens = []
-        for category, category_tokens in tokens.items():
-            for token_name, token_data in category_tokens.items():
-                all_tokens.append({
-                    'category': category,
-                    'name': token_name,
-                    'token': token_data['token'],
-                    'display': f"{category} - {token_data['name']}"
-                })
+        # Tüm token'ları listele: (kategori, ad, kayıt) üçlüleri, kayıtlar kopyalanmaz
+        all_tokens = list(iter_token_records(self.device_tokens[project_key]))
         
         if not all_tokens:
             print("❌ Bu projede hiç token yok!")
             return
         
         print(f"\n📱 {self.device_tokens[project_key]['display_name']} Token'ları:")
-        for i, token_info in enumerate(all_tokens, 1):
-            print(f"{i}. {token_info['display']}")
-            print(f"   {token_info['token'][:50]}...")
+        for i, (category, _, record) in enumerate(all_tokens, 1):
+            print(f"{i}. {category} - {record.name}")
+            print(f"   {record.token[:50]}...")
         
         try:
             choice = int(input("Silinecek token numarası: ")) - 1
             if 0 <= choice < len(all_tokens):
-                token_info = all_tokens[choice]
+                category, token_name, record = all_tokens[choice]
+                display = f"{category} - {record.name}"
                 
-                confirm = input(f"'{token_info['display']}' token'ını silmek istediğinizden emin misiniz? (evet/hayır): ")
+                confirm = input(f"'{display}' token'ını silmek istediğinizden emin misiniz? (evet/hayır): ")
                 if confirm.lower() in ['evet', 'e', 'yes', 'y']:
-                    del self.device_tokens[project_key]['tokens'][token_info['category']][token_info['name']]
-                    self.save_device_tokens()
-                    print(f"✅ Token silindi: {token_info['display']}")
-                    self.logger.info(f"Token silindi - Proje: {project_key}, Token: {token_info['name']}")
+                    self.delete_token(project_key, category, token_name)
+                    print(f"✅ Token silindi: {display}")
                 else:
                     print("❌ İşlem iptal edildi!")
             else:
@@ -982,48 +2544,30 @@ class FCMSender:
         if not project_key:
             return
         
-        tokens = self.device_tokens[project_key]['tokens']
-        
-        # Tüm token'ları listele
-        all_tokens = []
-        for category, category_tokens in tokens.items():
-            for token_name, token_data in category_tokens.items():
-                all_tokens.append({
-                    'category': category,
-                    'name': token_name,
-                    'data': token_data,
-                    'display': f"{category} - {token_data['name']}"
-                })
+        # Tüm token'ları listele: (kategori, ad, kayıt) üçlüleri, kayıtlar kopyalanmaz
+        all_tokens = list(iter_token_records(self.device_tokens[project_key]))
         
         if not all_tokens:
             print("❌ Bu projede hiç token yok!")
             return
         
         print(f"\n📱 {self.device_tokens[project_key]['display_name']} Token'ları:")
-        for i, token_info in enumerate(all_tokens, 1):
-            print(f"{i}. {token_info['display']}")
+        for i, (category, _, record) in enumerate(all_tokens, 1):
+            print(f"{i}. {category} - {record.name}")
         
         try:
             choice = int(input("Adı değiştirilecek token numarası: ")) - 1
             if 0 <= choice < len(all_tokens):
-                token_info = all_tokens[choice]
-                current_name = token_info['data']['name']
+                category, token_name, record = all_tokens[choice]
+                current_name = record.name
                 
                 new_name = input(f"Yeni ad (şu anki: {current_name}): ").strip()
                 if not new_name:
                     print("❌ Yeni ad boş olamaz!")
                     return
                 
-                # Eski anahtarı sil, yeni anahtarla ekle
-                old_data = self.device_tokens[project_key]['tokens'][token_info['category']][token_info['name']]
-                del self.device_tokens[project_key]['tokens'][token_info['category']][token_info['name']]
-                
-                old_data['name'] = new_name
-                self.device_tokens[project_key]['tokens'][token_info['category']][new_name] = old_data
-                
-                self.save_device_tokens()
+                self.rename_stored_token(project_key, category, token_name, new_name)
                 print(f"✅ Token adı değiştirildi: {current_name} → {new_name}")
-                self.logger.info(f"Token adı değiştirildi - Proje: {project_key}, Eski: {current_name}, Yeni: {new_name}")
             else:
                 print("❌ Geçersiz token numarası!")
         except ValueError:
@@ -1054,8 +2598,10 @@ class FCMSender:
                 confirm = input("Devam etmek istediğinizden emin misiniz? (evet/hayır): ")
                 
                 if confirm.lower() in ['evet', 'e', 'yes', 'y']:
-                    del self.device_tokens[project_key]
-                    self.save_device_tokens()
+                    with self.tokens_lock:
+                        del self.device_tokens[project_key]
+                        self.token_index.remove_project(project_key)
+                        self._persist('remove_project', project_key)
                     print(f"✅ Proje silindi: {display_name}")
                     self.logger.info(f"Proje silindi: {project_key}")
                 else:
@@ -1104,6 +2650,8 @@ class FCMSender:
             print(f"\n📂 {project_key}")
             print(f"   Proje ID: {project['project_id']}")
             print(f"   Dosya: {project['file_path']}")
+            if project['rate_limit']:
+                print(f"   Hız sınırı: {project['rate_limit']:g} mesaj/sn")
     
     def open_keys_folder(self):
         """JSON keys klasörünü aç"""
@@ -1162,6 +2710,7 @@ class FCMSender:
         print(f"\n📊 Genel Özet:")
         print(f"   • Toplam token sayısı: {total_tokens}")
         print(f"   • Aktif proje sayısı: {added_project_count}")
+        print(f"   • Sıcak Firebase uygulaması: {len(self.app_pool.warm_projects())}")
         
         # Dosya durumu
         print(f"\n📁 Dosya Durumları:")
@@ -1171,15 +2720,46 @@ class FCMSender:
         
         # Log durumu
         today_log = self.logs_dir / f"fcm_log_{datetime.now().strftime('%Y%m%d')}.log"
-        failed_log = self.logs_dir / f"failed_tokens_{datetime.now().strftime('%Y%m%d')}.json"
-        error_log = self.logs_dir / f"critical_errors_{datetime.now().strftime('%Y%m%d')}.json"
-        topic_log = self.logs_dir / f"topic_errors_{datetime.now().strftime('%Y%m%d')}.json"
         
         print(f"\n📋 Bugünkü Log Durumu:")
         print(f"   • Genel log: {today_log.exists()}")
-        print(f"   • Başarısız token log: {failed_log.exists()}")
-        print(f"   • Kritik hata log: {error_log.exists()}")
-        print(f"   • Topic hata log: {topic_log.exists()}")
+        print(f"   • Başarısız token log: {self._journal_exists('failed_tokens')}")
+        print(f"   • Kritik hata log: {self._journal_exists('critical_errors')}")
+        print(f"   • Topic hata log: {self._journal_exists('topic_errors')}")
+        
+        self._show_metrics_snapshot()
+    
+    def _show_metrics_snapshot(self):
+        """Bu oturumdaki gönderim metriklerinin özetini göster"""
+        print(f"\n📈 Gönderim Metrikleri (bu oturum):")
+        
+        sent = self._sent_metric.values()
+        if not sent:
+            print("   • Henüz gönderim yapılmadı")
+        latency = self._batch_latency_metric.stats()
+        failed = self._failed_metric.values()
+        for (project_id,), sent_count in sent.items():
+            succeeded = self._succeeded_metric.value(project_id=project_id)
+            errors = {error_type: count for (pid, error_type), count in failed.items() if pid == project_id}
+            batches = [stat for (pid, _), stat in latency.items() if pid == project_id]
+            batch_count = sum(count for count, _ in batches)
+            average = sum(total for _, total in batches) / batch_count if batch_count else 0.0
+            print(f"   • {project_id}: Gönderilen {sent_count:g}, Başarılı {succeeded:g}, "
+                  f"Başarısız {sum(errors.values()):g}, Ort. parti süresi {average:.2f} sn")
+            if errors:
+                print(f"     Hatalar: {', '.join(f'{name}: {count:g}' for name, count in sorted(errors.items()))}")
+        
+        init_stats = list(self._firebase_init_metric.stats().values())
+        if init_stats:
+            init_count = sum(count for count, _ in init_stats)
+            print(f"   • Firebase başlatma: {init_count} kez, ort. {sum(t for _, t in init_stats) / init_count * 1000:.1f} ms")
+        persist_stats = list(self._persist_metric.stats().values())
+        if persist_stats:
+            persist_count = sum(count for count, _ in persist_stats)
+            print(f"   • Token kaydı: {persist_count} kez, ort. {sum(t for _, t in persist_stats) / persist_count * 1000:.1f} ms")
+        if self._metrics_server:
+            host, port = self._metrics_server.server_address[:2]
+            print(f"   • Prometheus: http://{host}:{port}/metrics")
     
     def show_logs(self):
         """Log dosyalarını göster ve yönet"""
@@ -1192,7 +2772,8 @@ class FCMSender:
             print("4. Topic Hatalarını Göster")
             print("5. Log Dosyalarını Listele")
             print("6. Log Klasörünü Aç")
-            print("7. Ana Menüye Dön")
+            print("7. Logları Filtrele")
+            print("8. Ana Menüye Dön")
             print("-" * 40)
             
             choice = input("Seçiminiz: ").strip()
@@ -1210,6 +2791,8 @@ class FCMSender:
             elif choice == "6":
                 self._open_logs_folder()
             elif choice == "7":
+                self._filter_logs()
+            elif choice == "8":
                 break
             else:
                 print("❌ Geçersiz seçim!")
@@ -1226,37 +2809,78 @@ class FCMSender:
         print("=" * 60)
         
         try:
-            with open(today_log, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # Son 50 satırı göster
-            recent_lines = lines[-50:] if len(lines) > 50 else lines
+            # Son 50 satırı dosyanın sonundan okuyarak göster
+            recent_lines = tail_lines(today_log, 50)
             
             for line in recent_lines:
                 print(line.strip())
             
-            if len(lines) > 50:
-                print(f"\n... (Toplam {len(lines)} satır, son 50 satır gösteriliyor)")
+            if len(recent_lines) == 50:
+                print(f"\n... (Dosya boyutu {format_file_size(today_log.stat().st_size)}, son 50 satır gösteriliyor)")
                 
         except Exception as e:
             print(f"❌ Log dosyası okunamadı: {e}")
     
+    def _filter_logs(self):
+        """Bugünkü logu seviye, proje, zaman aralığı ve metne göre filtrele"""
+        today_log = self.logs_dir / f"fcm_log_{datetime.now().strftime('%Y%m%d')}.log"
+        
+        if not today_log.exists():
+            print("❌ Bugünkü log dosyası bulunamadı!")
+            return
+        
+        print("\n🔎 Filtreler (boş bırakılan filtre uygulanmaz):")
+        level = input("Seviye (INFO/WARNING/ERROR): ").strip() or None
+        project_id = input("Proje ID: ").strip() or None
+        substring = input("Aranan metin: ").strip() or None
+        
+        try:
+            since = input("Başlangıç (HH:MM veya YYYY-MM-DD HH:MM): ").strip()
+            since = parse_log_time(since) if since else None
+            until = input("Bitiş (HH:MM veya YYYY-MM-DD HH:MM): ").strip()
+            until = parse_log_time(until) if until else None
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        
+        self.print_filtered_logs(today_log, level, project_id, since, until, substring)
+    
+    @staticmethod
+    def print_filtered_logs(log_file: Path, level=None, project_id=None, since=None, until=None,
+                            substring=None, limit: int = 200) -> int:
+        """Filtreye uyan satırları yazdır, eşleşme sayısını döndür"""
+        print(f"\n📋 FİLTRELENMİŞ LOGLAR ({log_file.name}):")
+        print("=" * 60)
+        
+        match_count = 0
+        try:
+            for line in iter_filtered_log_lines(log_file, level, project_id, since, until, substring):
+                match_count += 1
+                if match_count <= limit:
+                    print(line)
+        except Exception as e:
+            print(f"❌ Log dosyası okunamadı: {e}")
+            return match_count
+        
+        if match_count > limit:
+            print(f"\n... (Toplam {match_count} eşleşme, ilk {limit} satır gösteriliyor)")
+        elif not match_count:
+            print("❌ Filtreye uyan satır bulunamadı!")
+        return match_count
+    
     def _show_failed_tokens_log(self):
         """Başarısız token loglarını göster"""
-        failed_file = self.logs_dir / f"failed_tokens_{datetime.now().strftime('%Y%m%d')}.json"
+        failed_file = self._journal_file('failed_tokens')
         
-        if not failed_file.exists():
+        if not self._journal_exists('failed_tokens'):
             print("❌ Bugün başarısız token kaydı bulunamadı!")
             return
         
         try:
-            with open(failed_file, 'r', encoding='utf-8') as f:
-                failed_data = json.load(f)
-            
             print(f"\n❌ BAŞARISIZ TOKEN'LAR ({failed_file.name}):")
             print("=" * 60)
             
-            for entry in failed_data:
+            for entry in self._iter_journal('failed_tokens'):
                 timestamp = entry.get('timestamp', 'Bilinmeyen')
                 project_id = entry.get('project_id', 'Bilinmeyen')
                 notification = entry.get('notification', {})
@@ -1280,20 +2904,17 @@ class FCMSender:
     
     def _show_critical_errors_log(self):
         """Kritik hata loglarını göster"""
-        error_file = self.logs_dir / f"critical_errors_{datetime.now().strftime('%Y%m%d')}.json"
+        error_file = self._journal_file('critical_errors')
         
-        if not error_file.exists():
+        if not self._journal_exists('critical_errors'):
             print("❌ Bugün kritik hata kaydı bulunamadı! (Bu iyi bir şey 😊)")
             return
         
         try:
-            with open(error_file, 'r', encoding='utf-8') as f:
-                error_data = json.load(f)
-            
             print(f"\n🚨 KRİTİK HATALAR ({error_file.name}):")
             print("=" * 60)
             
-            for entry in error_data:
+            for entry in self._iter_journal('critical_errors'):
                 timestamp = entry.get('timestamp', 'Bilinmeyen')
                 project_id = entry.get('project_id', 'Bilinmeyen')
                 error_msg = entry.get('error_message', 'Bilinmeyen')
@@ -1310,20 +2931,17 @@ class FCMSender:
     
     def _show_topic_errors_log(self):
         """Topic hata loglarını göster"""
-        error_file = self.logs_dir / f"topic_errors_{datetime.now().strftime('%Y%m%d')}.json"
+        error_file = self._journal_file('topic_errors')
         
-        if not error_file.exists():
+        if not self._journal_exists('topic_errors'):
             print("❌ Bugün topic hata kaydı bulunamadı!")
             return
         
         try:
-            with open(error_file, 'r', encoding='utf-8') as f:
-                error_data = json.load(f)
-            
             print(f"\n🚨 TOPIC HATALARI ({error_file.name}):")
             print("=" * 60)
             
-            for entry in error_data:
+            for entry in self._iter_journal('topic_errors'):
                 timestamp = entry.get('timestamp', 'Bilinmeyen')
                 project_id = entry.get('project_id', 'Bilinmeyen')
                 topic = entry.get('topic', 'Bilinmeyen')
@@ -1341,32 +2959,33 @@ class FCMSender:
         except Exception as e:
             print(f"❌ Topic hata dosyası okunamadı: {e}")
     
-    def _list_log_files(self):
+    def _list_log_files(self, limit: int = 30):
         """Log dosyalarını listele"""
         print(f"\n📁 LOG DOSYALARI ({self.logs_dir}):")
         print("=" * 50)
         
-        log_files = list(self.logs_dir.glob("*.log")) + list(self.logs_dir.glob("*.json"))
-        log_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+        # Dosya başına tek stat; sadece en yeni dosyalar sıralanır
+        log_entries = []
+        with os.scandir(self.logs_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(('.log', '.jsonl', '.json')):
+                    stat = entry.stat()
+                    log_entries.append((stat.st_mtime, stat.st_size, entry.name))
         
-        if not log_files:
+        if not log_entries:
             print("❌ Hiç log dosyası bulunamadı!")
             return
         
-        for log_file in log_files:
-            file_size = log_file.stat().st_size
-            file_time = datetime.fromtimestamp(log_file.stat().st_mtime)
+        for file_mtime, file_size, file_name in heapq.nlargest(limit, log_entries):
+            file_time = datetime.fromtimestamp(file_mtime)
             
-            size_str = f"{file_size} bytes"
-            if file_size > 1024:
-                size_str = f"{file_size / 1024:.1f} KB"
-            if file_size > 1024 * 1024:
-                size_str = f"{file_size / (1024 * 1024):.1f} MB"
-            
-            print(f"📄 {log_file.name}")
-            print(f"   Boyut: {size_str}")
+            print(f"📄 {file_name}")
+            print(f"   Boyut: {format_file_size(file_size)}")
             print(f"   Tarih: {file_time.strftime('%Y-%m-%d %H:%M:%S')}")
             print()
+        
+        if len(log_entries) > limit:
+            print(f"... (Toplam {len(log_entries)} dosya, en yeni {limit} dosya gösteriliyor)")
     
     def _open_logs_folder(self):
         """Log klasörünü aç"""
@@ -1397,24 +3016,52 @@ class FCMSender:
             self.logger.warning("Firebase keys klasörü bulunamadı")
             return
             
+        try:
+            project_limits = load_project_limits(self.project_limits_file)
+        except (OSError, ValueError) as e:
+            project_limits = {}
+            self.logger.error(f"{self.project_limits_file} okunamadı, varsayılan hız sınırı kullanılacak: {e}")
+        
+        # Değişmeyen (yol + mtime + boyut) key dosyaları yeniden okunmaz
+        metadata_cache = KeyMetadataCache(self.key_metadata_cache_file, self.logger)
+        key_files = sorted(self.firebase_keys_dir.glob("*.json"))
         project_count = 0
-        for json_file in self.firebase_keys_dir.glob("*.json"):
+        cached_count = 0
+        for json_file in key_files:
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    key_data = json.load(f)
+                signature = file_signature(json_file)
+                cached = metadata_cache.lookup(json_file, signature)
+                if cached:
+                    project_id = cached['project_id']
+                    cached_count += 1
+                else:
+                    with open(json_file, 'r', encoding='utf-8') as f:
+                        key_data = json.load(f)
                     project_id = key_data.get('project_id', 'Bilinmeyen Proje')
-                    self.available_projects[json_file.stem] = {
-                        'file_path': json_file,
-                        'project_id': project_id,
-                        'display_name': f"{json_file.stem} ({project_id})"
-                    }
-                    project_count += 1
+                    metadata_cache.store(json_file, signature, project_id)
                     self.logger.info(f"Proje yüklendi: {project_id} - {json_file.name}")
+                # Hız ayarı proje anahtarı veya project_id ile verilebilir
+                limits = project_limits.get(json_file.stem) or project_limits.get(project_id) or {}
+                self.available_projects[json_file.stem] = {
+                    'file_path': json_file,
+                    'project_id': project_id,
+                    'display_name': f"{json_file.stem} ({project_id})",
+                    'rate_limit': float(limits.get('rate_limit', self.default_rate_limit)),
+                    'rate_burst': limits.get('rate_burst', self.default_rate_burst)
+                }
+                project_count += 1
             except Exception as e:
                 self.logger.error(f"{json_file.name} dosyası okunamadı: {e}")
                 print(f"❌ {json_file.name} dosyası okunamadı: {e}")
         
-        self.logger.info(f"Toplam {project_count} proje yüklendi")
+        metadata_cache.retain(key_files)
+        metadata_cache.save()
+        self.logger.info(f"Toplam {project_count} proje yüklendi (önbellekten: {cached_count})")
+        
+        # Key dosyası kaldırılan projelerin sıcak uygulamalarını kapat
+        for project_key in self.app_pool.warm_projects():
+            if project_key not in self.available_projects:
+                self.app_pool.evict(project_key)
     
     def run(self):
         """Ana uygulama döngüsü"""
@@ -1443,19 +3090,476 @@ class FCMSender:
             print("\n\n👋 Uygulama sonlandırıldı!")
         
         finally:
-            # Firebase uygulamasını temizle
-            if self.current_app:
-                try:
-                    firebase_admin.delete_app(self.current_app)
-                except:
-                    pass
+            # Havuzdaki tüm Firebase uygulamalarını temizle
+            self.app_pool.close_all()
+            self.token_store.close()
+            self.stop_metrics_server()
+            self.shutdown_logging()
 
-def main():
-    """Ana fonksiyon"""
-    # Gerekli kütüphaneleri kontrol et
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Komut satırı argümanlarını tanımla"""
+    parser = argparse.ArgumentParser(description="FCM Bildirim Gönderici")
+    parser.add_argument('--backend', choices=SEND_BACKENDS, default='sdk', help="Gönderim altyapısı")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SEND_CONCURRENCY,
+                        help="Aynı anda gönderilecek multicast parçası sayısı")
+    parser.add_argument('--fcm-api-base',
+                        help="FCM v1 API adresi (yerel test sunucusu için, örn. fcm_mock_server.py; her iki altyapıda da geçerli)")
+    parser.add_argument('--prune', choices=PRUNE_POLICIES, default='off',
+                        help="Ölü token'ları gönderim sonunda sil veya karantinaya al")
+    parser.add_argument('--prune-invalid-threshold', type=int, default=DEFAULT_INVALID_ARGUMENT_THRESHOLD,
+                        help="Temizlik için art arda InvalidArgument hatası sayısı")
+    parser.add_argument('--log-verbosity', choices=LOG_VERBOSITY_LEVELS, default='summary',
+                        help="summary: parti başına özet, tokens: her başarılı token için satır")
+    parser.add_argument('--log-sample-rate', type=float, default=0.0,
+                        help="summary modunda bireysel loglanacak başarılı token oranı (0-1)")
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Geçici hata alan token'lar için en fazla yeniden deneme turu (0: kapalı)")
+    parser.add_argument('--retry-budget', type=float, default=DEFAULT_RETRY_BUDGET_RATIO,
+                        help="Kampanya başına yeniden deneme bütçesi (gönderilen token sayısına oran)")
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE_LIMIT,
+                        help="Proje başına varsayılan gönderim hızı, mesaj/sn (0: sınırsız; project_limits.json ile proje bazında)")
+    parser.add_argument('--rate-burst', type=float,
+                        help="Hız sınırlayıcının anlık izin verdiği en fazla mesaj (varsayılan: hız değeri)")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="Prometheus metriklerini bu portta /metrics adresinden sun (0: kapalı)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Her gönderimi cProfile ile profille ve sonucu logs/profile_*.prof dosyasına yaz")
+    parser.add_argument('--idempotency-ttl', type=float, default=DEFAULT_IDEMPOTENCY_TTL,
+                        help="Teslim kayıtlarının saklanma süresi (sn); bu süre içinde aynı anahtarla gönderim tekrarlanmaz")
+    parser.add_argument('--token-store', choices=TOKEN_STORE_BACKENDS, default='json',
+                        help="Token deposu (sqlite seçilirse device_tokens.json ilk açılışta taşınır)")
+    parser.add_argument('--token-save-delay', type=float, default=DEFAULT_TOKEN_SAVE_DELAY,
+                        help="JSON deposunda art arda gelen değişikliklerin tek yazımda birleştirildiği süre (sn, 0: hemen)")
+    parser.add_argument('--token-journal', action='store_true',
+                        help="JSON deposu için değişiklik günlüğü: her değişiklik anında device_tokens.json.journal'a eklenir")
+    
+    subparsers = parser.add_subparsers(dest='command')
+    
+    campaign = subparsers.add_parser('campaign', help="Etkileşimsiz kampanya gönderimi")
+    campaign.add_argument('--spec', required=True, help="Kampanya tanımı (JSON)")
+    source = campaign.add_mutually_exclusive_group()
+    source.add_argument('--recipients', help="Alıcı dosyası (JSONL veya CSV)")
+    source.add_argument('--from-store', action='store_true',
+                        help="Alıcıları token deposundaki proje token'larından al")
+    campaign.add_argument('--category', action='append',
+                          help="--from-store ile sadece bu kategoriler (birden çok verilebilir)")
+    campaign.add_argument('--batch-size', type=int, default=DEFAULT_CAMPAIGN_BATCH_SIZE,
+                          help="Dosyadan okunup tek seferde gönderilecek token sayısı")
+    campaign.add_argument('--idempotency-key',
+                          help="Gönderim anahtarı; aynı anahtarla tekrar çalıştırmada teslim edilmiş token'lar atlanır")
+    
+    serve = subparsers.add_parser('serve', help="Yerel HTTP/JSON API ile servis modunda çalış")
+    # Varsayılanlar fcm_daemon'dan gelir; modül (http.server) sadece serve komutunda yüklenir
+    serve.add_argument('--host', help="Dinlenecek adres (varsayılan: 127.0.0.1)")
+    serve.add_argument('--port', type=int, help="Dinlenecek port (varsayılan: 8787)")
+    serve.add_argument('--scheduler', action='store_true', help="Zamanlanmış gönderimleri de servis içinde ateşle")
+    serve.add_argument('--schedule-file', default=str(SCHEDULE_FILE), help="Zamanlanmış gönderim veritabanı")
+    
+    schedule_parser = subparsers.add_parser('schedule', help="Zamanlanmış ve gecikmeli gönderimler")
+    schedule_parser.add_argument('--schedule-file', default=str(SCHEDULE_FILE), help="Zamanlanmış gönderim veritabanı")
+    schedule_commands = schedule_parser.add_subparsers(dest='schedule_command', required=True)
+    schedule_add = schedule_commands.add_parser('add', help="Kampanyayı ileri bir zamana kur")
+    schedule_add.add_argument('--spec', required=True, help="Kampanya tanımı (JSON)")
+    when = schedule_add.add_mutually_exclusive_group(required=True)
+    when.add_argument('--at', help="Gönderim zamanı (HH:MM veya YYYY-MM-DD HH:MM)")
+    when.add_argument('--in', dest='delay', help="Şu andan itibaren gecikme (örn. 30s, 15m, 2h, 1d)")
+    schedule_add.add_argument('--every', help="Tekrar aralığı (örn. 1h, 1d)")
+    schedule_source = schedule_add.add_mutually_exclusive_group()
+    schedule_source.add_argument('--recipients', help="Alıcı dosyası (JSONL veya CSV; gönderim anında okunur)")
+    schedule_source.add_argument('--from-store', action='store_true',
+                                 help="Alıcıları gönderim anında token deposundan al")
+    schedule_add.add_argument('--category', action='append',
+                              help="--from-store ile sadece bu kategoriler (birden çok verilebilir)")
+    schedule_list = schedule_commands.add_parser('list', help="Zamanlanmış gönderimleri listele")
+    schedule_list.add_argument('--all', action='store_true', help="Tamamlanan ve iptal edilenleri de göster")
+    schedule_cancel = schedule_commands.add_parser('cancel', help="Zamanlanmış gönderimi iptal et")
+    schedule_cancel.add_argument('schedule_id', help="İş ID'si")
+    schedule_commands.add_parser('run', help="Zamanlayıcıyı çalıştır ve vakti gelen gönderimleri ateşle")
+    
+    queue_parser = subparsers.add_parser('queue', help="Kalıcı giden kuyruk: kampanyayı kuyruğa yaz, worker'larla gönder")
+    queue_parser.add_argument('--queue-file', default=str(OUTBOUND_QUEUE_FILE), help="Kuyruk veritabanı")
+    queue_commands = queue_parser.add_subparsers(dest='queue_command', required=True)
+    enqueue = queue_commands.add_parser('enqueue', help="Kampanyayı parçalara bölüp kuyruğa yaz (gönderim yapılmaz)")
+    enqueue.add_argument('--spec', required=True, help="Kampanya tanımı (JSON)")
+    enqueue_source = enqueue.add_mutually_exclusive_group()
+    enqueue_source.add_argument('--recipients', help="Alıcı dosyası (JSONL veya CSV)")
+    enqueue_source.add_argument('--from-store', action='store_true',
+                                help="Alıcıları token deposundaki proje token'larından al")
+    enqueue.add_argument('--category', action='append',
+                         help="--from-store ile sadece bu kategoriler (birden çok verilebilir)")
+    enqueue.add_argument('--chunk-size', type=int, default=DEFAULT_JOB_SIZE, help="Parça başına token sayısı")
+    enqueue.add_argument('--idempotency-key',
+                         help="Gönderim anahtarı (varsayılan: kuyruk kampanya ID'si)")
+    queue_run = queue_commands.add_parser('run', help="Worker havuzunu çalıştır (yarım kalan parçalar devam ettirilir)")
+    queue_run.add_argument('--workers', type=int, default=DEFAULT_QUEUE_WORKERS, help="Worker thread sayısı")
+    queue_run.add_argument('--until-empty', action='store_true', help="Kuyruk boşalınca çık")
+    queue_run.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS,
+                           help="Parça kiralama süresi (sn); çöken worker'ın parçası bu süreden sonra devralınır")
+    queue_run.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                           help="Parça başına en fazla deneme sayısı")
+    queue_status = queue_commands.add_parser('status', help="Kuyruk durumunu göster")
+    queue_status.add_argument('--campaign', help="Sadece bu kampanya")
+    
+    logs = subparsers.add_parser('logs', help="Log dosyasını sondan göster veya filtrele")
+    logs.add_argument('--file', help="Log dosyası (varsayılan: bugünkü log)")
+    logs.add_argument('--tail', type=int, help="Sadece son N satırı göster")
+    logs.add_argument('--level', help="Seviye (INFO/WARNING/ERROR)")
+    logs.add_argument('--project-id', help="Proje ID içeren satırlar")
+    logs.add_argument('--since', help="Başlangıç zamanı (HH:MM veya YYYY-MM-DD HH:MM)")
+    logs.add_argument('--until', help="Bitiş zamanı (HH:MM veya YYYY-MM-DD HH:MM)")
+    logs.add_argument('--grep', help="Aranan metin")
+    logs.add_argument('--limit', type=int, default=1000, help="Yazdırılacak en fazla satır")
+    return parser
+
+
+def run_campaign_command(app: FCMSender, args) -> int:
+    """'campaign' komutunu çalıştır"""
     try:
-        import firebase_admin
-    except ImportError:
+        spec = load_campaign_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"❌ Kampanya tanımı okunamadı: {e}")
+        return EXIT_INVALID_CAMPAIGN
+    if args.idempotency_key:
+        spec['idempotency_key'] = args.idempotency_key
+    
+    if spec.get('topic'):
+        recipients = None
+    elif args.recipients:
+        if not Path(args.recipients).exists():
+            print(f"❌ Alıcı dosyası bulunamadı: {args.recipients}")
+            return EXIT_INVALID_CAMPAIGN
+        recipients = iter_recipients_file(args.recipients)
+    elif args.from_store:
+        recipients = app.iter_store_tokens(spec['project'], args.category)
+    else:
+        print("❌ --recipients veya --from-store belirtilmeli (ya da tanımda 'topic' olmalı)")
+        return EXIT_INVALID_CAMPAIGN
+    
+    try:
+        return app.run_campaign(spec, recipients, max(1, args.batch_size))
+    except ValueError as e:
+        # Bozuk JSONL satırı vb.
+        print(f"❌ Alıcı dosyası okunamadı: {e}")
+        return EXIT_INVALID_CAMPAIGN
+    finally:
+        app.app_pool.close_all()
+        app.token_store.close()
+        app.close_delivery_ledger()
+        app.stop_metrics_server()
+        app.shutdown_logging()
+
+
+def run_queue_command(app: FCMSender, args) -> int:
+    """'queue' komutunu çalıştır"""
+    outbound = OutboundQueue(Path(args.queue_file))
+    try:
+        if args.queue_command == 'enqueue':
+            return _enqueue_campaign(app, outbound, args)
+        if args.queue_command == 'status':
+            return _show_queue_status(outbound, args.campaign)
+        return _run_queue_workers(app, outbound, args)
+    finally:
+        outbound.close()
+        app.app_pool.close_all()
+        app.token_store.close()
+        app.close_delivery_ledger()
+        app.stop_metrics_server()
+        app.shutdown_logging()
+
+
+def _enqueue_campaign(app: FCMSender, outbound: OutboundQueue, args) -> int:
+    try:
+        spec = load_campaign_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"❌ Kampanya tanımı okunamadı: {e}")
+        return EXIT_INVALID_CAMPAIGN
+    if args.idempotency_key:
+        spec['idempotency_key'] = args.idempotency_key
+    
+    if spec['project'] not in app.available_projects:
+        print(f"❌ Proje bulunamadı: {spec['project']}")
+        return EXIT_INVALID_CAMPAIGN
+    
+    if spec.get('topic'):
+        recipients = []
+    elif args.recipients:
+        if not Path(args.recipients).exists():
+            print(f"❌ Alıcı dosyası bulunamadı: {args.recipients}")
+            return EXIT_INVALID_CAMPAIGN
+        recipients = iter_recipients_file(args.recipients)
+    elif args.from_store:
+        recipients = app.iter_store_tokens(spec['project'], args.category)
+    else:
+        print("❌ --recipients veya --from-store belirtilmeli (ya da tanımda 'topic' olmalı)")
+        return EXIT_INVALID_CAMPAIGN
+    
+    try:
+        campaign_id = outbound.enqueue(spec, recipients, min(max(1, args.chunk_size), MULTICAST_TOKEN_LIMIT))
+    except ValueError as e:
+        print(f"❌ Alıcı dosyası okunamadı: {e}")
+        return EXIT_INVALID_CAMPAIGN
+    
+    counts = outbound.status(campaign_id).get('pending', {'jobs': 0, 'tokens': 0})
+    if not counts['jobs']:
+        print("❌ Hiç alıcı bulunamadı!")
+        return EXIT_INVALID_CAMPAIGN
+    print(f"📥 Kampanya kuyruğa alındı: {campaign_id} - Parça: {counts['jobs']}, Token: {counts['tokens']}")
+    app.logger.info(f"Kampanya kuyruğa alındı - ID: {campaign_id}, Proje: {spec['project']}, "
+                    f"Parça: {counts['jobs']}, Token: {counts['tokens']}")
+    return EXIT_OK
+
+
+def _show_queue_status(outbound: OutboundQueue, campaign_id: Optional[str] = None) -> int:
+    campaigns = outbound.campaigns(campaign_id=campaign_id)
+    if campaign_id and not campaigns:
+        print(f"❌ Kampanya bulunamadı: {campaign_id}")
+        return 1
+    
+    print("\n📬 GİDEN KUYRUK")
+    print("-" * 60)
+    for state in ('pending', 'leased', 'done', 'failed'):
+        counts = outbound.status(campaign_id).get(state)
+        if counts:
+            print(f"  {state:8}: {counts['jobs']} parça, {counts['tokens']} token")
+    for cid, spec, created_at, job_count, token_count in campaigns:
+        counts = outbound.status(cid)
+        done = counts.get('done', {})
+        print(f"  📦 {cid} [{spec['project']}] {datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M')} - "
+              f"{done.get('jobs', 0)}/{job_count} parça, Başarılı: {done.get('success', 0)}, "
+              f"Başarısız: {done.get('failure', 0)}, Kalıcı hata: {counts.get('failed', {}).get('jobs', 0)}")
+    print("-" * 60)
+    return 0
+
+
+def _run_queue_workers(app: FCMSender, outbound: OutboundQueue, args) -> int:
+    # Önceki çalıştırma çöktüyse onaylanmamış parçalar yeniden gönderilir (en az bir kez teslim);
+    # aynı kuyruğu işleyen diğer canlı süreçlerin kiraları korunur
+    resumed = outbound.requeue_stale_leases()
+    if resumed:
+        print(f"♻️  Yarım kalan {resumed} parça kuyruğa geri alındı")
+        app.logger.warning(f"Kuyruk: onaylanmamış {resumed} parça yeniden kuyruğa alındı")
+    
+    pool = QueueWorkerPool(outbound, app.send_queue_job, workers=args.workers, lease_seconds=args.lease,
+                           max_attempts=args.max_attempts, logger=app.logger, on_give_up=app._queue_job_failed)
+    print(f"🚚 Kuyruk worker'ları başlatıldı - Worker: {pool.workers}")
+    app.logger.info(f"Kuyruk worker'ları başlatıldı - Worker: {pool.workers}, Sahip: {pool.owner}")
+    
+    # SIGTERM de Ctrl+C gibi düzgün kapatma yapsın
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    started = time.monotonic()
+    pool.start(exit_when_empty=args.until_empty)
+    try:
+        while pool.is_running():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\n👋 Worker'lar durduruluyor (uçuştaki parçalar tamamlanıyor)...")
+    finally:
+        pool.stop()
+    
+    app._apply_token_prune()
+    elapsed = time.monotonic() - started
+    print(f"📊 Kuyruk - Tamamlanan: {pool.stats['done']}, Yeniden kuyruğa: {pool.stats['requeued']}, "
+          f"Kalıcı hata: {pool.stats['failed']}, Süre: {elapsed:.1f} sn")
+    app.logger.info(f"Kuyruk worker'ları durdu - Tamamlanan: {pool.stats['done']}, "
+                    f"Yeniden kuyruğa: {pool.stats['requeued']}, Kalıcı hata: {pool.stats['failed']}")
+    return EXIT_PARTIAL if pool.stats['failed'] else EXIT_OK
+
+
+def run_schedule_command(app: FCMSender, args) -> int:
+    """'schedule' komutunu çalıştır"""
+    store = ScheduleStore(Path(args.schedule_file))
+    try:
+        if args.schedule_command == 'add':
+            return _add_schedule(app, store, args)
+        if args.schedule_command == 'list':
+            return _list_schedules(store, args.all)
+        if args.schedule_command == 'cancel':
+            if not store.cancel(args.schedule_id):
+                print(f"❌ Aktif zamanlanmış gönderim bulunamadı: {args.schedule_id}")
+                return 1
+            print(f"🗑️  Zamanlanmış gönderim iptal edildi: {args.schedule_id}")
+            app.logger.info(f"Zamanlanmış gönderim iptal edildi - İş: {args.schedule_id}")
+            return 0
+        return _run_scheduler(app, store)
+    finally:
+        store.close()
+        app.app_pool.close_all()
+        app.token_store.close()
+        app.close_delivery_ledger()
+        app.stop_metrics_server()
+        app.shutdown_logging()
+
+
+def _add_schedule(app: FCMSender, store: ScheduleStore, args) -> int:
+    try:
+        spec = load_campaign_spec(args.spec)
+        if args.at:
+            due_at = parse_log_time(args.at).timestamp()
+        else:
+            due_at = time.time() + parse_duration(args.delay)
+        interval = parse_duration(args.every) if args.every else None
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return EXIT_INVALID_CAMPAIGN
+    
+    if spec['project'] not in app.available_projects:
+        print(f"❌ Proje bulunamadı: {spec['project']}")
+        return EXIT_INVALID_CAMPAIGN
+    if due_at < time.time() and not interval:
+        print(f"❌ Gönderim zamanı geçmişte: {datetime.fromtimestamp(due_at).strftime('%Y-%m-%d %H:%M:%S')}")
+        return EXIT_INVALID_CAMPAIGN
+    
+    if spec.get('topic'):
+        recipients = {}
+    elif args.recipients:
+        if not Path(args.recipients).exists():
+            print(f"❌ Alıcı dosyası bulunamadı: {args.recipients}")
+            return EXIT_INVALID_CAMPAIGN
+        recipients = {'file': str(Path(args.recipients).resolve())}
+    elif args.from_store:
+        recipients = {'categories': args.category}
+    else:
+        print("❌ --recipients veya --from-store belirtilmeli (ya da tanımda 'topic' olmalı)")
+        return EXIT_INVALID_CAMPAIGN
+    
+    schedule_id = store.add(spec, recipients, due_at, interval)
+    when = datetime.fromtimestamp(due_at).strftime('%Y-%m-%d %H:%M:%S')
+    repeat = f", her {args.every}" if interval else ""
+    print(f"⏰ Gönderim zamanlandı: {schedule_id} - {when}{repeat}")
+    app.logger.info(f"Gönderim zamanlandı - İş: {schedule_id}, Proje: {spec['project']}, Zaman: {when}{repeat}")
+    return EXIT_OK
+
+
+def _list_schedules(store: ScheduleStore, include_inactive: bool = False) -> int:
+    schedules = store.list(include_inactive)
+    if not schedules:
+        print("📭 Zamanlanmış gönderim yok")
+        return 0
+    
+    print("\n⏰ ZAMANLANMIŞ GÖNDERİMLER")
+    print("-" * 60)
+    for schedule in schedules:
+        when = datetime.fromtimestamp(schedule.due_at).strftime('%Y-%m-%d %H:%M:%S')
+        repeat = f" (her {schedule.interval:.0f} sn)" if schedule.interval else ""
+        target = f"topic: {schedule.spec['topic']}" if schedule.spec.get('topic') else schedule.spec['project']
+        print(f"  {schedule.id} [{schedule.state}] {when}{repeat} - {target} - {schedule.spec['title']}")
+        if schedule.runs:
+            print(f"      Çalışma: {schedule.runs}, Son sonuç: {schedule.last_result}")
+    print("-" * 60)
+    return 0
+
+
+def start_scheduler(app: FCMSender, store: ScheduleStore) -> Scheduler:
+    """Zamanlayıcı thread'ini başlat ve bekleyen iş özetini yazdır"""
+    scheduler = Scheduler(store, app.dispatch_scheduled, logger=app.logger)
+    scheduler.start()
+    next_due = scheduler.next_due()
+    next_note = f", sıradaki: {datetime.fromtimestamp(next_due).strftime('%Y-%m-%d %H:%M:%S')}" if next_due else ""
+    print(f"⏰ Zamanlayıcı başlatıldı - Bekleyen: {scheduler.pending_count()}{next_note}")
+    app.logger.info(f"Zamanlayıcı başlatıldı - Bekleyen: {scheduler.pending_count()}")
+    return scheduler
+
+
+def _run_scheduler(app: FCMSender, store: ScheduleStore) -> int:
+    scheduler = start_scheduler(app, store)
+    # SIGTERM de Ctrl+C gibi düzgün kapatma yapsın
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n👋 Zamanlayıcı durduruluyor...")
+    finally:
+        scheduler.stop()
+    print(f"📊 Zamanlayıcı - Ateşlenen iş: {scheduler.stats['fired']}, Gönderim: {scheduler.stats['dispatches']}, "
+          f"Başarısız: {scheduler.stats['failed']}")
+    return 0
+
+
+def run_serve_command(app: FCMSender, args) -> int:
+    """'serve' komutunu çalıştır: uygulamaları ısıt ve Ctrl+C / SIGTERM gelene kadar istekleri karşıla"""
+    from fcm_daemon import DEFAULT_DAEMON_HOST, DEFAULT_DAEMON_PORT, FCMDaemon
+    host = args.host or DEFAULT_DAEMON_HOST
+    port = DEFAULT_DAEMON_PORT if args.port is None else args.port
+    daemon = FCMDaemon(app, host, port)
+    try:
+        daemon.start()
+    except OSError as e:
+        print(f"❌ Servis başlatılamadı ({host}:{port}): {e}")
+        return 1
+    
+    warmed = daemon.warm_up()
+    print(f"🔥 Sıcak Firebase uygulaması: {len(warmed)}, token: {sum(app.project_token_counts().values())}")
+    print(f"🌐 Servis dinleniyor: http://{daemon.host}:{daemon.port}")
+    app.logger.info(f"Servis modu başlatıldı - http://{daemon.host}:{daemon.port}")
+    
+    schedule_store = scheduler = None
+    if args.scheduler:
+        schedule_store = ScheduleStore(Path(args.schedule_file))
+        scheduler = start_scheduler(app, schedule_store)
+    
+    # SIGTERM de Ctrl+C gibi düzgün kapatma yapsın
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servis durduruluyor...")
+    finally:
+        daemon.shutdown()
+        if scheduler:
+            scheduler.stop()
+            schedule_store.close()
+        app.app_pool.close_all()
+        app.token_store.close()
+        app.close_delivery_ledger()
+        app.stop_metrics_server()
+        app.logger.info("Servis modu durduruldu")
+        app.shutdown_logging()
+    return 0
+
+
+def run_logs_command(args) -> int:
+    """'logs' komutunu FCMSender başlatmadan çalıştır"""
+    log_file = Path(args.file) if args.file else Path("logs") / f"fcm_log_{datetime.now().strftime('%Y%m%d')}.log"
+    if not log_file.exists():
+        print(f"❌ Log dosyası bulunamadı: {log_file}")
+        return 1
+    
+    if args.tail and not any((args.level, args.project_id, args.since, args.until, args.grep)):
+        for line in tail_lines(log_file, args.tail):
+            print(line)
+        return 0
+    
+    try:
+        since = parse_log_time(args.since) if args.since else None
+        until = parse_log_time(args.until) if args.until else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    match_count = FCMSender.print_filtered_logs(log_file, args.level, args.project_id, since, until,
+                                                args.grep, args.limit)
+    return 0 if match_count else 1
+
+
+def command_sends(args) -> bool:
+    """Komut bildirim gönderiyor mu (kuyruğa yazma, listeleme ve iptal firebase-admin gerektirmez)"""
+    if args.command == 'queue':
+        return args.queue_command == 'run'
+    if args.command == 'schedule':
+        return args.schedule_command == 'run'
+    return args.command != 'logs'
+
+
+def main(argv: Optional[List[str]] = None):
+    """Ana fonksiyon"""
+    args = build_arg_parser().parse_args(argv)
+    
+    if args.command == 'logs':
+        sys.exit(run_logs_command(args))
+    
+    # Gönderim yapan komutlar için kütüphaneyi kontrol et (yüklemeden; firebase_admin ilk gönderimde import edilir)
+    if command_sends(args) and importlib.util.find_spec('firebase_admin') is None:
         print("❌ firebase-admin kütüphanesi bulunamadı!")
         print("🔧 Yüklemek için: pip install firebase-admin")
         return
@@ -1463,7 +3567,30 @@ def main():
     print("🔥 FCM Bildirim Gönderici başlatılıyor...")
     
     # Uygulamayı başlat
-    app = FCMSender()
+    app = FCMSender(send_concurrency=args.concurrency, send_backend=args.backend,
+                    fcm_api_base=args.fcm_api_base, token_backend=args.token_store,
+                    token_save_delay=args.token_save_delay, token_journal=args.token_journal,
+                    prune_policy=args.prune, prune_invalid_threshold=args.prune_invalid_threshold,
+                    log_verbosity=args.log_verbosity, log_sample_rate=args.log_sample_rate,
+                    max_retries=args.max_retries, retry_budget_ratio=args.retry_budget,
+                    rate_limit=args.rate_limit, rate_burst=args.rate_burst,
+                    profile_sends=args.profile, idempotency_ttl=args.idempotency_ttl)
+    
+    if args.metrics_port:
+        app.start_metrics_server(args.metrics_port)
+    
+    if args.command == 'campaign':
+        sys.exit(run_campaign_command(app, args))
+    
+    if args.command == 'serve':
+        sys.exit(run_serve_command(app, args))
+    
+    if args.command == 'queue':
+        sys.exit(run_queue_command(app, args))
+    
+    if args.command == 'schedule':
+        sys.exit(run_schedule_command(app, args))
+    
     app.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Önceden derlenmiş mesaj şablonları
+Android/APNs platform blokları şablon başına bir kez oluşturulur ve v1 JSON olarak
+serileştirilir; gönderimde sadece başlık, mesaj, veri ve hedef doldurulur
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_TEMPLATE_NAME = 'default'
+
+# İsimli şablonların okunduğu dosya
+MESSAGE_TEMPLATES_FILE = Path("message_templates.json")
+
+# Şablon dosyasında kabul edilen alanlar
+TEMPLATE_FIELDS = ('android_priority', 'ios_priority', 'sound', 'badge', 'channel_id')
+
+
+class MessageTemplate:
+    """Platform ayarları sabit, içerik ve hedef gönderimde doldurulan mesaj şablonu"""
+
+    def __init__(self, name: str, android_priority: str = 'high', ios_priority: str = '10',
+                 sound: str = 'default', badge: Optional[int] = 1, channel_id: str = 'default'):
+        self.name = name
+        self.android_priority = android_priority
+        self.ios_priority = str(ios_priority)
+        self.sound = sound
+        self.badge = badge
+        self.channel_id = channel_id
+        # SDK platform nesneleri ilk SDK gönderiminde oluşturulur (firebase_admin o zaman yüklenir)
+        self._sdk_configs = None
+
+        # v1 API için platform blokları bir kez serileştirilir
+        aps = {'sound': sound}
+        if badge is not None:
+            aps['badge'] = badge
+        self.platform_payload = {
+            'android': {
+                'priority': android_priority,
+                'notification': {
+                    'sound': sound,
+                    'channel_id': channel_id
+                }
+            },
+            'apns': {
+                'headers': {'apns-priority': self.ios_priority},
+                'payload': {'aps': aps}
+            }
+        }
+        self._platform_json = json.dumps(self.platform_payload)[1:-1]
+
+    def sdk_configs(self) -> tuple:
+        """(AndroidConfig, APNSConfig); SDK nesneleri salt okunur kullanılır, her parça/mesaj için yeniden oluşturulmaz"""
+        if self._sdk_configs is None:
+            from firebase_admin import messaging
+            android_config = messaging.AndroidConfig(
+                priority=self.android_priority,
+                notification=messaging.AndroidNotification(
+                    sound=self.sound,
+                    channel_id=self.channel_id
+                ),
+            )
+            apns_config = messaging.APNSConfig(
+                headers={'apns-priority': self.ios_priority},
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        sound=self.sound,
+                        badge=self.badge
+                    )
+                ),
+            )
+            self._sdk_configs = (android_config, apns_config)
+        return self._sdk_configs
+
+    def build_multicast(self, tokens: List[str], title: str, body: str, data: Optional[dict]) -> "messaging.MulticastMessage":
+        """Token listesi için multicast mesajı oluştur"""
+        from firebase_admin import messaging
+        android_config, apns_config = self.sdk_configs()
+        return messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            android=android_config,
+            apns=apns_config,
+            data=data if data else None,
+            tokens=tokens
+        )
+
+    def build_message(self, title: str, body: str, data: Optional[dict], token: Optional[str] = None,
+                      topic: Optional[str] = None) -> "messaging.Message":
+        """Tek token veya topic için mesaj oluştur"""
+        from firebase_admin import messaging
+        android_config, apns_config = self.sdk_configs()
+        return messaging.Message(
+            notification=messaging.Notification(title=title, body=body),
+            android=android_config,
+            apns=apns_config,
+            data=data if data else None,
+            token=token,
+            topic=topic
+        )
+
+    def payload(self, title: str, body: str, data: Optional[dict], token: Optional[str] = None,
+                topic: Optional[str] = None) -> dict:
+        """v1 mesaj gövdesini sözlük olarak oluştur"""
+        message = dict(self.platform_payload, notification={'title': title, 'body': body})
+        if data:
+            message['data'] = data
+        if token:
+            message['token'] = token
+        if topic:
+            message['topic'] = topic
+        return message
+
+    def encode_base(self, title: str, body: str, data: Optional[dict]) -> str:
+        """Hedef hariç v1 istek gövdesini bir kez JSON'a çevir (encode_target ile tamamlanır)"""
+        parts = [self._platform_json, '"notification": ' + json.dumps({'title': title, 'body': body})]
+        if data:
+            parts.append('"data": ' + json.dumps(data))
+        return '{"message": {' + ', '.join(parts)
+
+    @staticmethod
+    def encode_target(base: str, token: Optional[str] = None, topic: Optional[str] = None) -> bytes:
+        """encode_base çıktısına hedefi ekleyip istek gövdesini döndür"""
+        if token:
+            target = '"token": ' + json.dumps(token)
+        else:
+            target = '"topic": ' + json.dumps(topic)
+        return (base + ', ' + target + '}}').encode('utf-8')
+
+
+class TemplateRegistry:
+    """İsimli şablonları dosyadan okuyup önbellekte tutar; dosya değişince yeniden yükler"""
+
+    def __init__(self, path: Path = MESSAGE_TEMPLATES_FILE):
+        self.path = path
+        self._templates: Dict[str, MessageTemplate] = {}
+        self._mtime = None
+        # Kampanya tanımındaki ayarlardan oluşturulan isimsiz şablonlar
+        self._adhoc: Dict[tuple, MessageTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        mtime = self.path.stat().st_mtime if self.path.exists() else None
+        if self._templates and mtime == self._mtime:
+            return
+
+        templates = {DEFAULT_TEMPLATE_NAME: MessageTemplate(DEFAULT_TEMPLATE_NAME)}
+        if mtime is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                definitions = json.load(f)
+            if not isinstance(definitions, dict):
+                raise ValueError(f"{self.path} bir JSON nesnesi olmalı")
+            for name, options in definitions.items():
+                options = {key: value for key, value in (options or {}).items() if key in TEMPLATE_FIELDS}
+                templates[name] = MessageTemplate(name, **options)
+        self._templates = templates
+        self._mtime = mtime
+
+    def get(self, name: str = DEFAULT_TEMPLATE_NAME) -> MessageTemplate:
+        """İsimli şablonu döndür"""
+        with self._lock:
+            self._reload_if_changed()
+            template = self._templates.get(name)
+        if template is None:
+            raise ValueError(f"Şablon bulunamadı: {name}")
+        return template
+
+    def names(self) -> List[str]:
+        """Tanımlı şablon adları"""
+        with self._lock:
+            self._reload_if_changed()
+            return list(self._templates)
+
+    def for_options(self, android_priority: str = 'high', ios_priority: str = '10',
+                    sound: str = 'default') -> MessageTemplate:
+        """Verilen platform ayarları için önbellekteki isimsiz şablonu döndür"""
+        key = (android_priority, str(ios_priority), sound)
+        with self._lock:
+            template = self._adhoc.get(key)
+            if template is None:
+                template = MessageTemplate(f"{android_priority}/{ios_priority}/{sound}", *key)
+                self._adhoc[key] = template
+            return template
@@ -0,0 +1,853 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cihaz token deposu altyapıları
+JSON (tek dosya) ve indeksli SQLite (WAL) uygulamaları
+"""
+
+import functools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Desteklenen depo türleri
+TOKEN_STORE_BACKENDS = ('json', 'sqlite')
+
+# JSON deposunda art arda gelen değişikliklerin tek yazımda birleştirildiği süre (saniye); 0 her değişiklikte yazar
+DEFAULT_TOKEN_SAVE_DELAY = 1.0
+
+
+def created_to_epoch(created):
+    """Saat dilimsiz ISO zaman damgasını epoch saniyesine çevir
+
+    Saat dilimli veya tanınmayan değerler epoch'a çevrilince aynı biçimde geri yazılamaz; bunlar
+    olduğu gibi bırakılır.
+    """
+    if not isinstance(created, str):
+        return created
+    try:
+        parsed = datetime.fromisoformat(created)
+    except ValueError:
+        return created
+    return int(parsed.timestamp()) if parsed.tzinfo is None else created
+
+
+@functools.lru_cache(maxsize=4096)
+def epoch_to_created(epoch: Optional[int]) -> Optional[str]:
+    """Epoch saniyesini dosyalarda kullanılan ISO biçimine çevir (toplu eklenen token'lar aynı saniyeyi paylaşır)"""
+    return datetime.fromtimestamp(epoch).isoformat() if epoch is not None else None
+
+
+class TokenRecord:
+    """Tek bir cihaz token'ı; dict yerine __slots__ ile tutulur
+
+    Ad çoğunlukla kategori sözlüğündeki anahtarla aynı nesnedir, oluşturulma zamanı epoch
+    saniyesidir. Dosyalara ve API yanıtlarına to_dict() ile eski {'token', 'name', 'created'}
+    biçiminde yazılır. Depoya bağlandıktan sonra yerinde değiştirilmez (ad değişince yeni kayıt
+    oluşturulur); JSON deposu yapının sığ kopyasını kilit dışında yazabilir. Bilinmeyen alanlar
+    (ör. 'platform') extra sözlüğünde saklanır ve aynen geri yazılır.
+    """
+
+    __slots__ = ('token', 'name', 'created', 'extra')
+    FIELDS = frozenset(('token', 'name', 'created'))
+
+    def __init__(self, token: str, name: str, created=None, extra: Optional[Dict] = None):
+        self.token = token
+        self.name = name
+        self.created = created
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict, token_name: str) -> 'TokenRecord':
+        name = data.get('name') or token_name
+        if name == token_name:
+            name = token_name
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+        return cls(data['token'], name, created_to_epoch(data.get('created')), extra)
+
+    def to_dict(self) -> Dict:
+        data = {'token': self.token, 'name': self.name, 'created': self.created_iso}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def renamed(self, name: str) -> 'TokenRecord':
+        """Aynı token için yeni adlı kayıt (kayıt yerinde değiştirilmez)"""
+        return TokenRecord(self.token, name, self.created, self.extra)
+
+    @property
+    def created_iso(self):
+        # Epoch'a çevrilemeyen (saat dilimli, tanınmayan) değerler olduğu gibi tutulur
+        return epoch_to_created(self.created) if type(self.created) is int else self.created
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TokenRecord):
+            return NotImplemented
+        return ((self.token, self.name, self.created, self.extra)
+                == (other.token, other.name, other.created, other.extra))
+
+    def __repr__(self) -> str:
+        return f"TokenRecord(name={self.name!r}, created={self.created!r})"
+
+
+def _decode_record(obj: Dict):
+    """json.load object_hook'u: token kaydını okunurken TokenRecord'a çevir (ara sözlük tutulmaz)"""
+    token = obj.get('token')
+    # 'token' adlı bir cihaz içeren kategori sözlüğünde değer zaten TokenRecord'dur
+    if isinstance(token, str) and obj.keys() <= TokenRecord.FIELDS:
+        return TokenRecord(token, obj.get('name'), created_to_epoch(obj.get('created')))
+    return obj
+
+
+def load_project_tokens(tokens: Dict) -> Dict[str, Dict[str, TokenRecord]]:
+    """Kategori -> ad -> kayıt yapısındaki kayıtları TokenRecord'a çevir; kategori adları intern edilir
+
+    Token değeri olmayan bozuk kayıtlar yüklemeyi durdurmaz; loglanıp atlanır.
+    """
+    invalid = []
+    for category, category_tokens in tokens.items():
+        for token_name, record in category_tokens.items():
+            if not isinstance(record, TokenRecord):
+                if isinstance(record, dict) and isinstance(record.get('token'), str):
+                    category_tokens[token_name] = TokenRecord.from_dict(record, token_name)
+                else:
+                    invalid.append((category, token_name))
+            elif record.name is None or record.name == token_name:
+                # Ad anahtarla aynıysa ayrı bir kopya tutulmaz
+                record.name = token_name
+    for category, token_name in invalid:
+        record = tokens[category].pop(token_name)
+        logger.warning(f"Geçersiz token kaydı atlandı - Kategori: {category}, Ad: {token_name}, "
+                       f"Kayıt: {json.dumps(record, ensure_ascii=False, default=str)}")
+    return {sys.intern(category): category_tokens for category, category_tokens in tokens.items()}
+
+
+def load_token_tree(data: Dict) -> Dict:
+    """Dosyadan okunan proje yapısındaki token kayıtlarını TokenRecord'a çevir (yerinde)"""
+    for project_key in list(data):
+        project_data = data.pop(project_key)
+        if isinstance(project_data, dict) and isinstance(project_data.get('tokens'), dict):
+            project_data['tokens'] = load_project_tokens(project_data['tokens'])
+        data[sys.intern(project_key)] = project_data
+    return data
+
+
+def _encode_record(obj):
+    """json.dumps için: TokenRecord'u eski sözlük biçiminde yaz"""
+    if isinstance(obj, TokenRecord):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} JSON'a çevrilemez")
+
+
+def _snapshot_tree(data: Dict) -> Dict:
+    """Proje ve kategori sözlüklerinin sığ kopyası (kayıtlar paylaşılır)"""
+    snapshot = {}
+    for project_key, project_data in data.items():
+        if isinstance(project_data, dict) and isinstance(project_data.get('tokens'), dict):
+            project_data = dict(project_data)
+            project_data['tokens'] = {category: dict(category_tokens)
+                                      for category, category_tokens in project_data['tokens'].items()}
+        snapshot[project_key] = project_data
+    return snapshot
+
+
+def iter_token_records(project_data: Dict, categories: Optional[List[str]] = None
+                       ) -> Iterator[Tuple[str, str, TokenRecord]]:
+    """Projenin (kategori, ad, kayıt) üçlülerini kopyalamadan ver"""
+    for category, category_tokens in project_data.get('tokens', {}).items():
+        if categories and category not in categories:
+            continue
+        for token_name, record in category_tokens.items():
+            yield category, token_name, record
+
+
+class TokenStore:
+    """Token deposu arayüzü
+
+    FCMSender bellekteki iç içe `device_tokens` yapısını kullanır; depo bu yapıyı
+    yükler ve her değişikliği kalıcı hale getirir. Varsayılan uygulamalar
+    bağlı (attach) yapının tamamını yeniden yazar. supports_queries olan depolarda
+    seçim, sayım ve arama yapı yüklenmeden depoda çalışır.
+    """
+
+    supports_queries = False
+
+    def __init__(self):
+        self._data: Dict = {}
+
+    def attach(self, data: Dict):
+        """Bellekteki token yapısını depoya bağla"""
+        self._data = data
+
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def load(self) -> Dict:
+        raise NotImplementedError
+
+    def save_all(self, data: Dict):
+        raise NotImplementedError
+
+    def add_project(self, project_key: str, project_data: Dict):
+        self.save_all(self._data)
+
+    def remove_project(self, project_key: str):
+        self.save_all(self._data)
+
+    def add_token(self, project_key: str, category: str, token_name: str, record: 'TokenRecord'):
+        self.save_all(self._data)
+
+    def remove_token(self, project_key: str, category: str, token_name: str):
+        self.save_all(self._data)
+
+    def rename_token(self, project_key: str, category: str, old_name: str, new_name: str, display_name: str):
+        self.save_all(self._data)
+
+    def remove_tokens(self, items: List[Tuple[str, str, str]]):
+        """Birden çok (proje, kategori, ad) kaydını tek seferde sil"""
+        self.save_all(self._data)
+
+    def find_token(self, token: str) -> Optional[Tuple[str, str, str]]:
+        """Token değerinin (proje, kategori, ad) konumunu bul"""
+        for project_key, project_data in self._data.items():
+            for category, token_name, record in iter_token_records(project_data):
+                if record.token == token:
+                    return project_key, category, token_name
+        return None
+
+    def locate_token(self, project_key: str, token: str) -> Optional[Tuple[str, str]]:
+        """Token değerinin proje içindeki (kategori, ad) konumunu bul"""
+        for category, token_name, record in iter_token_records(self._data.get(project_key, {})):
+            if record.token == token:
+                return category, token_name
+        return None
+
+    def get_token(self, project_key: str, category: str, token_name: str) -> Optional['TokenRecord']:
+        return self._data.get(project_key, {}).get('tokens', {}).get(category, {}).get(token_name)
+
+    def iter_tokens(self, project_key: str, categories: Optional[List[str]] = None) -> Iterator[str]:
+        """Projenin (isteğe bağlı kategorilerin) token değerlerini sırayla ver"""
+        for _, _, record in iter_token_records(self._data.get(project_key, {}), categories):
+            if record.token.strip():
+                yield record.token
+
+    def project_keys(self) -> List[str]:
+        """Token yapısı olan projeler (ekleme sırasıyla)"""
+        return list(self._data)
+
+    def project_token_counts(self) -> Dict[str, int]:
+        """Proje -> kayıtlı token sayısı"""
+        return {project_key: sum(len(category_tokens) for category_tokens in project_data.get('tokens', {}).values())
+                for project_key, project_data in self._data.items()}
+
+    def backup_unreadable(self) -> List[Path]:
+        """Okunamayan depo dosyalarını kenara al (üzerine boş yapı yazılmasın); taşınan dosyaları döndür"""
+        return []
+
+    def flush(self):
+        """Bekleyen değişiklikleri hemen yaz"""
+
+    def close(self):
+        pass
+
+
+class TokenIndex:
+    """Bellekteki token yapısı için ters indeks
+
+    Proje başına token değeri -> (kategori, ad) eşlemesi tutar. Proje içi
+    tekrar kontrolü ve başarısız token'ın hangi cihaza ait olduğunu bulma
+    sabit zamanlıdır.
+    """
+
+    def __init__(self):
+        self._projects: Dict[str, Dict[str, Tuple[str, str]]] = {}
+
+    def rebuild(self, device_tokens: Dict):
+        """İndeksi token yapısından sıfırdan oluştur"""
+        self._projects = {}
+        for project_key, project_data in device_tokens.items():
+            project_index = self._projects.setdefault(project_key, {})
+            for category, token_name, record in iter_token_records(project_data):
+                project_index[record.token] = (category, token_name)
+
+    def add(self, project_key: str, category: str, token_name: str, token: str):
+        self._projects.setdefault(project_key, {})[token] = (category, token_name)
+
+    def remove(self, project_key: str, token: str):
+        self._projects.get(project_key, {}).pop(token, None)
+
+    def rename(self, project_key: str, token: str, new_name: str):
+        project_index = self._projects.get(project_key, {})
+        if token in project_index:
+            project_index[token] = (project_index[token][0], new_name)
+
+    def remove_project(self, project_key: str):
+        self._projects.pop(project_key, None)
+
+    def contains(self, project_key: str, token: str) -> bool:
+        return token in self._projects.get(project_key, ())
+
+    def locate(self, project_key: str, token: str) -> Optional[Tuple[str, str]]:
+        """Token'ın proje içindeki (kategori, ad) konumu"""
+        return self._projects.get(project_key, {}).get(token)
+
+    def lookup(self, token: str) -> Optional[Tuple[str, str, str]]:
+        """Token'ın ilk bulunduğu (proje, kategori, ad) konumu"""
+        for project_key, project_index in self._projects.items():
+            location = project_index.get(token)
+            if location:
+                return (project_key,) + location
+        return None
+
+    def project_size(self, project_key: str) -> int:
+        return len(self._projects.get(project_key, ()))
+
+    def __len__(self) -> int:
+        return sum(len(project_index) for project_index in self._projects.values())
+
+
+def _fsync_directory(directory: Path):
+    """Rename işleminin kalıcı olması için dizini diske yaz (desteklenmeyen sistemlerde atlanır)"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path: Path, text: str):
+    """Metni geçici dosya + fsync + rename ile yaz; çökmede eski veya yeni içerik kalır, yarım dosya kalmaz"""
+    path = Path(path)
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(path.parent)
+
+
+def _ends_with_partial_line(path: Path) -> bool:
+    """Dosya yeni satırla bitmeyen (çökme anında yarım kalmış) bir satırla mı bitiyor"""
+    try:
+        with open(path, 'rb') as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+    except FileNotFoundError:
+        return False
+
+
+class JsonTokenStore(TokenStore):
+    """Tüm yapıyı tek bir JSON dosyasında tutan depo
+
+    Değişiklikler kirli olarak işaretlenir ve save_delay içinde tek bir atomik yazımda (geçici
+    dosya + fsync + rename) birleştirilir. Günlük açıksa her değişiklik ayrıca .journal dosyasına
+    eklenip fsync edilir; tam yazımlar arasında çökme olursa açılışta yeniden uygulanır.
+    """
+
+    def __init__(self, path: Path, save_delay: float = DEFAULT_TOKEN_SAVE_DELAY, journal: bool = False,
+                 data_lock=None, logger: Optional[logging.Logger] = None):
+        super().__init__()
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        # Yazım sırasında kenara alınan günlük; yazım tamamlanınca silinir
+        self.rotated_journal_path = self.path.with_name(self.path.name + '.journal.old')
+        self.save_delay = max(0.0, save_delay)
+        self.journal = journal
+        # Bağlı yapıyı değiştirenlerin tuttuğu kilit; arka plan yazımı yapıyı bu kilit altında okur
+        self._data_lock = data_lock or threading.RLock()
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+        self._journal_file = None
+        # Yapının kaçıncı kopyasının alındığı / diske yazıldığı; eski kopya yenisinin üzerine yazılmaz
+        self._generation = 0
+        self._written_generation = 0
+        self.snapshot_writes = 0
+
+    def exists(self) -> bool:
+        return self.path.exists() or self.journal_path.exists() or self.rotated_journal_path.exists()
+
+    def load(self) -> Dict:
+        data = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f, object_hook=_decode_record)
+        # Eski (kategori listeli) yapı FCMSender tarafından dönüştürülür
+        if isinstance(data, dict) and 'iPhone' not in data:
+            load_token_tree(data)
+        replayed = 0
+        for journal_path in (self.rotated_journal_path, self.journal_path):
+            replayed += self._replay_journal(journal_path, data)
+        if replayed:
+            # Günlük, yapı bağlandıktan sonraki ilk tam yazımda sıkıştırılır (bkz. attach)
+            self._dirty = True
+            self.logger.info(f"Token günlüğünden {replayed} değişiklik uygulandı: {self.journal_path}")
+        return data
+
+    def _replay_journal(self, journal_path: Path, data: Dict) -> int:
+        if not journal_path.exists():
+            return 0
+        count = 0
+        skipped = 0
+        with open(journal_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self._apply_change(data, entry['op'], entry['args'])
+                except (ValueError, KeyError, TypeError, IndexError):
+                    # Çökme anında yarım kalan satır; sonraki kayıtlar yine uygulanır
+                    skipped += 1
+                    continue
+                count += 1
+        if skipped:
+            self.logger.warning(f"Token günlüğünde okunamayan {skipped} satır atlandı: {journal_path}")
+        return count
+
+    @staticmethod
+    def _apply_change(data: Dict, operation: str, args: list):
+        """Günlük kaydını yapıya uygula; kayıtlar 'yaz/sil' biçimindedir, tekrar uygulanması zararsızdır"""
+        if operation == 'add_project':
+            data[args[0]] = load_token_tree({args[0]: args[1]})[args[0]]
+            return
+        if operation == 'remove_project':
+            data.pop(args[0], None)
+            return
+        if operation == 'remove_tokens':
+            for project_key, category, token_name in args[0]:
+                data.get(project_key, {}).get('tokens', {}).get(category, {}).pop(token_name, None)
+            return
+
+        project_tokens = data.get(args[0], {}).get('tokens')
+        if project_tokens is None:
+            return
+        if operation == 'add_token':
+            project_tokens.setdefault(sys.intern(args[1]), {})[args[2]] = TokenRecord.from_dict(args[3], args[2])
+        elif operation == 'remove_token':
+            project_tokens.get(args[1], {}).pop(args[2], None)
+        elif operation == 'rename_token':
+            category_tokens = project_tokens.setdefault(args[1], {})
+            category_tokens.pop(args[2], None)
+            category_tokens[args[3]] = TokenRecord.from_dict(args[4], args[3])
+
+    def attach(self, data: Dict):
+        super().attach(data)
+        # Açılışta günlükten uygulanan değişiklikler varsa tam yazım kurulur
+        with self._lock:
+            if self._dirty and self.save_delay:
+                self._schedule_flush()
+        if self._dirty and not self.save_delay:
+            self.flush()
+
+    def save_all(self, data: Dict):
+        """Tüm yapıyı hemen yaz"""
+        with self._lock:
+            self._data = data
+            self._dirty = True
+        self.flush()
+
+    def add_project(self, project_key: str, project_data: Dict):
+        self._changed('add_project', project_key, project_data)
+
+    def remove_project(self, project_key: str):
+        self._changed('remove_project', project_key)
+
+    def add_token(self, project_key: str, category: str, token_name: str, record: TokenRecord):
+        self._changed('add_token', project_key, category, token_name, record)
+
+    def remove_token(self, project_key: str, category: str, token_name: str):
+        self._changed('remove_token', project_key, category, token_name)
+
+    def rename_token(self, project_key: str, category: str, old_name: str, new_name: str, display_name: str):
+        # Günlüğe kaydın son hali yazılır; böylece kayıt tekrar uygulansa da sonuç değişmez
+        record = self._data[project_key]['tokens'][category][new_name]
+        self._changed('rename_token', project_key, category, old_name, new_name, record)
+
+    def remove_tokens(self, items: List[Tuple[str, str, str]]):
+        self._changed('remove_tokens', [list(item) for item in items])
+
+    def _changed(self, operation: str, *args):
+        """Değişikliği günlüğe ekle (açıksa) ve gecikmeli tam yazımı kur"""
+        with self._lock:
+            if self.journal:
+                self._append_journal(operation, args)
+            self._dirty = True
+            if self.save_delay:
+                self._schedule_flush()
+        if not self.save_delay:
+            self.flush()
+
+    def _schedule_flush(self):
+        # Çağıran _lock'u tutar
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _append_journal(self, operation: str, args: tuple):
+        # Çağıran _lock'u tutar
+        if self._journal_file is None:
+            partial = _ends_with_partial_line(self.journal_path)
+            self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+            if partial:
+                # Önceki süreç satır ortasında çöktüyse yeni kayıt ayrı satırdan başlar
+                self._journal_file.write('\n')
+        self._journal_file.write(json.dumps({'op': operation, 'args': args}, ensure_ascii=False,
+                                            default=_encode_record) + '\n')
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+
+    def _rotate_journal(self):
+        """Günlüğü kenara al; yazım sürerken gelen değişiklikler yeni günlüğe eklenir (çağıran _lock'u tutar)"""
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        if not self.journal_path.exists():
+            return
+        if self.rotated_journal_path.exists():
+            # Önceki yazım tamamlanmadıysa eski kayıtlar korunur
+            partial = _ends_with_partial_line(self.rotated_journal_path)
+            with open(self.journal_path, 'rb') as src, open(self.rotated_journal_path, 'ab') as dst:
+                if partial:
+                    dst.write(b'\n')
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.rotated_journal_path)
+
+    def flush(self):
+        """Bekleyen değişiklikleri tek atomik yazımla diske aktar"""
+        # Yapının sığ kopyası kilit altında alınır; JSON'a çevirme ve yazım sırasında değişiklikler beklemez
+        with self._data_lock, self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            snapshot = _snapshot_tree(self._data)
+            self._dirty = False
+            self._rotate_journal()
+            self._generation += 1
+            generation = self._generation
+
+        try:
+            payload = json.dumps(snapshot, indent=2, ensure_ascii=False, default=_encode_record)
+        except BaseException:
+            with self._lock:
+                self._dirty = True
+            raise
+        del snapshot
+
+        with self._write_lock:
+            if generation <= self._written_generation:
+                return
+            try:
+                atomic_write_text(self.path, payload)
+            except BaseException:
+                with self._lock:
+                    self._dirty = True
+                raise
+            self._written_generation = generation
+            self.snapshot_writes += 1
+            with self._lock:
+                # Bu arada yeni bir kopya alındıysa kenardaki günlük onun yazımına kadar kalır
+                if generation == self._generation and self.rotated_journal_path.exists():
+                    os.remove(self.rotated_journal_path)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            self.logger.error(f"Token dosyası kaydedilemedi: {e}")
+
+    def backup_unreadable(self) -> List[Path]:
+        suffix = f".corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        moved = []
+        for path in (self.path, self.rotated_journal_path, self.journal_path):
+            if path.exists():
+                backup = path.with_name(path.name + suffix)
+                os.replace(path, backup)
+                moved.append(backup)
+        return moved
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+
+
+class SQLiteTokenStore(TokenStore):
+    """İndeksli SQLite deposu; tekil işlemler O(log n), seçimler sorgu olarak çalışır"""
+
+    supports_queries = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS projects (
+            project_key TEXT PRIMARY KEY,
+            project_id TEXT,
+            display_name TEXT,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS categories (
+            project_key TEXT NOT NULL,
+            category TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (project_key, category)
+        );
+        -- UNIQUE kısıtının indeksi (project_key, category) önekli sorguları da karşılar
+        -- extra: kaydın bilinmeyen alanları (JSON nesnesi, yoksa NULL)
+        CREATE TABLE IF NOT EXISTS tokens (
+            id INTEGER PRIMARY KEY,
+            project_key TEXT NOT NULL,
+            category TEXT NOT NULL,
+            token_name TEXT NOT NULL,
+            name TEXT,
+            token TEXT NOT NULL,
+            created TEXT,
+            extra TEXT,
+            UNIQUE (project_key, category, token_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tokens_token ON tokens (token);
+        CREATE INDEX IF NOT EXISTS idx_tokens_created ON tokens (created);
+    """
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Eski şemayla oluşturulmuş depolara eksik sütunları ekle"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tokens)")}
+        if 'extra' not in columns:
+            self._conn.execute("ALTER TABLE tokens ADD COLUMN extra TEXT")
+
+    @staticmethod
+    def _encode_extra(record: TokenRecord) -> Optional[str]:
+        return json.dumps(record.extra, ensure_ascii=False) if record.extra else None
+
+    def exists(self) -> bool:
+        return self.get_meta('initialized') == '1'
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load(self) -> Dict:
+        """Depoyu FCMSender'ın kullandığı iç içe yapıya dönüştür"""
+        data = {}
+        with self._lock:
+            for project_key, project_id, display_name in self._conn.execute(
+                    "SELECT project_key, project_id, display_name FROM projects ORDER BY position"):
+                data[sys.intern(project_key)] = {'project_id': project_id, 'display_name': display_name, 'tokens': {}}
+
+            for project_key, category in self._conn.execute(
+                    "SELECT project_key, category FROM categories ORDER BY project_key, position"):
+                if project_key in data:
+                    data[project_key]['tokens'][sys.intern(category)] = {}
+
+            for project_key, category, token_name, name, token, created, extra in self._conn.execute(
+                    "SELECT project_key, category, token_name, name, token, created, extra FROM tokens ORDER BY id"):
+                project_tokens = data.get(project_key, {}).get('tokens')
+                if project_tokens is None:
+                    continue
+                if name == token_name:
+                    name = token_name
+                project_tokens.setdefault(sys.intern(category), {})[token_name] = TokenRecord(
+                    token, name, created_to_epoch(created), json.loads(extra) if extra else None)
+        return data
+
+    def save_all(self, data: Dict):
+        """Tüm yapıyı tek transaction içinde yeniden yaz (geçiş ve dönüştürme için)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tokens")
+            self._conn.execute("DELETE FROM categories")
+            self._conn.execute("DELETE FROM projects")
+            for position, (project_key, project_data) in enumerate(data.items()):
+                self._insert_project(project_key, project_data, position)
+                for category, category_tokens in project_data.get('tokens', {}).items():
+                    self._conn.executemany(
+                        "INSERT INTO tokens (project_key, category, token_name, name, token, created, extra) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(project_key, category, token_name, record.name, record.token, record.created_iso,
+                          self._encode_extra(record))
+                         for token_name, record in category_tokens.items()]
+                    )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', '1')")
+
+    def _insert_project(self, project_key: str, project_data: Dict, position: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO projects (project_key, project_id, display_name, position) VALUES (?, ?, ?, ?)",
+            (project_key, project_data.get('project_id'), project_data.get('display_name'), position)
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO categories (project_key, category, position) VALUES (?, ?, ?)",
+            [(project_key, category, i) for i, category in enumerate(project_data.get('tokens', {}))]
+        )
+
+    def add_project(self, project_key: str, project_data: Dict):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM projects").fetchone()
+            self._insert_project(project_key, project_data, row[0])
+
+    def remove_project(self, project_key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tokens WHERE project_key = ?", (project_key,))
+            self._conn.execute("DELETE FROM categories WHERE project_key = ?", (project_key,))
+            self._conn.execute("DELETE FROM projects WHERE project_key = ?", (project_key,))
+
+    def add_token(self, project_key: str, category: str, token_name: str, record: TokenRecord):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM categories WHERE project_key = ?", (project_key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR IGNORE INTO categories (project_key, category, position) VALUES (?, ?, ?)",
+                (project_key, category, row[0])
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tokens (project_key, category, token_name, name, token, created, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_key, category, token_name, record.name, record.token, record.created_iso,
+                 self._encode_extra(record))
+            )
+
+    def remove_token(self, project_key: str, category: str, token_name: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM tokens WHERE project_key = ? AND category = ? AND token_name = ?",
+                (project_key, category, token_name)
+            )
+
+    def remove_tokens(self, items: List[Tuple[str, str, str]]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM tokens WHERE project_key = ? AND category = ? AND token_name = ?", items
+            )
+
+    def rename_token(self, project_key: str, category: str, old_name: str, new_name: str, display_name: str):
+        with self._lock, self._conn:
+            # Yeni ad aynı kategoride varsa bellekteki davranışla aynı şekilde üzerine yazılır
+            if old_name != new_name:
+                self._conn.execute(
+                    "DELETE FROM tokens WHERE project_key = ? AND category = ? AND token_name = ?",
+                    (project_key, category, new_name)
+                )
+            self._conn.execute(
+                "UPDATE tokens SET token_name = ?, name = ? WHERE project_key = ? AND category = ? AND token_name = ?",
+                (new_name, display_name, project_key, category, old_name)
+            )
+
+    def find_token(self, token: str) -> Optional[Tuple[str, str, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT project_key, category, token_name FROM tokens WHERE token = ? LIMIT 1", (token,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def locate_token(self, project_key: str, token: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT category, token_name FROM tokens WHERE token = ? AND project_key = ? ORDER BY id LIMIT 1",
+                (token, project_key)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def get_token(self, project_key: str, category: str, token_name: str) -> Optional[TokenRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, token, created, extra FROM tokens WHERE project_key = ? AND category = ? AND token_name = ?",
+                (project_key, category, token_name)
+            ).fetchone()
+        if row is None:
+            return None
+        name, token, created, extra = row
+        return TokenRecord(token, name or token_name, created_to_epoch(created), json.loads(extra) if extra else None)
+
+    def project_keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT project_key FROM projects ORDER BY position")]
+
+    def project_token_counts(self) -> Dict[str, int]:
+        # Sayım (project_key, category, token_name) indeksinden yapılır, kayıtlar okunmaz
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.project_key, (SELECT COUNT(*) FROM tokens t WHERE t.project_key = p.project_key) "
+                "FROM projects p ORDER BY p.position").fetchall()
+        return dict(rows)
+
+    def iter_tokens(self, project_key: str, categories: Optional[List[str]] = None) -> Iterator[str]:
+        """Seçimi SQL sorgusu olarak çalıştır ve sonuçları parça parça oku"""
+        query = "SELECT token FROM tokens WHERE project_key = ? AND token != ''"
+        params: list = [project_key]
+        if categories:
+            query += f" AND category IN ({', '.join('?' * len(categories))})"
+            params.extend(categories)
+        query += " ORDER BY id"
+
+        # Ayrı cursor: uzun akış sırasında diğer işlemler kilitlenmesin diye kilit sadece fetch sırasında tutulur
+        cursor = self._conn.cursor()
+        with self._lock:
+            cursor.execute(query, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for (token,) in rows:
+                yield token
+        cursor.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_token_store(backend: str, json_path: Path, sqlite_path: Path,
+                       save_delay: float = DEFAULT_TOKEN_SAVE_DELAY, journal: bool = False,
+                       data_lock=None) -> TokenStore:
+    """Seçilen türde token deposu oluştur (gecikmeli yazım ve günlük sadece JSON deposu içindir)"""
+    if backend == 'sqlite':
+        return SQLiteTokenStore(sqlite_path)
+    if backend == 'json':
+        return JsonTokenStore(json_path, save_delay, journal, data_lock)
+    raise ValueError(f"Geçersiz token deposu: {backend} ({', '.join(TOKEN_STORE_BACKENDS)})")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fcm_idempotency testleri
+"""
+
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fcm_idempotency import DeliveryLedger  # noqa: E402
+
+
+class ReservationTest(unittest.TestCase):
+    """Aynı anahtarla eşzamanlı gönderimlerde token'lar bir kez ayrılır"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / 'delivery_ledger.db'
+        self.ledger = DeliveryLedger(self.path)
+
+    def tearDown(self):
+        self.ledger.close()
+        self._tmp.cleanup()
+
+    def test_second_reservation_sees_tokens_in_flight(self):
+        other = DeliveryLedger(self.path)
+        try:
+            self.assertEqual(self.ledger.reserve('k', ['a', 'b']), (['a', 'b'], []))
+            self.assertEqual(other.reserve('k', ['a', 'b', 'c']), (['c'], ['a', 'b']))
+        finally:
+            other.close()
+
+    def test_record_and_release(self):
+        self.ledger.reserve('k', ['a', 'b'])
+        self.ledger.record('k', ['a'])
+        self.ledger.release('k', ['b'])
+        # Teslim edilen atlanır, bırakılan yeniden ayrılabilir
+        self.assertEqual(self.ledger.reserve('k', ['a', 'b']), (['b'], []))
+
+    def test_token_delivered_after_pending_check_is_not_reserved(self):
+        other = DeliveryLedger(self.path)
+        self.ledger.reserve('k', ['a'])
+
+        def pending_then_delivered(idempotency_key, tokens):
+            # Ön eleme 'a'yı teslim edilmemiş görür, ardından ilk gönderim onu teslim eder
+            result = DeliveryLedger.pending(other, idempotency_key, tokens)
+            self.ledger.record(idempotency_key, ['a'])
+            return result
+
+        other.pending = pending_then_delivered
+        try:
+            self.assertEqual(other.reserve('k', ['a', 'b']), (['b'], []))
+        finally:
+            other.close()
+
+    def test_reservation_of_dead_process_is_taken_over(self):
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        crashed = DeliveryLedger(self.path)
+        crashed.holder = crashed.holder.rsplit(':', 1)[0] + f":{dead.pid}"
+        crashed.reserve('k', ['a'])
+        crashed._conn.close()
+        self.assertEqual(self.ledger.reserve('k', ['a']), (['a'], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
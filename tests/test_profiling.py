@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fcm_profiling testleri
+"""
+
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fcm_profiling import SendProfiler, SendTimer, active_timer  # noqa: E402
+
+
+def timed_send(label: str, stage: str, barrier: threading.Barrier) -> SendTimer:
+    """FCMSender._send_timing/_span akışını taklit et: aşamayı etkin zamanlayıcıya yaz"""
+    timer = SendTimer(label)
+    timer.start()
+    try:
+        barrier.wait()
+        with active_timer().span(stage):
+            barrier.wait()
+    finally:
+        timer.stop()
+    return timer
+
+
+class TimerIsolationTest(unittest.TestCase):
+    """Eşzamanlı gönderimler birbirinin süre dağılımına yazmaz"""
+
+    def test_concurrent_sends_keep_separate_breakdowns(self):
+        barrier = threading.Barrier(2)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(timed_send, 'token', 'network', barrier)
+            second = executor.submit(timed_send, 'topic', 'build', barrier)
+            first, second = first.result(), second.result()
+
+        self.assertEqual([stage for stage, _, _ in first.breakdown()], ['network'])
+        self.assertEqual([stage for stage, _, _ in second.breakdown()], ['build'])
+        self.assertIsNone(active_timer())
+
+    def test_bound_worker_writes_to_its_send(self):
+        timer = SendTimer('campaign')
+        timer.start()
+        try:
+            def send_chunk(_):
+                with active_timer().span('network'):
+                    pass
+                return active_timer()
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                seen = list(executor.map(timer.bind(send_chunk), range(4)))
+                # Bağlanmayan iş başka bir gönderimin zamanlayıcısını görmez
+                unbound = executor.submit(active_timer).result()
+        finally:
+            timer.stop()
+
+        self.assertEqual(seen, [timer] * 4)
+        self.assertIsNone(unbound)
+        self.assertEqual(timer.breakdown()[0][:1], ('network',))
+        self.assertEqual(timer.breakdown()[0][2], 4)
+
+
+class ProfilerThreadTest(unittest.TestCase):
+    """Profil sadece gönderimi çağıran thread'i ve bağlanan worker'ları ölçer"""
+
+    def test_unrelated_threads_are_not_profiled(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            timer = SendTimer('token', SendProfiler(Path(tmp), 'token'))
+            timer.start()
+            try:
+                unrelated = threading.Thread(target=sum, args=(range(100),))
+                unrelated.start()
+                unrelated.join()
+                self.assertEqual(timer.profiler._thread_profiles, [])
+
+                worker = threading.Thread(target=timer.bind(sum), args=(range(100),))
+                worker.start()
+                worker.join()
+                self.assertEqual(len(timer.profiler._thread_profiles), 1)
+            finally:
+                path = timer.stop()
+            self.assertTrue(path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
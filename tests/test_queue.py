@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fcm_queue testleri
+"""
+
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fcm_queue import OutboundQueue, lease_owner  # noqa: E402
+
+SPEC = {'project': 'p1', 'title': 'Başlık', 'body': 'Metin', 'data': {}}
+
+
+class InterleavedConnection:
+    """Kiralama UPDATE'inden hemen önce başka bir bağlantının işini araya sokan SQLite bağlantısı"""
+
+    def __init__(self, conn, before_update):
+        self._conn = conn
+        self._before_update = before_update
+
+    def execute(self, sql, *args):
+        if sql.startswith('UPDATE jobs') and self._before_update:
+            before_update, self._before_update = self._before_update, None
+            before_update()
+        return self._conn.execute(sql, *args)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+class QueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / 'outbound_queue.db'
+        self.queue = OutboundQueue(self.path)
+
+    def tearDown(self):
+        self.queue.close()
+        self._tmp.cleanup()
+
+    def job_row(self, job_id: int):
+        return self.queue._conn.execute(
+            "SELECT state, lease_owner, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+class LeaseTest(QueueTestCase):
+    """Parçalar sırayla ve tek worker'a kiralanır"""
+
+    def test_jobs_are_leased_in_order_once(self):
+        campaign_id = self.queue.enqueue(SPEC, [f"t{i}" for i in range(5)], job_size=2)
+        jobs = [self.queue.lease('a:1') for _ in range(3)]
+
+        self.assertEqual([job.seq for job in jobs], [0, 1, 2])
+        self.assertEqual([job.tokens for job in jobs], [['t0', 't1'], ['t2', 't3'], ['t4']])
+        self.assertEqual({job.campaign_id for job in jobs}, {campaign_id})
+        self.assertIsNone(self.queue.lease('a:1'))
+
+    def test_expired_lease_is_taken_over(self):
+        self.queue.enqueue(SPEC, ['t0'])
+        first = self.queue.lease('a:1', lease_seconds=-1)
+
+        second = self.queue.lease('b:2')
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.attempts, 2)
+        self.assertEqual(self.job_row(first.id), ('leased', 'b:2', 2))
+
+    def test_expired_job_is_leased_once_by_racing_connections(self):
+        self.queue.enqueue(SPEC, ['t0'])
+        self.queue.lease('a:1', lease_seconds=-1)
+        other = OutboundQueue(self.path)
+        racer = OutboundQueue(self.path)
+        taken = []
+        # racer süresi dolmuş parçayı seçtikten sonra, UPDATE'inden önce other aynı parçayı kiralar
+        racer._conn = InterleavedConnection(racer._conn, lambda: taken.append(other.lease('b:2')))
+        try:
+            racer_job = racer.lease('c:3')
+        finally:
+            other.close()
+            racer.close()
+
+        self.assertIsNotNone(taken[0])
+        self.assertIsNone(racer_job)
+        self.assertEqual(self.job_row(taken[0].id), ('leased', 'b:2', 2))
+
+    def test_fail_requeues_until_attempts_run_out(self):
+        self.queue.enqueue(SPEC, ['t0'])
+        job = self.queue.lease('a:1')
+        self.assertEqual(self.queue.fail(job.id, 'hata', max_attempts=2), 'pending')
+        job = self.queue.lease('a:1')
+        self.assertEqual(self.queue.fail(job.id, 'hata', max_attempts=2), 'failed')
+        self.assertIsNone(self.queue.lease('a:1'))
+        self.assertFalse(self.queue.has_work())
+
+    def test_ack_completes_job(self):
+        self.queue.enqueue(SPEC, ['t0', 't1'])
+        job = self.queue.lease('a:1')
+        self.queue.ack(job.id, 1, 1)
+        self.assertEqual(self.queue.status(), {'done': {'jobs': 1, 'tokens': 2, 'success': 1, 'failure': 1}})
+
+
+class RequeueStaleLeasesTest(QueueTestCase):
+    """Yeniden başlatmada sadece sahibi çalışmayan veya süresi dolan kiralar geri alınır"""
+
+    def lease_as(self, owner: str, lease_seconds: float = 300.0) -> int:
+        self.queue.enqueue(SPEC, ['t0'])
+        return self.queue.lease(owner, lease_seconds).id
+
+    def test_own_previous_run_is_requeued(self):
+        job_id = self.lease_as(lease_owner())
+        self.assertEqual(self.queue.requeue_stale_leases(), 1)
+        self.assertEqual(self.job_row(job_id), ('pending', None, 1))
+
+    def test_expired_lease_is_requeued(self):
+        job_id = self.lease_as('baska-makine:1', lease_seconds=-1)
+        self.assertEqual(self.queue.requeue_stale_leases(), 1)
+        self.assertEqual(self.job_row(job_id)[0], 'pending')
+
+    def test_remote_owner_is_kept_until_expiry(self):
+        job_id = self.lease_as('baska-makine:1')
+        self.assertEqual(self.queue.requeue_stale_leases(), 0)
+        self.assertEqual(self.job_row(job_id), ('leased', 'baska-makine:1', 1))
+
+    @unittest.skipIf(sys.platform == 'win32', "Windows'ta sahip süreç yoklanmaz")
+    def test_live_local_owner_is_kept_and_dead_one_requeued(self):
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        try:
+            owner = f"{socket.gethostname()}:{process.pid}"
+            job_id = self.lease_as(owner)
+            self.assertEqual(self.queue.requeue_stale_leases(), 0)
+            self.assertEqual(self.job_row(job_id)[:2], ('leased', owner))
+        finally:
+            process.kill()
+            process.wait()
+
+        # Süreç artık yok; kirası süresini beklemeden geri alınır
+        deadline = time.time() + 5
+        while self.queue.requeue_stale_leases() == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.job_row(job_id)[0], 'pending')
+
+
+if __name__ == '__main__':
+    unittest.main()
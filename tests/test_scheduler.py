@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fcm_scheduler testleri
+"""
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fcm_scheduler import ScheduleStore, Scheduler  # noqa: E402
+
+SPEC = {'project': 'p1', 'title': 'Başlık', 'body': 'Metin', 'data': {}}
+OTHER_SPEC = dict(SPEC, title='Başka')
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / 'scheduled_sends.db'
+        self.store = ScheduleStore(self.path)
+        self.dispatched = []
+        self.dispatch_event = threading.Event()
+
+    def tearDown(self):
+        self.store.close()
+        self._tmp.cleanup()
+
+    def dispatch(self, spec, schedules, idempotency_key):
+        self.dispatched.append((spec, sorted(schedule.id for schedule in schedules), idempotency_key))
+        self.dispatch_event.set()
+        return "Çıkış kodu 0"
+
+    def scheduler(self, **kwargs) -> Scheduler:
+        return Scheduler(self.store, self.dispatch, **kwargs)
+
+    @staticmethod
+    def fire_due(scheduler: Scheduler):
+        """Zamanlayıcı thread'inin bir turu: depodan yükle, vakti geleni al ve ateşle"""
+        with scheduler._cond:
+            scheduler._reload()
+            due = scheduler._take_due()
+        scheduler._fire(due)
+
+
+class CoalesceTest(SchedulerTestCase):
+    """Aynı bildirimli, pencere içinde vakti gelen işler tek gönderimde birleşir"""
+
+    def test_same_notification_is_dispatched_once(self):
+        now = time.time()
+        first = self.store.add(SPEC, {'tokens': ['a']}, now - 1)
+        second = self.store.add(SPEC, {'tokens': ['b']}, now + 0.5)
+        other = self.store.add(OTHER_SPEC, {'tokens': ['c']}, now - 1)
+
+        self.fire_due(self.scheduler(coalesce_window=1.0))
+
+        batches = {tuple(ids): key for _, ids, key in self.dispatched}
+        self.assertEqual(set(batches), {tuple(sorted([first, second])), (other,)})
+        self.assertEqual(len(set(batches.values())), 2)
+        self.assertEqual(self.store.get(first).state, 'done')
+        self.assertEqual(self.store.get(second).state, 'done')
+
+    def test_jobs_outside_window_wait(self):
+        now = time.time()
+        due = self.store.add(SPEC, {'tokens': ['a']}, now - 1)
+        later = self.store.add(SPEC, {'tokens': ['b']}, now + 60)
+        scheduler = self.scheduler(coalesce_window=1.0)
+
+        self.fire_due(scheduler)
+
+        self.assertEqual([ids for _, ids, _ in self.dispatched], [[due]])
+        self.assertEqual(self.store.get(later).state, 'active')
+        self.assertEqual(scheduler.next_due(), self.store.get(later).due_at)
+
+    def test_refire_of_same_occurrence_uses_same_key(self):
+        due_at = time.time() - 1
+        self.store.add(SPEC, {'tokens': ['a']}, due_at)
+        self.store.add(SPEC, {'tokens': ['b']}, due_at)
+        scheduler = self.scheduler()
+        with scheduler._cond:
+            scheduler._reload()
+            due = scheduler._take_due()
+        # Çökme sonrası aynı tur: complete() yazılmadan tekrar ateşlenir
+        self.store.complete = lambda *args, **kwargs: False
+        scheduler._fire(list(due))
+        scheduler._fire(list(due))
+
+        self.assertEqual(len(self.dispatched), 2)
+        self.assertEqual(self.dispatched[0][2], self.dispatched[1][2])
+
+
+class RescheduleTest(SchedulerTestCase):
+    """Tekrarlı, iptal edilen ve başarısız işler"""
+
+    def test_recurring_job_skips_missed_runs(self):
+        now = time.time()
+        schedule_id = self.store.add(SPEC, {'tokens': ['a']}, now - 250, interval=100)
+        scheduler = self.scheduler()
+
+        self.fire_due(scheduler)
+
+        schedule = self.store.get(schedule_id)
+        self.assertEqual(len(self.dispatched), 1)
+        self.assertEqual((schedule.state, schedule.runs), ('active', 1))
+        self.assertAlmostEqual(schedule.due_at, now + 50, delta=1)
+        self.assertEqual(scheduler.next_due(), schedule.due_at)
+
+    def test_cancelled_job_is_not_dispatched(self):
+        schedule_id = self.store.add(SPEC, {'tokens': ['a']}, time.time() - 1)
+        scheduler = self.scheduler()
+        with scheduler._cond:
+            scheduler._reload()
+            due = scheduler._take_due()
+        scheduler.cancel(schedule_id)
+        scheduler._fire(due)
+
+        self.assertEqual(self.dispatched, [])
+        self.assertEqual(self.store.get(schedule_id).state, 'cancelled')
+
+    def test_failed_dispatch_closes_one_shot_job(self):
+        schedule_id = self.store.add(SPEC, {'tokens': ['a']}, time.time() - 1)
+
+        def failing_dispatch(spec, schedules, idempotency_key):
+            raise RuntimeError("Kampanya çıkış kodu 1")
+
+        scheduler = Scheduler(self.store, failing_dispatch)
+        self.fire_due(scheduler)
+
+        schedule = self.store.get(schedule_id)
+        self.assertEqual(schedule.state, 'failed')
+        self.assertIn("Kampanya çıkış kodu 1", schedule.last_result)
+        self.assertEqual(scheduler.stats['failed'], 1)
+
+
+class ResyncTest(SchedulerTestCase):
+    """Başka bir süreç ('schedule add') depoya iş eklerse çalışan zamanlayıcı onu fark eder"""
+
+    def test_job_added_by_other_connection_is_fired(self):
+        scheduler = self.scheduler(resync_interval=0.05)
+        scheduler.start()
+        other = ScheduleStore(self.path)
+        try:
+            schedule_id = other.add(SPEC, {'tokens': ['a']}, time.time())
+            self.assertTrue(self.dispatch_event.wait(5))
+        finally:
+            scheduler.stop()
+            other.close()
+
+        self.assertEqual([ids for _, ids, _ in self.dispatched], [[schedule_id]])
+        self.assertEqual(self.store.get(schedule_id).state, 'done')
+        self.assertEqual(scheduler.pending_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fcm_token_store testleri
+Çalıştırma: python -m pytest -q tests  (veya python -m unittest discover tests)
+"""
+
+import json
+import logging
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fcm_token_store import JsonTokenStore, SQLiteTokenStore, TokenRecord, load_token_tree  # noqa: E402
+
+logging.getLogger('fcm_token_store').setLevel(logging.CRITICAL)  # beklenen uyarılar
+
+
+class JournalReplayTest(unittest.TestCase):
+    """Çökme sonrası günlükten kurtarma"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / 'device_tokens.json'
+        self.path.write_text(json.dumps({'proje': {'project_id': 'p-1', 'tokens': {}}}), encoding='utf-8')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _open(self, save_delay: float = 3600) -> tuple:
+        store = JsonTokenStore(self.path, save_delay=save_delay, journal=True)
+        data = store.load()
+        store.attach(data)
+        return store, data
+
+    def _add(self, store: JsonTokenStore, data: dict, name: str):
+        record = TokenRecord(f"{name}-token", name, 1700000000)
+        data['proje']['tokens'].setdefault('test', {})[name] = record
+        store.add_token('proje', 'test', name, record)
+
+    @staticmethod
+    def _crash(store: JsonTokenStore):
+        # Tam yazım yapılmadan süreç sonlanmış gibi: bekleyen zamanlayıcı iptal, günlük açık kalır
+        with store._lock:
+            if store._timer is not None:
+                store._timer.cancel()
+                store._timer = None
+
+    def test_torn_tail_does_not_swallow_later_records(self):
+        store, data = self._open()
+        self._add(store, data, 'k1')
+        self._crash(store)
+        # Son kayıt yazılırken çökülmüş: satır yarım kaldı
+        with open(store.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add_tok')
+
+        store, data = self._open()
+        self._add(store, data, 'k2')
+        self._add(store, data, 'k3')
+        self._crash(store)
+
+        store, data = self._open()
+        self.assertEqual(sorted(data['proje']['tokens']['test']), ['k1', 'k2', 'k3'])
+        self.assertEqual(data['proje']['tokens']['test']['k3'].token, 'k3-token')
+        self._crash(store)
+
+    def test_replayed_changes_are_flushed_after_attach(self):
+        store, data = self._open()
+        self._add(store, data, 'k1')
+        self._crash(store)
+
+        store, data = self._open(save_delay=0)
+        self.assertFalse(store.journal_path.exists())
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.assertIn('k1', json.load(f)['proje']['tokens']['test'])
+
+
+class TokenRecordTest(unittest.TestCase):
+    """Dosyadaki kayıtların TokenRecord'a dönüşümü"""
+
+    def test_unknown_fields_and_timezone_round_trip(self):
+        entry = {'token': 'tok', 'name': 'iPhone', 'created': '2024-05-01T10:00:00+03:00', 'platform': 'ios'}
+        record = TokenRecord.from_dict(dict(entry), 'iPhone')
+        self.assertEqual(record.to_dict(), entry)
+        self.assertEqual(record.renamed('yeni').to_dict(), dict(entry, name='yeni'))
+
+    def test_local_timestamp_is_stored_as_epoch(self):
+        record = TokenRecord.from_dict({'token': 'tok', 'name': 'a', 'created': '2024-05-01T10:00:00'}, 'a')
+        self.assertIsInstance(record.created, int)
+        self.assertEqual(record.created_iso, '2024-05-01T10:00:00')
+
+    def test_malformed_entries_are_skipped(self):
+        data = {'proje': {'tokens': {'test': {'iyi': {'token': 'tok', 'name': 'iyi'},
+                                              'tokensiz': {'name': 'tokensiz'},
+                                              'metin': 'bozuk'}}}}
+        load_token_tree(data)
+        self.assertEqual(list(data['proje']['tokens']['test']), ['iyi'])
+
+
+class SQLiteTokenStoreTest(unittest.TestCase):
+    """SQLite deposu JSON kayıtlarını kayıpsız saklar"""
+
+    TREE = {'proje': {'project_id': 'p-1', 'display_name': 'Proje', 'tokens': {
+        'test': {
+            'iPhone': {'token': 'tok-1', 'name': 'iPhone', 'created': '2024-05-01T10:00:00+03:00',
+                       'platform': 'ios', 'tags': ['beta', 'ğüşiöç']},
+            'pixel': {'token': 'tok-2', 'name': 'Pixel 8', 'created': '2024-05-01T10:00:00'},
+        }}}}
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_json_sqlite_json_round_trip(self):
+        source = self.dir / 'device_tokens.json'
+        source.write_text(json.dumps(self.TREE, ensure_ascii=False), encoding='utf-8')
+
+        store = SQLiteTokenStore(self.dir / 'device_tokens.db')
+        store.save_all(JsonTokenStore(source).load())
+        store.close()
+        store = SQLiteTokenStore(self.dir / 'device_tokens.db')
+        data = store.load()
+        store.close()
+
+        target = self.dir / 'out.json'
+        JsonTokenStore(target, save_delay=0).save_all(data)
+        self.assertEqual(json.loads(target.read_text(encoding='utf-8')), self.TREE)
+
+    def test_old_schema_is_migrated(self):
+        path = self.dir / 'device_tokens.db'
+        conn = sqlite3.connect(str(path))
+        conn.execute("CREATE TABLE tokens (id INTEGER PRIMARY KEY, project_key TEXT NOT NULL, category TEXT NOT NULL, "
+                     "token_name TEXT NOT NULL, name TEXT, token TEXT NOT NULL, created TEXT, "
+                     "UNIQUE (project_key, category, token_name))")
+        conn.execute("INSERT INTO tokens (project_key, category, token_name, name, token) "
+                     "VALUES ('proje', 'test', 'eski', 'eski', 'tok-0')")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteTokenStore(path)
+        store.add_project('proje', {'project_id': 'p-1', 'tokens': {'test': {}}})
+        store.add_token('proje', 'test', 'yeni', TokenRecord('tok-1', 'yeni', None, {'platform': 'android'}))
+        tokens = store.load()['proje']['tokens']['test']
+        store.close()
+        self.assertIsNone(tokens['eski'].extra)
+        self.assertEqual(tokens['yeni'].to_dict(), {'token': 'tok-1', 'name': 'yeni', 'created': None,
+                                                   'platform': 'android'})
+
+
+if __name__ == '__main__':
+    unittest.main()